@@ -0,0 +1,227 @@
+"""Deterministic replay of a gateway recording against the Discord fake.
+
+Reconstructs the active events from the snapshot in the recording header,
+recreates their messages in the fake event channel and dispatches the
+recorded reactions and messages (which includes the commands) at the
+recorded pace, optionally accelerated. Prints the API call counts, the
+reaction-to-embed latencies and a digest of the resulting database state that
+can be compared between runs and branches.
+
+Run from the repository root:
+
+    python -m benchmarks.replay database/gateway.jsonl.gz --speed 10
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import tempfile
+import time
+from typing import Any, Optional
+
+from benchmarks.signup_storm import Phase, reaction_start, reset_database
+from operationbot import config as cfg
+from operationbot.commandListener import CommandListener
+from operationbot.eventDatabase import DATABASE_VERSION, EventDatabase
+from operationbot.eventListener import EventListener
+from operationbot.recorder import read_recording
+from tests.fake_discord import (
+    FakeApi,
+    FakeBot,
+    FakeChannel,
+    FakeGuild,
+    FakeUser,
+    make_reaction_payload,
+)
+
+
+def parse_arguments(arguments: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("recording", help="Recorded gateway events")
+    parser.add_argument(
+        "--speed",
+        type=float,
+        default=1.0,
+        help="Replay speed multiplier, 0 replays as fast as possible",
+    )
+    parser.add_argument(
+        "--start", type=float, default=0.0, help="Skip events before this offset (s)"
+    )
+    parser.add_argument(
+        "--duration", type=float, default=None, help="Replay only this many seconds"
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="Latency of each API call (s)"
+    )
+    parser.add_argument("--json", action="store_true", help="Output JSON")
+    return parser.parse_args(arguments)
+
+
+def state_digest() -> str:
+    """Hash the event database contents.
+
+    Message IDs are left out because the messages created during a replay get
+    new IDs.
+    """
+    data = {}
+    for event in EventDatabase.events.values():
+        event_data = event.toJson()
+        del event_data["messageID"]
+        data[event.id] = event_data
+    encoded = json.dumps(data, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class Replay:
+    def __init__(self, header: dict, api: FakeApi, directory: str):
+        self.header = header
+        self.api = api
+        self.directory = directory
+        self.guild = FakeGuild(header["emojis"])
+        self.users: dict[int, FakeUser] = {}
+        self.skipped = 0
+
+    async def setup(self):
+        self.bot = FakeBot(self.api, self.guild)
+        reset_database(self.directory, self.guild.emojis)
+        with open(cfg.JSON_FILEPATH["events"], "w") as jsonFile:
+            json.dump(
+                {
+                    "version": DATABASE_VERSION,
+                    "nextID": self.header["nextID"],
+                    "events": self.header["events"],
+                },
+                jsonFile,
+            )
+        EventDatabase._emojis = None  # pylint: disable=protected-access
+        await self.bot.import_database()
+
+        channel = self.bot.eventchannel
+        for event in EventDatabase.events.values():
+            channel.restore(
+                event.messageID, event.createEmbed(cache=False), event.getReactions()
+            )
+
+        self.listener = EventListener(self.bot)
+        self.bot.add_cog(CommandListener(self.bot))
+
+    def _user(self, entry: dict) -> FakeUser:
+        user_id = entry["u"]
+        if user_id not in self.users:
+            user = FakeUser(entry["n"] or str(user_id), user_id)
+            self.users[user_id] = user
+            self.guild.members.append(user)
+        return self.users[user_id]
+
+    def _channel(self, name: str) -> Optional[FakeChannel]:
+        return getattr(self.bot, f"{name}channel", None)
+
+    async def _reaction(self, entry: dict):
+        try:
+            event = EventDatabase.getEventByID(entry["ev"])
+            message_id = event.messageID
+        except Exception:  # pylint: disable=broad-except
+            message_id = entry["m"]
+        message = self.bot.eventchannel.messages.get(message_id)
+        if message is None:
+            self.skipped += 1
+            return
+        emoji: Any = entry["emoji"]
+        if entry["eid"] is not None:
+            emoji = next(e for e in self.guild.emojis if e.id == entry["eid"])
+        payload = make_reaction_payload(message, self._user(entry), emoji)
+        reaction_start.set([time.perf_counter(), False])
+        await self.listener.on_raw_reaction_add(payload)
+
+    async def _message(self, entry: dict):
+        channel = self._channel(entry["c"])
+        if channel is None:
+            self.skipped += 1
+            return
+        message = channel.receive(self._user(entry), entry["content"])
+        await self.bot.process_commands(message)
+        await self.listener.on_message(message)
+
+    async def dispatch(self, entry: dict):
+        if entry["e"] == "reaction":
+            await self._reaction(entry)
+        elif entry["e"] == "message":
+            await self._message(entry)
+        # Command entries are informational, the commands are replayed from
+        # the messages that invoked them
+
+
+async def replay(
+    header: dict,
+    entries: list[dict],
+    speed: float = 1.0,
+    latency: float = 0.0,
+) -> dict[str, Any]:
+    api = FakeApi(latency=latency)
+    with tempfile.TemporaryDirectory() as directory:
+        runner = Replay(header, api, directory)
+        await runner.setup()
+
+        def on_call(route: str):
+            state = reaction_start.get()
+            if route == "edit_message" and state is not None and not state[1]:
+                phase.latencies.append(time.perf_counter() - state[0])
+                state[1] = True
+
+        api.on_call = on_call
+        offset = entries[0]["t"] if entries else 0.0
+        with Phase("replay", api) as phase:
+            start = time.perf_counter()
+            tasks = []
+            for entry in entries:
+                if speed:
+                    delay = (entry["t"] - offset) / speed - (
+                        time.perf_counter() - start
+                    )
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                tasks.append(asyncio.create_task(runner.dispatch(entry)))
+                # Let the dispatched handler start before the next event, like
+                # the gateway does
+                await asyncio.sleep(0)
+            await asyncio.gather(*tasks)
+            phase.operations = len(entries)
+        api.on_call = None
+
+        result = phase.result()
+        result["skipped"] = runner.skipped
+        result["events"] = len(EventDatabase.events)
+        result["state_digest"] = state_digest()
+    return result
+
+
+def main(arguments: Optional[list[str]] = None):
+    args = parse_arguments(arguments)
+    header, entries = read_recording(args.recording)
+    end = args.start + args.duration if args.duration is not None else None
+    entries = [
+        entry
+        for entry in entries
+        if entry["t"] >= args.start and (end is None or entry["t"] < end)
+    ]
+    result = asyncio.run(replay(header, entries, args.speed, args.latency))
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print(
+            f"Replayed {result['operations']} events in {result['duration_s']:.3f} s "
+            f"({result['skipped']} skipped), {result['api_calls']} API calls"
+        )
+        if "p50_ms" in result:
+            print(
+                f"  reaction-to-embed latency: p50 {result['p50_ms']} ms, "
+                f"p99 {result['p99_ms']} ms"
+            )
+        for route, count in sorted(result["api_calls_by_route"].items()):
+            print(f"  {route:<16} {count}")
+        print(f"State digest: {result['state_digest']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+"""Offline end-to-end benchmark of the event creation, signups and tasks.
+
+Drives `CommandListener`, `EventListener` and the periodic tasks against the
+in-process Discord fake with configurable API latency and rate limits, and
+reports the throughput, the reaction-to-embed latency, the longest event loop
+lag and the API call counts of each phase.
+
+Run from the repository root:
+
+    python -m benchmarks.signup_storm --events 8 --users 300 --latency 0.05
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import tempfile
+import time
+from contextvars import ContextVar
+from datetime import datetime, timedelta
+from typing import Any, Optional
+
+from operationbot import config as cfg
+from operationbot import messageFunctions as msgFnc
+from operationbot.commandListener import CommandListener
+from operationbot.eventDatabase import EventDatabase
+from operationbot.eventListener import EventListener
+from operationbot.loop_monitor import LoopMonitor
+from tests.fake_discord import (
+    FakeApi,
+    FakeBot,
+    FakeGuild,
+    FakeUser,
+    make_reaction_payload,
+)
+
+# Roughly the per-route limits Discord applies to a single channel
+DISCORD_RATE_LIMITS = {
+    "send_message": (5, 5.0),
+    "edit_message": (5, 5.0),
+    "add_reaction": (1, 0.25),
+    "remove_reaction": (1, 0.25),
+    "clear_reaction": (1, 0.25),
+    "clear_reactions": (1, 0.25),
+}
+
+# Start time of the reaction being handled in the current task, and whether
+# its embed edit has been seen already
+reaction_start: ContextVar[Optional[list]] = ContextVar("reaction_start", default=None)
+
+
+def percentile(values: list[float], percent: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, round(percent / 100 * (len(ordered) - 1)))
+    return ordered[index]
+
+
+def parse_arguments(arguments: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--events", type=int, default=8, help="Events to create")
+    parser.add_argument("--users", type=int, default=200, help="Users signing up")
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=0.0,
+        help="Reactions per second, 0 dispatches all reactions at once",
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="Latency of each API call (s)"
+    )
+    parser.add_argument(
+        "--rate-limits",
+        action="store_true",
+        help="Simulate the Discord per-channel rate limits",
+    )
+    parser.add_argument("--platoon-size", default=cfg.PLATOON_SIZES[0])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="Output JSON")
+    return parser.parse_args(arguments)
+
+
+def reset_database(directory: str, emojis: tuple):
+    cfg.JSON_FILEPATH = {
+        "events": f"{directory}/events.json",
+        "archive": f"{directory}/archive.json",
+        "cache": f"{directory}/cache.json",
+        "history": f"{directory}/history.json",
+        "search": f"{directory}/search.json",
+        "signups": f"{directory}/signups.json",
+    }
+    EventDatabase.events = {}
+    EventDatabase.eventsArchive = {}
+    EventDatabase.nextID = 0
+    EventDatabase.rebuildIndexes()
+    EventDatabase._emojis = emojis  # pylint: disable=protected-access
+
+
+class Phase:
+    """Measures the duration and the API calls of a benchmark phase."""
+
+    def __init__(self, name: str, api: FakeApi):
+        self.name = name
+        self.api = api
+        self.operations = 0
+        self.latencies: list[float] = []
+        self.duration = 0.0
+        self.calls: dict[str, int] = {}
+
+    def __enter__(self) -> "Phase":
+        self.api.reset()
+        # Sampling the lag often, only the longest one is reported
+        self.monitor = LoopMonitor(interval=0.005, threshold=1.0)
+        self._monitor_task = asyncio.create_task(self.monitor.run())
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *_):
+        self.duration = time.perf_counter() - self._start
+        self.calls = dict(self.api.calls)
+        self._monitor_task.cancel()
+
+    def result(self) -> dict[str, Any]:
+        result: dict[str, Any] = {
+            "operations": self.operations,
+            "duration_s": round(self.duration, 4),
+            "throughput_per_s": (
+                round(self.operations / self.duration, 2) if self.duration else 0.0
+            ),
+            "max_loop_lag_ms": round(self.monitor.max_lag * 1000, 2),
+            "api_calls": sum(self.calls.values()),
+            "api_calls_by_route": self.calls,
+        }
+        if self.latencies:
+            result["p50_ms"] = round(percentile(self.latencies, 50) * 1000, 2)
+            result["p99_ms"] = round(percentile(self.latencies, 99) * 1000, 2)
+            result["mean_ms"] = round(statistics.mean(self.latencies) * 1000, 2)
+        return result
+
+
+async def run(args: argparse.Namespace) -> dict[str, dict]:
+    rng = random.Random(args.seed)
+    emoji_names = sorted(
+        {name for roles in cfg.DEFAULT_ROLES.values() for name in roles}
+    )
+    guild = FakeGuild(emoji_names)
+    api = FakeApi(
+        latency=args.latency,
+        rate_limits=DISCORD_RATE_LIMITS if args.rate_limits else None,
+    )
+    bot = FakeBot(api, guild)
+    results = {}
+
+    with tempfile.TemporaryDirectory() as directory:
+        reset_database(directory, guild.emojis)
+        commands = CommandListener(bot)
+        listener = EventListener(bot)
+        ctx = await bot.get_context(bot.commandchannel.receive(bot.owner, "!bench"))
+
+        with Phase("create", api) as phase:
+            start = datetime.now() + timedelta(days=7)
+            for i in range(args.events):
+                # pylint: disable=protected-access
+                await commands._create_event(
+                    ctx,
+                    start + timedelta(days=i),
+                    platoon_size=args.platoon_size,
+                    silent=True,
+                )
+                phase.operations += 1
+        results["create"] = phase.result()
+
+        def on_call(route: str):
+            state = reaction_start.get()
+            if route == "edit_message" and state is not None and not state[1]:
+                phase.latencies.append(time.perf_counter() - state[0])
+                state[1] = True
+
+        async def react(payload):
+            reaction_start.set([time.perf_counter(), False])
+            await listener.on_raw_reaction_add(payload)
+
+        events = list(EventDatabase.events.values())
+        users = [FakeUser(f"User {i}") for i in range(args.users)]
+        payloads = []
+        for user in users:
+            event = rng.choice(events)
+            roles = [
+                role
+                for group in event.roleGroups.values()
+                for role in group.roles
+                if role.name != cfg.EMOJI_ZEUS
+            ]
+            message = bot.eventchannel.messages[event.messageID]
+            payloads.append(
+                make_reaction_payload(message, user, rng.choice(roles).emoji)
+            )
+
+        api.on_call = on_call
+        with Phase("signups", api) as phase:
+            tasks = []
+            for payload in payloads:
+                tasks.append(asyncio.create_task(react(payload)))
+                if args.rate:
+                    await asyncio.sleep(1 / args.rate)
+            await asyncio.gather(*tasks)
+            phase.operations = len(payloads)
+        api.on_call = None
+        results["signups"] = phase.result()
+
+        with Phase("tasks", api) as phase:
+            cancelled = await msgFnc.cancel_empty_events(
+                bot, threshold=timedelta(days=365)
+            )
+            archived = await msgFnc.archive_past_events(bot, delta=-timedelta(days=365))
+            phase.operations = len(cancelled) + len(archived)
+        results["tasks"] = phase.result()
+
+    return results
+
+
+def format_results(results: dict[str, dict]) -> str:
+    lines = []
+    for name, result in results.items():
+        lines.append(
+            f"{name}: {result['operations']} ops in {result['duration_s']:.3f} s "
+            f"({result['throughput_per_s']}/s), {result['api_calls']} API calls, "
+            f"max loop lag {result['max_loop_lag_ms']} ms"
+        )
+        if "p50_ms" in result:
+            lines.append(
+                f"  reaction-to-embed latency: p50 {result['p50_ms']} ms, "
+                f"p99 {result['p99_ms']} ms"
+            )
+        for route, count in sorted(result["api_calls_by_route"].items()):
+            lines.append(f"  {route:<16} {count}")
+    return "\n".join(lines)
+
+
+def main(arguments: Optional[list[str]] = None):
+    args = parse_arguments(arguments)
+    results = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(format_results(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+"""Attendance and participation statistics of the archived events.
+
+The archive is flattened into a columnar table: one row per signup (a role
+with a user or an attendee) and one entry per event. The reports are computed
+with whole-column passes over the table, using NumPy when it is installed and
+plain Python otherwise.
+
+The table and the computed reports are cached until the archive changes.
+"""
+
+from array import array
+from collections import Counter
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, cast
+
+from operationbot import partitions
+from operationbot.event import Event
+from operationbot.eventDatabase import EventDatabase
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None  # type: ignore
+
+WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+ATTENDEE = "Attendee"
+FILL_RATE_KEYS = ("weekday", "size")
+
+
+class _Codes:
+    """Assigns consecutive integer codes to labels."""
+
+    def __init__(self):
+        self.labels: List[str] = []
+        self._codes: Dict[str, int] = {}
+
+    def __call__(self, label: str) -> int:
+        code = self._codes.get(label)
+        if code is None:
+            code = self._codes[label] = len(self.labels)
+            self.labels.append(label)
+        return code
+
+
+class SignupTable:
+    """Columnar table of the signups of the archived events.
+
+    The events are ordered by date. Row columns: `event` (index of the event),
+    `user`, `role` and `group` (codes into `roles` and `groups`). Event
+    columns: `weekday`, `size` (code into `sizes`), `cancelled`, `slots`
+    (number of roles) and `filled` (number of roles with a user).
+    """
+
+    def __init__(self, events: Iterable[Event]):
+        self.event = array("l")
+        self.user = array("q")
+        self.role = array("l")
+        self.group = array("l")
+
+        self.event_ids = array("l")
+        self.weekday = array("b")
+        self.size = array("l")
+        self.cancelled = array("b")
+        self.slots = array("l")
+        self.filled = array("l")
+
+        roles, groups, sizes = _Codes(), _Codes(), _Codes()
+        self.user_names: Dict[int, str] = {}
+        attendee = roles(ATTENDEE)
+
+        for index, event in enumerate(sorted(events, key=lambda e: e.date)):
+            slots = filled = 0
+            for group in event.roleGroups.values():
+                for role in group.roles:
+                    slots += 1
+                    user_id = role.userID
+                    if user_id is None:
+                        continue
+                    filled += 1
+                    self._add_row(index, user_id, roles(role.name), groups(group.name))
+                    self.user_names[user_id] = role.userName or ""
+            for user in event.attendees:
+                if user.id is None:
+                    continue
+                self._add_row(index, user.id, attendee, -1)
+                self.user_names.setdefault(user.id, user.display_name or "")
+            self.event_ids.append(event.id)
+            self.weekday.append(event.date.weekday())
+            self.size.append(sizes(event.platoon_size))
+            self.cancelled.append(event.cancelled)
+            self.slots.append(slots)
+            self.filled.append(filled)
+
+        self.roles = roles.labels
+        self.groups = groups.labels
+        self.sizes = sizes.labels
+        self.attendee = attendee
+
+    def _add_row(self, event: int, user: int, role: int, group: int):
+        self.event.append(event)
+        self.user.append(user)
+        self.role.append(role)
+        self.group.append(group)
+
+    def __len__(self) -> int:
+        return len(self.event)
+
+    def attendance(self) -> List[Tuple[int, int]]:
+        """Number of events attended by each user, the most active first."""
+        result: Iterable[Tuple[int, int]]
+        if np is not None and len(self):
+            users, _ = self._attended_pairs()
+            ids, counts = np.unique(users, return_counts=True)
+            result = zip(ids.tolist(), counts.tolist())
+        else:
+            result = Counter(user for user, _ in self._pairs()).items()
+        return sorted(result, key=lambda item: (-item[1], item[0]))
+
+    def streaks(self) -> List[Tuple[int, int]]:
+        """Longest run of consecutive events attended by each user.
+
+        Cancelled events do not break the streaks.
+        """
+        # Rank of each event among the events that were played
+        ranks = array("l")
+        rank = 0
+        for cancelled in self.cancelled:
+            ranks.append(rank)
+            rank += not cancelled
+
+        result: Iterable[Tuple[int, int]]
+        if np is not None and len(self):
+            users, events = self._attended_pairs()
+            played = np.frombuffer(self.cancelled, dtype=np.int8)[events] == 0
+            users = users[played]
+            ranks_np = np.frombuffer(ranks, dtype=ranks.typecode)[events[played]]
+            if not len(users):
+                return []
+            breaks = np.ones(len(users), dtype=bool)
+            breaks[1:] = (users[1:] != users[:-1]) | (np.diff(ranks_np) != 1)
+            starts = np.flatnonzero(breaks)
+            lengths = np.diff(np.append(starts, len(users)))
+            start_users = users[starts]
+            first = np.ones(len(starts), dtype=bool)
+            first[1:] = start_users[1:] != start_users[:-1]
+            groups = np.flatnonzero(first)
+            best = np.maximum.reduceat(lengths, groups)
+            result = zip(start_users[groups].tolist(), best.tolist())
+        else:
+            longest: Dict[int, int] = {}
+            previous: Tuple[int, int] = (0, -2)
+            current = 0
+            for user, event in sorted(self._pairs()):
+                if self.cancelled[event]:
+                    continue
+                if previous == (user, ranks[event] - 1):
+                    current += 1
+                else:
+                    current = 1
+                previous = (user, ranks[event])
+                longest[user] = max(longest.get(user, 0), current)
+            result = longest.items()
+        return sorted(result, key=lambda item: (-item[1], item[0]))
+
+    def role_frequency(self, user: Optional[int] = None) -> List[Tuple[str, int]]:
+        """Number of signups to each role, optionally of a single user."""
+        if np is not None and len(self):
+            roles = np.frombuffer(self.role, dtype=self.role.typecode)
+            mask = roles != self.attendee
+            if user is not None:
+                mask &= np.frombuffer(self.user, dtype=np.int64) == user
+            counts = np.bincount(roles[mask], minlength=len(self.roles)).tolist()
+        else:
+            counts = [0] * len(self.roles)
+            for role, role_user in zip(self.role, self.user):
+                if role != self.attendee and (user is None or role_user == user):
+                    counts[role] += 1
+        result = [(self.roles[code], count) for code, count in enumerate(counts)]
+        return sorted(
+            (item for item in result if item[1]), key=lambda item: (-item[1], item[0])
+        )
+
+    def fill_rates(self, by: str = "weekday") -> List[Tuple[str, int, float]]:
+        """Share of the roles filled, grouped by the weekday or platoon size.
+
+        Returns (label, number of events, fill rate) tuples. Cancelled events
+        are included.
+        """
+        if by == "weekday":
+            keys, labels = self.weekday, list(WEEKDAYS)
+        elif by == "size":
+            keys, labels = self.size, self.sizes
+        else:
+            raise ValueError(f"Unknown grouping: {by}")
+        if np is not None and len(keys):
+            keys_np = np.frombuffer(keys, dtype=keys.typecode).astype(np.intp)
+            length = len(labels)
+            events = np.bincount(keys_np, minlength=length).tolist()
+            slots = np.bincount(keys_np, weights=self.slots, minlength=length)
+            filled = np.bincount(keys_np, weights=self.filled, minlength=length)
+            totals = list(zip(events, slots.tolist(), filled.tolist()))
+        else:
+            sums = [[0, 0, 0] for _ in labels]
+            for key, slot_count, filled_count in zip(keys, self.slots, self.filled):
+                sums[key][0] += 1
+                sums[key][1] += slot_count
+                sums[key][2] += filled_count
+            totals = [
+                (count, slot_sum, filled_sum) for count, slot_sum, filled_sum in sums
+            ]
+        return [
+            (label, events, filled / slots if slots else 0.0)
+            for label, (events, slots, filled) in zip(labels, totals)
+            if events
+        ]
+
+    def _pairs(self) -> set:
+        """Unique (user, event) pairs."""
+        return set(zip(self.user, self.event))
+
+    def _attended_pairs(self):
+        """Unique (user, event) pairs as NumPy arrays sorted by user."""
+        pairs = np.stack(
+            [
+                np.frombuffer(self.user, dtype=np.int64),
+                np.frombuffer(self.event, dtype=self.event.typecode).astype(np.int64),
+            ],
+            axis=1,
+        )
+        pairs = np.unique(pairs, axis=0)
+        return pairs[:, 0], pairs[:, 1]
+
+
+class Analytics:
+    """Cached reports over the archive."""
+
+    def __init__(self):
+        self._generation = -1
+        self._table: Optional[SignupTable] = None
+        self._results: Dict[Tuple, Any] = {}
+
+    @property
+    def table(self) -> SignupTable:
+        generation = EventDatabase.archiveIndex.generation
+        if self._table is None or generation != self._generation:
+            self._table = SignupTable(EventDatabase.eventsArchive.values())
+            self._generation = generation
+            self._results = {}
+        return self._table
+
+    def report(self, name: str, *args) -> Any:
+        """Return the result of a `SignupTable` report, cached."""
+        table = self.table
+        key = (name,) + args
+        if key not in self._results:
+            method: Callable = getattr(table, name)
+            self._results[key] = method(*args)
+        return self._results[key]
+
+    def user_name(self, user_id: int) -> str:
+        return self.table.user_names.get(user_id) or str(user_id)
+
+
+# The reports of the current partition
+analytics = cast(Analytics, partitions.PartitionLocal(lambda _: Analytics()))
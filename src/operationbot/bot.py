@@ -4,16 +4,23 @@ import logging
 import sys
 import traceback
 from asyncio import Task
+from typing import Dict, Optional, Set
 
 import discord
 from discord import TextChannel, User
-from discord.ext.commands import Bot, DefaultHelpCommand
+from discord.ext.commands import Bot, Context, DefaultHelpCommand
 from discord.guild import Guild
 
 from operationbot import config as cfg
-from operationbot import tasks
+from operationbot import messageFunctions as msgFnc
+from operationbot import partitions, tasks
+from operationbot.config_watch import CHANNEL_SETTINGS, EMBED_SETTINGS, config_watcher
 from operationbot.eventDatabase import EventDatabase
+from operationbot.jobs import JobRegistry
+from operationbot.log_sink import LogSink
+from operationbot.recorder import recorder
 from operationbot.secret import ADMIN, SIGNOFF_NOTIFY_USER
+from operationbot.startup import profile
 
 
 class AliasHelpCommand(DefaultHelpCommand):
@@ -54,47 +61,203 @@ class AliasHelpCommand(DefaultHelpCommand):
             self.paginator.add_line(self.shorten_text(entry))
 
 
+class PartitionChannel:
+    """A channel of the bot that is resolved in the current partition."""
+
+    def __set_name__(self, owner, name: str):
+        self.name = name
+
+    def __get__(self, bot: Optional["OperationBot"], owner=None) -> TextChannel:
+        if bot is None:
+            return self  # type: ignore
+        try:
+            return bot.partition_channels[partitions.current()][self.name]
+        except KeyError as e:
+            raise AttributeError(
+                f"No {self.name} set in partition {partitions.current()}"
+            ) from e
+
+    def __set__(self, bot: "OperationBot", channel: TextChannel):
+        bot.partition_channels.setdefault(partitions.current(), {})[self.name] = channel
+
+
 class OperationBot(Bot):
     """A custom Discord bot."""
 
+    commandchannel = PartitionChannel()
+    logchannel = PartitionChannel()
+    eventchannel = PartitionChannel()
+    eventarchivechannel = PartitionChannel()
+
     def __init__(self, *args, help_command=None, **kwargs):
         super().__init__(*args, **kwargs)
-        self.commandchannel: TextChannel
-        self.logchannel: TextChannel
-        self.eventchannel: TextChannel
-        self.eventarchivechannel: TextChannel
+        # The bot channels of each partition by the attribute name
+        self.partition_channels: Dict[str, Dict[str, TextChannel]] = {}
         self.owner: User
         self.signoff_notify_user: User
-        self.awaiting_reply = False
+        # Commands are rejected until the events have been imported
         self.processing = True
+        self.jobs = JobRegistry()
         self.tasks: dict["str", Task] = {}
+        # Batches the log channel messages, flushed by the log writer task
+        self.log_sink = LogSink()
+        # Re-renders the event embeds after a config reload
+        self.embed_refresh: Optional[Task] = None
 
         if help_command is None:
             self.help_command = AliasHelpCommand()
         else:
             self.help_command = help_command
 
-    def fetch_data(self) -> None:
+    async def login(self, *args, **kwargs) -> None:
+        with profile.phase("login"):
+            await super().login(*args, **kwargs)
+
+    async def fetch_data(self) -> None:
         """Fetch channels and users from the Discord API after connecting."""
-        self.commandchannel = self._get_channel(cfg.COMMAND_CHANNEL)
-        self.logchannel = self._get_channel(cfg.LOG_CHANNEL)
-        self.eventchannel = self._get_channel(cfg.EVENT_CHANNEL)
-        self.eventarchivechannel = self._get_channel(cfg.EVENT_ARCHIVE_CHANNEL)
+        for partition in partitions.configured():
+            if self.serves(partition):
+                self._fetch_channels(partition)
+            else:
+                logging.info(f"Partition {partition.name} is on another shard")
         self.owner_id = ADMIN
-        self.owner = self._get_user(self.owner_id)
-        self.signoff_notify_user = self._get_user(SIGNOFF_NOTIFY_USER)
+        self.owner = await self._fetch_user(self.owner_id)
+        self.signoff_notify_user = await self._fetch_user(SIGNOFF_NOTIFY_USER)
+
+    def serves(self, partition: partitions.PartitionConfig) -> bool:
+        """Check whether the guild of the partition is on the shard of the bot.
+
+        Each guild is served by a single shard, the channels of the guilds on
+        the other shards are not available to this one.
+        """
+        if not self.shard_count or self.shard_count <= 1:
+            return True
+        channel = self.get_channel(partition.command_channel)
+        return channel is not None and channel.guild.shard_id == self.shard_id
+
+    def _fetch_channels(self, partition: partitions.PartitionConfig) -> None:
+        with partitions.use(partition.name):
+            for attribute, channel_id in partition.channels.items():
+                setattr(self, attribute, self._get_channel(channel_id))
+
+    @property
+    def partition_names(self) -> list[str]:
+        """The names of the partitions served by this shard.
+
+        Only the bot channels of the served partitions are fetched.
+        """
+        return list(self.partition_channels)
+
+    def partition_of(self, channel_id: int, attribute: str) -> Optional[str]:
+        """Find the partition that uses the channel as the given bot channel.
+
+        Returns None if the channel does not belong to any partition.
+        """
+        for name, channels in self.partition_channels.items():
+            channel = channels.get(attribute)
+            if channel is not None and channel.id == channel_id:
+                return name
+        return None
 
     def start_tasks(self) -> None:
-        for name, task in tasks.ALL_TASKS.items():
-            if name not in self.tasks:
-                self.tasks[name] = self.loop.create_task(task(self))
+        for name, task in tasks.GLOBAL_TASKS.items():
+            self._start_task(name, task)
+        for partition in self.partition_names:
+            # The tasks inherit the current partition when they are created
+            with partitions.use(partition):
+                for name, task in tasks.PARTITION_TASKS.items():
+                    self._start_task(self._task_name(name, partition), task)
+
+    def _task_name(self, name: str, partition: str) -> str:
+        if partition != partitions.DEFAULT:
+            return f"{name} ({partition})"
+        return name
+
+    def _start_task(self, name: str, task) -> None:
+        if name not in self.tasks:
+            self.tasks[name] = self.loop.create_task(task(self))
+        else:
+            logging.info(f"The {name} task is already running, not starting again")
+
+    def _restart_task(self, name: str, task) -> None:
+        running = self.tasks.pop(name, None)
+        if running is not None:
+            running.cancel()
+        self._start_task(name, task)
+
+    def watch_config(self) -> None:
+        """Apply the config changes of a reload to the running bot."""
+        config_watcher.subscribe(EMBED_SETTINGS, self._refresh_embeds)
+        config_watcher.subscribe(CHANNEL_SETTINGS, self._refresh_channels)
+        task_settings = set().union(*tasks.TASK_SETTINGS.values())
+        config_watcher.subscribe(task_settings, self._restart_tasks)
+        config_watcher.subscribe({"GAME"}, self._change_game)
+        config_watcher.subscribe({"LOG_FLUSH_INTERVAL"}, self._change_log_interval)
+
+    def _refresh_embeds(self, changed: Set[str]) -> None:
+        if self.embed_refresh is not None:
+            self.embed_refresh.cancel()
+        self.embed_refresh = self.loop.create_task(self.refresh_embeds())
+
+    async def refresh_embeds(self) -> int:
+        """Edit the event messages whose embed has changed.
+
+        Returns the number of edited messages.
+        """
+        updated = 0
+        for partition in self.partition_names:
+            with partitions.use(partition), self.jobs.track("Refresh embeds"):
+                events = EventDatabase.events.values()
+                updated += await msgFnc.refreshEmbeds(self, events)
+        return updated
+
+    def _refresh_channels(self, changed: Set[str]) -> None:
+        # Serving a new partition requires importing its events, the added
+        # and removed partitions are picked up on restart
+        for partition in partitions.configured():
+            if not self.serves(partition):
+                continue
+            if partition.name in self.partition_channels:
+                self._fetch_channels(partition)
             else:
-                logging.info(f"The {name} task is already running, not starting again")
+                logging.warning(f"Partition {partition.name} is served after a restart")
+
+    def _restart_tasks(self, changed: Set[str]) -> None:
+        for name, settings in tasks.TASK_SETTINGS.items():
+            if not settings & changed:
+                continue
+            if name in tasks.GLOBAL_TASKS:
+                self._restart_task(name, tasks.GLOBAL_TASKS[name])
+                continue
+            for partition in self.partition_names:
+                with partitions.use(partition):
+                    task_name = self._task_name(name, partition)
+                    self._restart_task(task_name, tasks.PARTITION_TASKS[name])
+
+    def _change_game(self, changed: Set[str]) -> None:
+        self.loop.create_task(self.change_presence(activity=discord.Game(cfg.GAME)))
+
+    def _change_log_interval(self, changed: Set[str]) -> None:
+        self.log_sink.interval = cfg.LOG_FLUSH_INTERVAL
+
+    async def invoke(self, ctx: Context) -> None:
+        """Run the command in the partition of its command channel."""
+        partition = self.partition_of(ctx.channel.id, "commandchannel")
+        with partitions.use(partition or partitions.DEFAULT):
+            # Pick up the events changed by the other shards
+            EventDatabase.refresh()
+            await super().invoke(ctx)
+
+    async def close(self) -> None:
+        await self.log_sink.flush()
+        recorder.stop()
+        await super().close()
 
-    def _get_user(self, user_id: int) -> User:
+    async def _fetch_user(self, user_id: int) -> User:
+        # The user is only cached if it shares a guild with this shard
         user = self.get_user(user_id)
         if user is None:
-            raise TypeError(f"User ID {user_id} not found")
+            user = await self.fetch_user(user_id)
         return user
 
     def _get_channel(self, channel_id: int) -> TextChannel:
@@ -112,10 +275,11 @@ class OperationBot(Bot):
         return guild
 
     async def import_database(self) -> None:
-        """Import the event database."""
+        """Import the event database of the current partition."""
         try:
-            if cfg.EMOJI_GUILD:
-                emoji_guild = self._get_guild(cfg.EMOJI_GUILD)
+            emoji_guild_id = partitions.settings().emoji_guild
+            if emoji_guild_id:
+                emoji_guild = self._get_guild(emoji_guild_id)
             else:
                 emoji_guild = self.commandchannel.guild
             EventDatabase.loadDatabase(emoji_guild.emojis)
@@ -4,7 +4,7 @@ import argparse
 import sys
 from typing import Optional
 
-from operationbot.main import main as bot_run
+from operationbot.startup import profile
 
 
 def parse_arguments(arguments: list[str]) -> argparse.Namespace:
@@ -14,6 +14,16 @@ def parse_arguments(arguments: list[str]) -> argparse.Namespace:
         description="Operations bot for the Zeusops discord",
     )
     parser.add_argument("--config", help="Some extra config")
+    parser.add_argument(
+        "--profile-startup",
+        action="store_true",
+        help="Print a breakdown of the time spent in each startup phase",
+    )
+    parser.add_argument(
+        "--shard-id",
+        type=int,
+        help="Gateway shard run by this process, when SHARD_COUNT is set",
+    )
     return parser.parse_args(arguments)
 
 
@@ -22,10 +32,15 @@ def cli(arguments: Optional[list[str]] = None):
     if arguments is None:
         arguments = sys.argv[1:]
     args = parse_arguments(arguments)
-    main(args.config)
+    main(args.config, profile_startup=args.profile_startup, shard_id=args.shard_id)
 
 
-def main(config):
+def main(config, profile_startup=False, shard_id: Optional[int] = None):
     """Run the program's main command"""
     print(f"{config=}")
-    bot_run()
+    profile.enabled = profile_startup
+    # Importing the bot lazily so that the import time of the discord library
+    # and the bot modules gets included in the profile
+    with profile.phase("imports"):
+        from operationbot.main import main as bot_run
+    bot_run(shard_id)
@@ -0,0 +1,90 @@
+from io import BytesIO
+from typing import Optional
+
+from discord import File
+from discord.ext import commands
+from discord.ext.commands import Bot, Context
+
+from operationbot import config as cfg
+from operationbot.command_helpers import split_message
+from operationbot.sampler import profiler, task_dump
+
+
+class Profiler(commands.Cog):
+    """Diagnosis of the live bot: a sampling profiler and a task dump."""
+
+    def __init__(self, bot: Bot):
+        self.bot = bot
+
+    async def _send(self, ctx: Context, text: str, filename: str):
+        chunks = split_message(text)
+        if len(chunks) > 3:
+            # Too long for a few messages, sending as an attachment instead
+            await ctx.send(file=File(BytesIO(text.encode("utf-8")), filename))
+            return
+        for chunk in chunks:
+            await ctx.send(f"```{chunk}```")
+
+    @commands.group(invoke_without_command=True, hidden=True)
+    @commands.is_owner()
+    async def profile(self, ctx: Context):
+        """Profile the event loop with a sampling profiler.
+
+        Subcommands: start, stop, top, flamegraph
+        """
+        state = "running" if profiler.running else "stopped"
+        await ctx.send(f"Profiler {state}, {profiler.total} samples collected")
+
+    @profile.command()
+    async def start(self, ctx: Context, duration: Optional[float] = None):
+        """Start sampling the event loop thread.
+
+        The profiler stops by itself after `duration` seconds, at most
+        PROFILE_MAX_DURATION seconds.
+
+        Example: profile start 60
+        """
+        duration = min(duration or cfg.PROFILE_MAX_DURATION, cfg.PROFILE_MAX_DURATION)
+        if not profiler.start(cfg.PROFILE_SAMPLE_INTERVAL, duration):
+            await ctx.send("The profiler is already running")
+            return
+        await ctx.send(f"Profiling the event loop for up to {duration:.0f} s")
+
+    @profile.command()
+    async def stop(self, ctx: Context):
+        """Stop sampling and show the hottest functions."""
+        if not profiler.stop():
+            await ctx.send("The profiler is not running")
+            return
+        await self._send(ctx, profiler.top(), "profile.txt")
+
+    @profile.command()
+    async def top(self, ctx: Context, limit: int = 20, order: str = "total"):
+        """Show the functions seen in the most samples.
+
+        The functions are ordered by the total time spent in them, or by the
+        time spent in the function itself if `order` is "self".
+
+        Example: profile top 30 self
+        """
+        text = profiler.top(limit, by_self=order == "self")
+        await self._send(ctx, text, "profile.txt")
+
+    @profile.command()
+    async def flamegraph(self, ctx: Context):
+        """Upload the samples in the collapsed stack format of flamegraphs."""
+        data = profiler.collapsed()
+        if not data:
+            await ctx.send("No samples collected")
+            return
+        await ctx.send(file=File(BytesIO(data.encode("utf-8")), "profile.folded"))
+
+    @commands.command(hidden=True)
+    @commands.is_owner()
+    async def taskdump(self, ctx: Context):
+        """Show the running asyncio tasks and what each of them is awaiting."""
+        await self._send(ctx, task_dump(), "tasks.txt")
+
+
+def setup(bot):
+    bot.add_cog(Profiler(bot))
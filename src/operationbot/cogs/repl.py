@@ -5,7 +5,7 @@ import io
 import textwrap
 import traceback
 from contextlib import redirect_stdout
-from typing import Callable, Set, cast
+from typing import Any, Callable, Dict, Set, cast
 
 import discord
 from discord.ext import commands
@@ -21,6 +21,14 @@ class REPL(commands.Cog):
         self._last_result = None
         self.sessions: Set[int] = set()
 
+    def export_state(self) -> Dict[str, Any]:
+        return {"last_result": self._last_result, "sessions": self.sessions}
+
+    def import_state(self, state: Dict[str, Any]):
+        self._last_result = state["last_result"]
+        # Shared with the sessions still running in the previous cog
+        self.sessions = state["sessions"]
+
     def cleanup_code(self, content):
         """Automatically removes code blocks from the code."""
         # remove ```py\n```
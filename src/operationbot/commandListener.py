@@ -1,14 +1,15 @@
 import calendar
 import importlib
+import json
 import logging
 import sys
 import traceback
 from datetime import date, datetime, time, timedelta
-from io import StringIO
+from io import BytesIO, StringIO
+from time import perf_counter
 from typing import Optional, cast
 
-import yaml
-from discord import Member
+from discord import File, Member
 from discord.channel import TextChannel
 from discord.emoji import Emoji
 from discord.ext.commands import BadArgument, Cog, Context, command
@@ -20,14 +21,25 @@ from discord.ext.commands.errors import (
 
 from operationbot import config as cfg
 from operationbot import messageFunctions as msgFnc
+from operationbot import metrics, partitions
+from operationbot.analytics import analytics
 from operationbot.bot import OperationBot
 from operationbot.command_helpers import (
+    event_changed,
+    run_bulk,
+    send_paginated,
     set_dlc,
     set_overhaul,
     set_reforger,
     show_event,
+    split_message,
     update_event,
 )
+from operationbot.config_watch import (
+    EMBED_SETTINGS,
+    RESTART_SETTINGS,
+    config_watcher,
+)
 from operationbot.converters import (
     ArgArchivedEvent,
     ArgDate,
@@ -41,10 +53,14 @@ from operationbot.converters import (
 )
 from operationbot.errors import MessageNotFound, RoleError, UnexpectedRole
 from operationbot.event import Event
+from operationbot.event_batch import EventBatch
+from operationbot.event_index import SummaryIndex, paginate, parse_filters
 from operationbot.eventDatabase import EventDatabase
+from operationbot.history import build_event, describe, diff, history, reason
 from operationbot.roleGroup import RoleGroup
 from operationbot.secret import ADMINS, WW2_MODS
 from operationbot.secret import COMMAND_CHAR as CMD
+from operationbot.signup_tracker import tracker
 
 
 class CommandListener(Cog):
@@ -57,13 +73,11 @@ class CommandListener(Cog):
 
         @bot.check
         async def await_reply(ctx: Context):
-            if self.bot.awaiting_reply:
+            if self.bot.jobs.prompting(ctx.author.id, ctx.channel.id):
                 await ctx.send("Please answer the previous prompt first.")
                 return False
             if self.bot.processing:
-                await ctx.send(
-                    "Please wait for the previous operation to finish first."
-                )
+                await ctx.send("Please wait for the events to be imported first.")
                 return False
             return True
 
@@ -80,6 +94,52 @@ class CommandListener(Cog):
                 or ctx.channel.id == cfg._test_channel
             )
 
+    async def cog_before_invoke(self, ctx: Context):
+        # Commands run concurrently, only the events given as arguments are
+        # locked for the duration of the command
+        name = ctx.command.qualified_name if ctx.command else "command"
+        ctx.job = self.bot.jobs.start(name, str(ctx.author))
+        arguments = (*ctx.args, *ctx.kwargs.values())
+        try:
+            ctx.event_locks = await self.bot.jobs.acquire(
+                arg for arg in arguments if isinstance(arg, Event)
+            )
+        except BaseException:
+            self.bot.jobs.finish(ctx.job)
+            raise
+        # cog_after_invoke only runs if this hook succeeds
+        try:
+            # Record the command as the reason of the event changes and
+            # capture the structure of the events before the command modifies
+            # them
+            reason.set(ctx.message.clean_content[:100])
+            history.track(EventDatabase.events.values())
+        except BaseException:
+            self.bot.jobs.release(ctx.event_locks)
+            self.bot.jobs.finish(ctx.job)
+            raise
+
+    async def cog_after_invoke(self, ctx: Context):
+        try:
+            # Save the versions the command added in one go
+            history.save_changes()
+        finally:
+            self.bot.jobs.release(ctx.event_locks)
+            self.bot.jobs.finish(ctx.job)
+
+    async def _sort_events(self, ctx: Context):
+        """Sort the event messages with all the events locked.
+
+        Sorting moves the events to other messages, so no other command or
+        reaction may edit an event message meanwhile. The locks held by the
+        command are released first, so that two commands sorting at the same
+        time cannot deadlock.
+        """
+        self.bot.jobs.release(ctx.event_locks)
+        ctx.event_locks = []
+        ctx.event_locks = await self.bot.jobs.acquire(EventDatabase.events.values())
+        await msgFnc.sortEventMessages(self.bot)
+
     @command()
     async def testrole(self, ctx: Context, event: ArgEvent, role: ArgRole):
         """
@@ -127,6 +187,30 @@ class CommandListener(Cog):
         else:
             await ctx.send(f"Reloaded {moduleName}")
 
+    @command()
+    async def reloadconfig(self, ctx: Context):
+        """Reload the configuration without restarting the bot.
+
+        Only the state depending on the changed settings is refreshed and only
+        the event messages whose embed changed are edited.
+        """
+        try:
+            changed = config_watcher.reload()
+        except ValueError as e:
+            await ctx.send(f"{e}\nKeeping the previous configuration")
+            return
+        if not changed:
+            await ctx.send("Configuration unchanged")
+            return
+        msg = f"Reloaded the configuration, changed: {', '.join(sorted(changed))}"
+        restart = changed & RESTART_SETTINGS
+        if restart:
+            msg += f"\nApplied after a restart: {', '.join(sorted(restart))}"
+        await ctx.send(msg)
+        if changed & EMBED_SETTINGS and self.bot.embed_refresh is not None:
+            updated = await self.bot.embed_refresh
+            await ctx.send(f"Updated {updated} event messages")
+
     @command()
     async def exec(self, ctx: Context, flag: str, *, cmd: str):
         """Execute arbitrary code.
@@ -168,31 +252,33 @@ class CommandListener(Cog):
             )
         await ctx.send(msg)
 
+    @staticmethod
+    def _check_date(_date: datetime, force=False):
+        # TODO: Check for duplicate event dates?
+        if _date < datetime.today() and not force:
+            raise BadArgument(
+                f"Requested date {_date} has already passed. "
+                "Use the `force` argument to override"
+            )
+
     async def _create_event(
         self,
         ctx: Context,
         _date: datetime,
-        batch=False,
         sideop=False,
         platoon_size=None,
         force=False,
         silent=False,
         reforger=False,
     ) -> Event:
-        # TODO: Check for duplicate event dates?
-        if _date < datetime.today() and not force:
-            raise BadArgument(
-                f"Requested date {_date} has already passed. "
-                "Use the `force` argument to override"
-            )
+        self._check_date(_date, force)
 
-        # Create event and sort events, export
-        event: Event = EventDatabase.createEvent(
+        # Create event, its message in the sorted position and export
+        batch = EventBatch(self.bot)
+        event = batch.add(
             _date, sideop=sideop, platoon_size=platoon_size, reforger=reforger
         )
-        await msgFnc.createEventMessage(event, self.bot.eventchannel)
-        if not batch:
-            await msgFnc.sortEventMessages(self.bot)
+        await batch.commit()
         if not silent:
             await ctx.send(f"Created event {event}")
             await show_event(ctx, event, self.bot)
@@ -292,25 +378,24 @@ class CommandListener(Cog):
         platoon_size: str | None = None,
         quiet=False,
         reforger=False,
+        mods="",
     ):
         if _time is not None:
             _datetime = _datetime.replace(
                 hour=_time.hour, minute=_time.minute  # type: ignore
             )
+        self._check_date(_datetime, force=(_time is not None))
 
-        event = await self._create_event(
-            ctx,
-            _datetime,
-            sideop=sideop,
-            platoon_size=platoon_size,
-            reforger=reforger,
-            force=(_time is not None),
-            batch=True,
-            silent=True,
+        # Fill in the details before creating the message so that it is sent
+        # only once with the final embed
+        batch = EventBatch(self.bot)
+        event = batch.add(
+            _datetime, sideop=sideop, platoon_size=platoon_size, reforger=reforger
         )
-
-        # TODO: Shouldn't create a message and immediately edit
-        await self._set_quick(ctx, event, terrain, faction, zeus, quiet=True)
+        self._fill_quick(event, terrain, faction, zeus)
+        if mods:
+            event.mods = mods
+        await batch.commit()
 
         msg_zeus = f" with Zeus {zeus.display_name}" if zeus else ""
         if not quiet:
@@ -434,7 +519,7 @@ class CommandListener(Cog):
         Example: createside2quick 2019-01-01 Altis USMC Stroker
                  createside2quick 2019-01-01 Altis USMC Stroker 17:30
         """  # NOQA
-        event = await self._create_quick(
+        await self._create_quick(
             ctx,
             _datetime,
             terrain,
@@ -443,9 +528,8 @@ class CommandListener(Cog):
             _time,
             sideop=True,
             platoon_size="WW2side",
+            mods=WW2_MODS,
         )
-        if WW2_MODS:
-            await self._set_mods(ctx, event, WW2_MODS)
 
     @command(aliases=["mc"])
     async def multicreate(
@@ -507,8 +591,6 @@ class CommandListener(Cog):
             await ctx.send(message)
             return
 
-        self.bot.awaiting_reply = True
-
         def pred(m):
             return m.author == ctx.message.author and m.channel == ctx.channel
 
@@ -516,28 +598,25 @@ class CommandListener(Cog):
         with_time = [datetime.combine(day, event_time) for day in days]
 
         try:
-            while True:
-                response = await self.bot.wait_for("message", check=pred)
-                reply = response.content.lower()
-
-                if reply == "ok":
-                    await ctx.send("Creating events")
-                    for day in with_time:
-                        await self._create_event(
-                            ctx, day, batch=True, reforger=True, silent=True
-                        )
-                    await msgFnc.sortEventMessages(self.bot)
-                    await ctx.send("Done creating events")
-                    self.bot.awaiting_reply = False
-                    return
-                if reply == "cancel":
-                    await ctx.send("Canceling")
-                    self.bot.awaiting_reply = False
-                    return
-                await ctx.send("Please reply with `ok` or `cancel`.")
+            with self.bot.jobs.prompt(ctx.author.id, ctx.channel.id):
+                while True:
+                    response = await self.bot.wait_for("message", check=pred)
+                    reply = response.content.lower()
+                    if reply in ("ok", "cancel"):
+                        break
+                    await ctx.send("Please reply with `ok` or `cancel`.")
+
+            if reply == "ok":
+                await ctx.send("Creating events")
+                batch = EventBatch(self.bot)
+                for day in with_time:
+                    batch.add(day, reforger=True)
+                await batch.commit()
+                await ctx.send(f"Done creating events: {batch.summary()}")
+            else:
+                await ctx.send("Canceling")
         except Exception:  # pylint: disable=broad-except
             await ctx.send(f"```py\n{traceback.format_exc()}\n```")
-            self.bot.awaiting_reply = False
 
     @command(aliases=["csz"])
     async def changesize(self, ctx: Context, event: ArgEvent, new_size: str):
@@ -564,11 +643,9 @@ class CommandListener(Cog):
             await ctx.send(f"Invalid new size {new_size}")
             return
 
-        for event in EventDatabase.events.values():
-            print("converting", event)
-            await self._change_size(ctx, event, new_size)
-        await ctx.send("All events resized succesfully")
-        EventDatabase.toJson()
+        await run_bulk(
+            ctx, self.bot, "Resize", lambda event: event.changeSize(new_size)
+        )
 
     @command(aliases=["ro"])
     async def reorder(self, ctx: Context, event: ArgEvent):
@@ -584,19 +661,7 @@ class CommandListener(Cog):
 
     @command(aliases=["roa"])
     async def resizeall(self, ctx: Context):
-        for event in EventDatabase.events.values():
-            print("reordering", event)
-            ret = event.reorder()
-            if ret is None:
-                await ctx.send(f"{event}: nothing to be done")
-                continue
-            if ret.strip() != "":
-                await ctx.send(ret)
-
-            await update_event(event, self.bot, export=False)
-            await ctx.send(f"Event {event} reordered succesfully")
-        await ctx.send("All events reordered succesfully")
-        EventDatabase.toJson()
+        await run_bulk(ctx, self.bot, "Reorder", lambda event: event.reorder())
 
     async def _add_role(self, event: Event, rolename: str, batch=False):
         try:
@@ -712,6 +777,7 @@ class CommandListener(Cog):
         for reaction in event.getReactionsOfGroup(groupName):
             await eventMessage.remove_reaction(reaction, self.bot.user)
         event.removeRoleGroup(groupName)
+        event_changed(event)
         await msgFnc.updateMessageEmbed(eventMessage, event)
         EventDatabase.toJson()  # Update JSON file
         await ctx.send(f"Group {groupName} removed from {event}")
@@ -743,9 +809,10 @@ class CommandListener(Cog):
         """
         # Change date
         event.date = _datetime
+        event_changed(event)
 
         # Update event and sort events, export
-        await msgFnc.sortEventMessages(self.bot)
+        await self._sort_events(ctx)
         await ctx.send(
             f"Date {event.date} set for operation {event.title} ID {event.id}"
         )
@@ -760,9 +827,10 @@ class CommandListener(Cog):
         """
         # Change time
         event.time = event_time
+        event_changed(event)
 
         # Update event and sort events, export
-        await msgFnc.sortEventMessages(self.bot)
+        await self._sort_events(ctx)
         await ctx.send(f"Time set for operation {event}")
         await show_event(ctx, event, self.bot)
 
@@ -890,6 +958,21 @@ class CommandListener(Cog):
         """
         await self._set_mods(ctx, event, "")
 
+    @command(aliases=["mod"])
+    async def mods(self, ctx: Context, event: ArgEvent):
+        """Show event mods.
+
+        Lists the mods also when the list is too long for the event embed.
+
+        Example: mods 1
+        """
+        if not event.mods:
+            await ctx.send(f"No mods set for operation {event}")
+            return
+        await ctx.send(f"Mods for operation {event}:")
+        for chunk in split_message(event.mods, limit=1980):
+            await ctx.send(f"```\n{chunk}\n```")
+
     @command(aliases=["sdlc"])
     async def setdlc(self, ctx: Context, event: ArgEvent, *, dlc: UnquotedStr):
         """Set event DLC.
@@ -933,6 +1016,15 @@ class CommandListener(Cog):
         """
         await set_reforger(ctx, event, self.bot, reforger)
 
+    @staticmethod
+    def _fill_quick(
+        event: Event, terrain: str, faction: str, zeus: Member | None = None
+    ):
+        event.terrain = terrain
+        event.faction = faction
+        if zeus is not None:
+            event.signup(event.findRoleWithName(cfg.EMOJI_ZEUS), zeus, replace=True)
+
     async def _set_quick(
         self,
         ctx: Context,
@@ -943,10 +1035,8 @@ class CommandListener(Cog):
         _time: ArgTime | None = None,
         quiet=False,
     ):
-        event.terrain = terrain
-        event.faction = faction
-        if zeus is not None:
-            event.signup(event.findRoleWithName(cfg.EMOJI_ZEUS), zeus, replace=True)
+        self._fill_quick(event, terrain, faction, zeus)
+        event_changed(event)
 
         message = await msgFnc.getEventMessage(event, self.bot)
         await msgFnc.updateMessageEmbed(message, event)
@@ -1062,6 +1152,8 @@ class CommandListener(Cog):
     async def _delete(self, event: Event, archived=False):
         # TODO: Move to a more appropriate location
         EventDatabase.removeEvent(event.id, archived=archived)
+        if not archived:
+            history.forget(event.id)
         try:
             eventMessage = await msgFnc.getEventMessage(
                 event, self.bot, archived=archived
@@ -1093,22 +1185,83 @@ class CommandListener(Cog):
         await ctx.send(f"Event {event} removed from archive")
 
     @command(name="list", aliases=["ls"])
-    async def listEvents(self, ctx: Context):
-        msg = ""
-        if not EventDatabase.events:
-            await ctx.send("No events in the database")
-            return
+    async def listEvents(self, ctx: Context, *filters: str):
+        """List the active events, optionally filtered.
 
-        for event in EventDatabase.events.values():
-            msg += f"{event}\n"
+        Filters: from=YYYY-MM-DD, to=YYYY-MM-DD, sideop=yes/no,
+        reforger=yes/no, dlc=yes/no, cancelled=yes/no, terrain=text,
+        faction=text, title=text
 
-        await ctx.send(msg)
+        Example: list
+                 list from=2024-01-01 to=2024-01-31 sideop=no
+                 list terrain=Altis
+        """
+        await self._list(ctx, EventDatabase.index, filters, "events in the database")
+
+    @command(aliases=["lsa"])
+    async def listarchive(self, ctx: Context, *filters: str):
+        """List the archived events, optionally filtered.
+
+        Takes the same filters as `list`.
+
+        Example: listarchive from=2024-01-01 terrain=Altis
+        """
+        await self._list(ctx, EventDatabase.archiveIndex, filters, "archived events")
+
+    @command()
+    async def search(self, ctx: Context, *, query: str):
+        """Search the active and the archived events.
+
+        Words without a field are searched from the terrain, faction, title,
+        description, mods and DLC. Fields: terrain, faction, title,
+        description, mods, dlc, zeus and user. Zeus and user take a mention,
+        a user ID or a full user name. All terms have to match.
+
+        Example: search altis faction:usmc
+                 search zeus:@Username
+                 search user:"User Name" terrain:tanoa
+        """
+        start = perf_counter()
+        EventDatabase.search.refresh(EventDatabase.events.values())
+        try:
+            results = EventDatabase.search.search(query)
+        except ValueError as e:
+            raise BadArgument(str(e)) from e
+        elapsed = (perf_counter() - start) * 1000
+        if not results:
+            await ctx.send(f"No events found ({elapsed:.1f} ms)")
+            return
+        lines = [
+            f"{doc['line']}{' (archived)' if doc['archived'] else ''}"
+            for doc in results
+        ]
+        header = f"{len(results)} events found in {elapsed:.1f} ms, newest first"
+        pages = paginate(lines, cfg.LIST_PAGE_SIZE)
+        pages = [f"{header}\n\n{page}" for page in pages]
+        await send_paginated(ctx, self.bot, pages)
+
+    async def _list(
+        self, ctx: Context, index: SummaryIndex, filters: tuple[str, ...], name: str
+    ):
+        try:
+            summaries = index.query(parse_filters(filters))
+        except ValueError as e:
+            raise BadArgument(str(e)) from e
+        if not summaries:
+            matching = " matching the filters" if filters else ""
+            await ctx.send(f"No {name}{matching}")
+            return
+        lines = [summary.line for summary in summaries]
+        header = f"{len(summaries)} {name}"
+        pages = paginate(lines, cfg.LIST_PAGE_SIZE)
+        pages = [f"{header}\n\n{page}" for page in pages]
+        await send_paginated(ctx, self.bot, pages)
 
     # sort events command
     @command()
     async def sort(self, ctx: Context):
         """Sort events (manually)."""
-        await msgFnc.sortEventMessages(self.bot)
+        await self._sort_events(ctx)
         await ctx.send("Events sorted")
 
     # export to json
@@ -1141,8 +1294,34 @@ class CommandListener(Cog):
             data = event.getRoleGroup(roleGroup).toJson(brief_output=True)
         else:
             data = event.toJson(brief_output=True)
+        await self._send_yaml(ctx, data, "event.yaml")
 
-        await ctx.send(f"```yaml\n{yaml.dump(data, sort_keys=False)}```")
+    @command()
+    async def dumpmany(self, ctx: Context, *events: ArgEvent):
+        """Dump multiple events as a single YAML document for mass editing.
+
+        The document maps the event IDs to the event data. Use `loadmany` to
+        import the data back in after editing.
+
+        Example: dumpmany 0 1 2
+        """
+        if not events:
+            raise BadArgument("No events given")
+        data = {event.id: event.toJson(brief_output=True) for event in events}
+        await self._send_yaml(ctx, data, "events.yaml")
+
+    @staticmethod
+    async def _send_yaml(ctx: Context, data: dict, filename: str):
+        # PyYAML is only needed by dump and load, importing it lazily to keep
+        # it out of the startup path
+        import yaml  # pylint: disable=import-outside-toplevel
+
+        text = yaml.dump(data, sort_keys=False)
+        if len(text) > 1980:
+            # Too long for a message, sending as an attachment instead
+            await ctx.send(file=File(BytesIO(text.encode("utf-8")), filename))
+        else:
+            await ctx.send(f"```yaml\n{text}```")
 
     @command()
     async def load(self, ctx: Context, event: ArgEvent, *, data: str):
@@ -1152,7 +1331,9 @@ class CommandListener(Cog):
         remove existing roles and role groups, to change the basic details of
         the operation and to rename additional roles. Note: this command cannot
         create new roles or sign up users to roles, userName is displayed in
-        the output of `dump` only for convenience.
+        the output of `dump` only for convenience. The changes are listed
+        before they are applied, and the event message is only updated if
+        the loaded data changes it.
 
         Example: load 0
                  `\u200b`\u200b`yaml
@@ -1169,24 +1350,94 @@ class CommandListener(Cog):
         # help messages
         if ctx.guild is None:
             raise CommandError("This command can only be used in a server")
-        await self._load(
-            ctx, event, data, ctx.guild.emojis, cast(TextChannel, ctx.channel)
-        )
+        emojis = ctx.guild.emojis
+        loaded_data = self._parse_yaml(data)
+        reactions = event.getReactions()
+        changes = self._check_load(event, loaded_data, emojis)
+        if not changes:
+            await ctx.send("No changes")
+            return
+        await self._send_changes(ctx, event, changes)
+        self._apply_load(event, loaded_data, emojis)
+        if await self._push_load(event, reactions):
+            # Display the loaded event in the command channel
+            await msgFnc.createEventMessage(
+                event, cast(TextChannel, ctx.channel), update_id=False
+            )
+        EventDatabase.toJson()
         await ctx.send("Event data loaded")
 
-    async def _load(
-        self,
-        _: Context,
-        event: Event,
-        data: str,
-        emojis: tuple[Emoji, ...],
-        target: TextChannel | None = None,
-    ):
+    @command()
+    async def loadmany(self, ctx: Context, *, data: str = ""):
+        """Load the data of multiple events as a single YAML document.
+
+        The document maps the event IDs to the event data (or to the data of
+        a single role group), as produced by `dumpmany`. The document can also
+        be attached as a file. All events are checked before any of them is
+        changed, and only the events whose data changed are updated.
+
+        Example: loadmany
+                 `\u200b`\u200b`yaml
+                 1:
+                   title: Operation One
+                 2:
+                   title: Operation Two
+                 `\u200b`\u200b`
+        """
+        if ctx.guild is None:
+            raise CommandError("This command can only be used in a server")
+        emojis = ctx.guild.emojis
+        attachments = getattr(ctx.message, "attachments", [])
+        if not data and attachments:
+            data = (await attachments[0].read()).decode("utf-8")
+        loaded = self._parse_yaml(data)
+        if not isinstance(loaded, dict):
+            raise BadArgument("Expected a mapping of event IDs to event data")
+
+        events: dict[int, tuple[Event, dict]] = {}
+        for event_id, loaded_data in loaded.items():
+            event = await ArgEvent.convert(ctx, str(event_id))
+            events[event.id] = (event, loaded_data)
+
+        # Check all events before changing any of them
+        changed: dict[int, list[str]] = {}
+        for event, loaded_data in events.values():
+            changes = self._check_load(event, loaded_data, emojis)
+            if changes:
+                changed[event.id] = changes
+        if not changed:
+            await ctx.send("No changes")
+            return
+        for event_id, changes in changed.items():
+            await self._send_changes(ctx, events[event_id][0], changes)
+
+        def apply(event: Event) -> Optional[str]:
+            self._apply_load(event, events[event.id][1], emojis)
+            return ""
+
+        await run_bulk(
+            ctx,
+            self.bot,
+            "Load",
+            apply,
+            [events[event_id][0] for event_id in changed],
+        )
+
+    @staticmethod
+    def _parse_yaml(data: str):
+        data = data.strip()
         if data.startswith("```") and data.endswith("```"):
             # Remove the first line (containing ```yaml) and the last three
             # characters (containing ```)
-            data = data.strip()[3:-3].split("\n", 1)[1].strip()
-        loaded_data = yaml.safe_load(data)
+            data = data[3:-3].split("\n", 1)[1].strip()
+        import yaml  # pylint: disable=import-outside-toplevel
+
+        return yaml.safe_load(data)
+
+    @staticmethod
+    def _apply_load(event: Event, loaded_data: dict, emojis: tuple[Emoji, ...]):
+        if not isinstance(loaded_data, dict):
+            raise ValueError("Malformed data")
         if "roleGroups" in loaded_data:
             event.fromJson(event.id, loaded_data, emojis, manual_load=True)
         elif "roles" in loaded_data:
@@ -1195,10 +1446,42 @@ class CommandListener(Cog):
             roleGroup.fromJson(loaded_data, emojis, manual_load=True)
         else:
             raise ValueError("Malformed data")
-        if target:
-            # Display the loaded event in the command channel
-            await msgFnc.createEventMessage(event, target, update_id=False)
-        await update_event(event, self.bot)
+
+    def _check_load(
+        self, event: Event, loaded_data: dict, emojis: tuple[Emoji, ...]
+    ) -> list[str]:
+        """List the changes the loaded data would make to the event.
+
+        The data is loaded into a copy of the event first so that malformed
+        data raises an error before the event itself is modified.
+        """
+        before = json.loads(json.dumps(event.toJson(brief_output=True)))
+        scratch = build_event(event.id, event.toJson())
+        self._apply_load(scratch, loaded_data, emojis)
+        after = json.loads(json.dumps(scratch.toJson(brief_output=True)))
+        return describe(before, diff(before, after))
+
+    @staticmethod
+    async def _send_changes(ctx: Context, event: Event, changes: list[str]):
+        text = "\n".join([f"Changes to {event}:"] + changes)
+        for chunk in split_message(text, limit=1980):
+            await ctx.send(f"```{chunk}```")
+
+    async def _push_load(self, event: Event, reactions: list) -> bool:
+        """Update the event message if the embed or the reactions changed.
+
+        Returns True if the message was updated.
+        """
+        # Checking the embed without consuming the cached hash, the update
+        # below needs to see the change too
+        embed_hash = event.embed_hash
+        embed_changed = event.createEmbed() is not None
+        event.embed_hash = embed_hash
+        if embed_changed or event.getReactions() != reactions:
+            await update_event(event, self.bot, export=False)
+            return True
+        event_changed(event)
+        return False
 
     # @command()
     # async def createmessages(self, ctx: Context):
@@ -1224,13 +1507,161 @@ class CommandListener(Cog):
         EventDatabase.toJson()
         await ctx.send("Event messages synced")
 
+    @command()
+    async def undo(self, ctx: Context, event: ArgEvent, version: Optional[int] = None):
+        """Restore an earlier version of the event.
+
+        Restores the title, details and roles of the event, keeping the
+        signups of the roles that exist in the restored version. Defaults to
+        the version before the latest change. The undo itself is recorded as a
+        new version and can be undone. See `history` for the versions.
+
+        Example: undo 1
+                 undo 1 3
+        """
+        try:
+            restored, lost = history.restore(event, version)
+        except ValueError as e:
+            await ctx.send(str(e))
+            return
+        await update_event(restored, self.bot)
+        await ctx.send(f"Restored {restored}")
+        if lost:
+            await ctx.send(
+                "Signups removed because their roles do not exist in the "
+                f"restored version: {', '.join(lost)}"
+            )
+        await show_event(ctx, restored, self.bot)
+
+    @command(name="history")
+    async def eventHistory(self, ctx: Context, event: ArgEvent):
+        """Show the versions of the event available for `undo`.
+
+        Example: history 1
+        """
+        versions = history.log(event.id)
+        if len(versions) <= 1:
+            await ctx.send(f"No earlier versions of {event}")
+            return
+        lines = [f"Versions of {event}, newest first:"]
+        for number, timestamp, change in versions:
+            if timestamp:
+                changed = datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M")
+                lines.append(f"{number}: {changed} `{change}`")
+            else:
+                lines.append(f"{number}: oldest available version")
+        for chunk in split_message("\n".join(lines)):
+            await ctx.send(chunk)
+
+    @command()
+    async def jobs(self, ctx: Context):
+        """List the running commands and operations with their elapsed time."""
+        jobs = [
+            str(job)
+            for job in self.bot.jobs.jobs.values()
+            if job is not ctx.job and job.partition == partitions.current()
+        ]
+        if not jobs:
+            await ctx.send("No running jobs")
+            return
+        for chunk in split_message("\n".join(jobs)):
+            await ctx.send(f"```{chunk}```")
+
+    @command()
+    async def canceljob(self, ctx: Context, jobID: int):
+        """Cancel a running command or operation.
+
+        Changes already made by the operation are kept.
+
+        Example: canceljob 3
+        """
+        job = self.bot.jobs.cancel(jobID)
+        if job is None:
+            await ctx.send(f"No running job with ID {jobID}")
+            return
+        await ctx.send(f"Cancelled job {job}")
+
+    @command()
+    async def stats(self, ctx: Context):
+        """Show the bot metrics (latencies, counters and event counts)."""
+        summary = metrics.registry.summary()
+        if len(summary) > 1990:
+            summary = summary[:1980] + "\n[...]"
+        await ctx.send(f"```{summary}```")
+
+    @command(name="analytics")
+    async def analyticsReport(
+        self, ctx: Context, report: str = "attendance", top: int = 10
+    ):
+        """Show participation statistics of the archived events.
+
+        Reports:
+            attendance: users with the most events attended
+            streaks: users with the longest runs of consecutive events
+            roles: the most popular roles
+            fillrate: share of the roles filled per weekday
+            sizefillrate: share of the roles filled per platoon size
+
+        Example: analytics
+                 analytics streaks 20
+        """
+        if report in ("attendance", "streaks"):
+            results = analytics.report(report)[:top]
+            unit = "events" if report == "attendance" else "in a row"
+            lines = [
+                f"{rank}. {analytics.user_name(user)}: {count} {unit}"
+                for rank, (user, count) in enumerate(results, 1)
+            ]
+        elif report == "roles":
+            results = analytics.report("role_frequency")[:top]
+            lines = [
+                f"{rank}. {role}: {count}"
+                for rank, (role, count) in enumerate(results, 1)
+            ]
+        elif report in ("fillrate", "sizefillrate"):
+            by = "weekday" if report == "fillrate" else "size"
+            lines = [
+                f"{label}: {rate:.0%} of roles filled ({events} events)"
+                for label, events, rate in analytics.report("fill_rates", by)
+            ]
+        else:
+            raise BadArgument(f"Unknown report: {report}")
+        if not lines:
+            await ctx.send("No signups in the archive")
+            return
+        for chunk in split_message("\n".join(lines)):
+            await ctx.send(f"```{chunk}```")
+
+    @command()
+    async def signupstats(self, ctx: Context, eventID: Optional[int] = None):
+        """Show how fast the events fill up, per event type or for one event.
+
+        Shows the share of roles filled 7 days, 3 days, 1 day and right before
+        the start, how long before the start the events were full and the
+        share of signups that were withdrawn.
+
+        Example: signupstats
+                 signupstats 1
+        """
+        if eventID is None:
+            lines = tracker.report()
+        else:
+            lines = tracker.event_report(eventID)
+        if not lines:
+            await ctx.send("No signups recorded")
+            return
+        for chunk in split_message("\n".join(lines)):
+            await ctx.send(f"```{chunk}```")
+
     @command()
     async def shutdown(self, ctx: Context):
         """Shut down the bot."""
         await ctx.send("Shutting down")
-        print("logging out")
+        if tracker.dirty:
+            tracker.save()
+        logging.info("Logging out")
         await self.bot.logout()
-        print("exiting")
+        logging.info("Exiting")
         sys.exit()
 
     # TODO: Test commands
@@ -1287,12 +1718,11 @@ class CommandListener(Cog):
                 "commandListener: Received error message that's over 2000 "
                 "characters, check the log for the full error."
             )
-            logging.error("Message:", clean_content)
+            logging.error(f"Message: {clean_content}")
             msg = f"{msg[:1990]} [...]```"
         await ctx.send(msg)
 
 
 def setup(bot: OperationBot):
     # importlib.reload(Event)
-    importlib.reload(cfg)
     bot.add_cog(CommandListener(bot))
@@ -1,13 +1,30 @@
-from typing import cast
+import asyncio
+import json
+import logging
+import time
+from typing import Callable, Iterable, Optional, cast
 
 from discord.channel import TextChannel
+from discord.errors import HTTPException
 from discord.ext.commands import Context
 
+from operationbot import config as cfg
 from operationbot import messageFunctions as msgFnc
 from operationbot.bot import OperationBot
 from operationbot.errors import MessageNotFound
 from operationbot.event import Event
 from operationbot.eventDatabase import EventDatabase
+from operationbot.history import build_event, history
+
+
+def event_changed(event: Event):
+    """Record a change made to an event by a command.
+
+    Adds a new version to the event history and refreshes the summary of the
+    event used by the listing commands.
+    """
+    history.commit(event)
+    EventDatabase.index.update(event)
 
 
 async def update_event(
@@ -36,6 +53,7 @@ async def update_event(
         # Event instance might have changed because of DB import, get again
         event = EventDatabase.getEventByMessage(event.messageID)
 
+    event_changed(event)
     changed = False
     try:
         message = await msgFnc.getEventMessage(event, bot)
@@ -48,6 +66,7 @@ async def update_event(
     await msgFnc.updateReactions(event=event, message=message, reorder=reorder)
     if export:
         EventDatabase.toJson()
+        history.save_changes()
     return changed
 
 
@@ -119,3 +138,206 @@ async def set_reforger(ctx: Context, event: Event, bot: OperationBot, reforger:
         f"Reforger {'enabled' if event.reforger else 'disabled'} for operation {event}"
     )
     await show_event(ctx, event, bot)
+
+
+def split_message(text: str, limit: int = 1990) -> list[str]:
+    """Split a text to chunks that fit into a Discord message.
+
+    Splits at line boundaries, lines longer than the limit are cut.
+    """
+    chunks: list[str] = []
+    chunk = ""
+    for line in text.splitlines():
+        line = line[:limit]
+        if chunk and len(chunk) + len(line) + 1 > limit:
+            chunks.append(chunk)
+            chunk = ""
+        chunk = f"{chunk}\n{line}" if chunk else line
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+class BulkResult:
+    """Outcome of a bulk operation over multiple events."""
+
+    def __init__(self):
+        self.updated: list[Event] = []
+        self.unchanged: list[Event] = []
+        self.failed: list[tuple[Event, Exception]] = []
+        self.warnings: list[str] = []
+
+    def summary(self, action: str) -> str:
+        lines = [
+            f"{action}: {len(self.updated)} updated, "
+            f"{len(self.unchanged)} unchanged, {len(self.failed)} failed"
+        ]
+        lines.extend(self.warnings)
+        lines.extend(f"Failed {event}: {error}" for event, error in self.failed)
+        return "\n".join(lines)
+
+
+async def run_bulk(
+    ctx: Context,
+    bot: OperationBot,
+    action: str,
+    apply: Callable[[Event], Optional[str]],
+    events: Optional[Iterable[Event]] = None,
+    reorder=True,
+    concurrency: Optional[int] = None,
+) -> BulkResult:
+    """Apply a change to multiple events and update their messages.
+
+    The change is first applied to all events in memory, after which the
+    messages of the changed events are updated by a pool of `concurrency`
+    workers. A single progress message is edited while the messages are
+    updated, the database is saved once at the end and a summary is sent to
+    the context.
+
+    Args:
+        ctx (Context): Context to send the progress and the summary to
+        bot (OperationBot): The main bot instance
+        action (str): Name of the operation shown in the messages
+        apply (Callable[[Event], Optional[str]]): Function changing a single
+            event. Returns None if the event was left unchanged, otherwise a
+            (possibly empty) warning message.
+        events (Iterable[Event], optional): Events to change. Defaults to all
+            active events.
+        reorder (bool, optional): Reorder the message reactions. Defaults to
+            True.
+        concurrency (int, optional): Number of concurrent message updates.
+            Defaults to `config.BULK_CONCURRENCY`.
+
+    Returns:
+        BulkResult: The updated, unchanged and failed events.
+    """
+    if events is None:
+        events = EventDatabase.events.values()
+    events = list(events)
+    if concurrency is None:
+        concurrency = cfg.BULK_CONCURRENCY
+    result = BulkResult()
+
+    # Commands locking single events wait until the bulk operation is done
+    async with bot.jobs.lock(events):
+        changed: list[Event] = []
+        for event in events:
+            snapshot = json.loads(json.dumps(event.toJson()))
+            try:
+                warning = apply(event)
+            except Exception as e:  # pylint: disable=broad-except
+                logging.exception(f"{action} failed for {event}")
+                # Roll back the partial change so that it is not saved with
+                # the other events while the message still shows the old one
+                EventDatabase.events[event.id] = build_event(event.id, snapshot)
+                result.failed.append((event, e))
+                continue
+            if warning is None:
+                result.unchanged.append(event)
+                continue
+            if warning.strip():
+                result.warnings.append(f"{event}: {warning.strip()}")
+            changed.append(event)
+
+        total = len(changed)
+        job = bot.jobs.current()
+        progress = await ctx.send(f"{action}: updating {total} events")
+        last_edit = time.monotonic()
+        done = 0
+        queue: asyncio.Queue[Event] = asyncio.Queue()
+        for event in changed:
+            queue.put_nowait(event)
+
+        async def report_progress():
+            nonlocal last_edit
+            if time.monotonic() - last_edit < cfg.BULK_PROGRESS_INTERVAL:
+                return
+            last_edit = time.monotonic()
+            await progress.edit(content=f"{action}: {done}/{total} events updated")
+
+        def update_status():
+            if job is not None:
+                job.status = f"{action}: {done}/{total} events updated"
+
+        async def worker():
+            nonlocal done
+            while not queue.empty():
+                event = queue.get_nowait()
+                try:
+                    await update_event(event, bot, reorder=reorder, export=False)
+                except Exception as e:  # pylint: disable=broad-except
+                    logging.exception(f"{action}: failed to update {event}")
+                    result.failed.append((event, e))
+                else:
+                    result.updated.append(event)
+                done += 1
+                update_status()
+                await report_progress()
+
+        update_status()
+        workers = max(min(concurrency, total), 1)
+        await asyncio.gather(*(worker() for _ in range(workers)))
+        EventDatabase.toJson()
+        history.save_changes()
+
+    await progress.edit(content=f"{action}: {total}/{total} events processed")
+    for chunk in split_message(result.summary(action)):
+        await ctx.send(chunk)
+    return result
+
+
+PREVIOUS_PAGE = "\N{BLACK LEFT-POINTING TRIANGLE}"
+NEXT_PAGE = "\N{BLACK RIGHT-POINTING TRIANGLE}"
+
+
+async def send_paginated(
+    ctx: Context, bot: OperationBot, pages: list[str], timeout: Optional[float] = None
+):
+    """Send pages as a single message that can be paged with reactions.
+
+    Only the author of the command can turn the pages. The reactions are
+    removed after `timeout` seconds without paging.
+    """
+    if timeout is None:
+        timeout = cfg.PAGE_TIMEOUT
+    total = len(pages)
+
+    def render(number: int) -> str:
+        footer = f"\nPage {number + 1}/{total}" if total > 1 else ""
+        return f"```{pages[number]}```{footer}"
+
+    current = 0
+    message = await ctx.send(render(current))
+    if total <= 1:
+        return message
+    for emoji in (PREVIOUS_PAGE, NEXT_PAGE):
+        await message.add_reaction(emoji)
+
+    def check(payload) -> bool:
+        return (
+            payload.message_id == message.id
+            and payload.user_id == ctx.author.id
+            and str(payload.emoji) in (PREVIOUS_PAGE, NEXT_PAGE)
+        )
+
+    while True:
+        try:
+            payload = await bot.wait_for(
+                "raw_reaction_add", check=check, timeout=timeout
+            )
+        except asyncio.TimeoutError:
+            break
+        step = 1 if str(payload.emoji) == NEXT_PAGE else -1
+        current = (current + step) % total
+        await message.edit(content=render(current))
+        try:
+            await message.remove_reaction(payload.emoji, ctx.author)
+        except HTTPException:
+            # Missing the permission to manage messages, the user has to
+            # remove their reaction by themselves
+            pass
+    try:
+        await message.clear_reactions()
+    except HTTPException:
+        pass
+    return message
@@ -23,10 +23,40 @@ else:
     # If set to 0, the bot uses Command Channel's guild
     EMOJI_GUILD = 0
 
+# Additional units served by the same bot process, by the partition name. Each
+# partition has its own channels and stores its database files in a
+# subdirectory named after the partition, e.g.
+# "other": {"event_channel": 1, "archive_channel": 2, "command_channel": 3,
+#           "log_channel": 4, "emoji_guild": 0}
+PARTITIONS: Dict[str, Dict[str, int]] = {}
+
+# Number of gateway shards the bot runs as, one process per shard started with
+# --shard-id. The shards share the event state and the leases through a SQLite
+# database. The lease of an event (and of the leader role running the tasks)
+# expires after SHARD_LEASE_TIME seconds unless renewed.
+SHARD_COUNT = 1
+SHARD_STORE = "database/shards.sqlite"
+SHARD_LEASE_TIME = 30
+SHARD_LEADER_CHECK_DELAY = 10
+
 JSON_FILEPATH = {
     "events": "database/events.json",
     "archive": "database/archive.json",
+    "cache": "database/cache.json",
+    "history": "database/history.json",
+    "search": "database/search.json",
+    "signups": "database/signups.json",
 }
+# Trust the cached message state on startup and verify the event messages in
+# the background instead of syncing them before accepting signups
+WARM_START = True
+# Record the handled gateway events (reactions, messages and commands) for
+# replaying them offline, e.g. "database/gateway.jsonl.gz". Empty to disable.
+GATEWAY_RECORDING = ""
+# Serve the bot metrics in the Prometheus text format at
+# http://METRICS_HOST:METRICS_PORT/metrics. Set the port to 0 to disable.
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = 0
 ADDITIONAL_ROLE_EMOJIS = [
     "\N{DIGIT ONE}\N{VARIATION SELECTOR-16}\N{COMBINING ENCLOSING KEYCAP}",
     "\N{DIGIT TWO}\N{VARIATION SELECTOR-16}\N{COMBINING ENCLOSING KEYCAP}",
@@ -238,6 +268,50 @@ CANCEL_CHECK_DELAY = 60
 CANCEL_AUTOMATICALLY = True
 CANCEL_THRESHOLD = timedelta(hours=24)
 
+# Maximum delay in seconds before the queued log channel entries are sent as
+# batched messages. Late signoff pings are sent immediately.
+LOG_FLUSH_INTERVAL = 5
+
+# Number of event messages updated concurrently by the bulk commands (e.g.
+# changesizeall) and the minimum delay between the progress message edits
+BULK_CONCURRENCY = 4
+BULK_PROGRESS_INTERVAL = 5
+
+# Number of events per page in the listing commands and the time in seconds the
+# pages can be turned
+LIST_PAGE_SIZE = 15
+PAGE_TIMEOUT = 120
+
+# Signup actions kept per event and the number of events tracked for the
+# fill rate statistics, and the delay between saving them
+SIGNUP_TRACKER_LENGTH = 512
+SIGNUP_TRACKER_EVENTS = 200
+SIGNUP_TRACKER_SAVE_DELAY = 60
+
+# Number of earlier versions kept in the undo history of each event
+HISTORY_LENGTH = 50
+
+# Interval in seconds between the stack samples of `!profile start` and the
+# time in seconds after which the profiler stops by itself
+PROFILE_SAMPLE_INTERVAL = 0.005
+PROFILE_MAX_DURATION = 600
+
+# Level of the bot log and of each subsystem by the logger name, e.g.
+# "operationbot.event": "DEBUG". The log is written to LOG_FILE (stdout if
+# empty) as text or, with LOG_FORMAT = "json", as JSON lines.
+LOG_LEVEL = "INFO"
+LOG_LEVELS: Dict[str, str] = {
+    "discord": "INFO",
+    "discord.gateway": "WARNING",
+}
+LOG_FORMAT = "text"
+LOG_FILE = ""
+
+# Interval in seconds between the event loop lag samples, and the time in
+# seconds the loop can be blocked before the blocking code is logged
+LOOP_LAG_INTERVAL = 0.5
+LOOP_BLOCK_THRESHOLD = 0.25
+
 OVERHAUL_MODS = "https://zeusops.com/overhaul"
 
 MULTICREATE_WEEKEND = [6, 7]
@@ -0,0 +1,159 @@
+"""Reloading of the configuration at runtime.
+
+The code keeps reading the settings from the `config` module. `ConfigWatcher`
+reloads the module, validates the new settings against the previous ones and
+notifies the subscribers of the settings that changed, so that only the state
+depending on them is refreshed: the platoon templates, the event embeds, the
+tasks reading a setting only on start and the bot channels. An invalid
+configuration is rejected and the previous settings are kept.
+"""
+
+import importlib
+import logging
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    FrozenSet,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+
+from operationbot import config as cfg
+
+Callback = Callable[[Set[str]], None]
+
+# The settings shown in the event embeds
+EMBED_SETTINGS = frozenset(
+    {
+        "ALWAYS_DISPLAY_ATTENDANCE",
+        "DLC_TERRAINS",
+        "EMBED_COLOR",
+        "OVERHAUL_MODS",
+        "PORT_DEFAULT",
+        "TIME_ZONE",
+    }
+)
+# The settings of the bot channels
+CHANNEL_SETTINGS = frozenset(
+    {
+        "COMMAND_CHANNEL",
+        "EVENT_ARCHIVE_CHANNEL",
+        "EVENT_CHANNEL",
+        "LOG_CHANNEL",
+        "PARTITIONS",
+    }
+)
+# The settings that are only read on startup
+RESTART_SETTINGS = frozenset(
+    {
+        "EMOJI_GUILD",
+        "GATEWAY_RECORDING",
+        "JSON_FILEPATH",
+        "SHARD_COUNT",
+        "SHARD_STORE",
+        "VERSION",
+        "WARM_START",
+    }
+)
+
+
+def snapshot() -> Dict[str, Any]:
+    """Return the current settings by name."""
+    return {name: value for name, value in vars(cfg).items() if name.isupper()}
+
+
+def validate(old: Dict[str, Any], new: Dict[str, Any]) -> List[str]:
+    """Check the new settings against the previous ones.
+
+    Returns a description of each problem found.
+    """
+    errors = []
+    for name, value in old.items():
+        if name not in new:
+            errors.append(f"{name} is missing")
+        elif type(new[name]) is not type(value):
+            errors.append(
+                f"{name} should be {type(value).__name__}, "
+                f"not {type(new[name]).__name__}"
+            )
+    if errors:
+        return errors
+    for size in new["PLATOON_SIZES"]:
+        for layout in ("DEFAULT_GROUPS", "DEFAULT_ROLES"):
+            if size not in new[layout]:
+                errors.append(f"Platoon size {size} is missing from {layout}")
+    for key in old["EMBED_COLOR"]:
+        color = new["EMBED_COLOR"].get(key)
+        if not isinstance(color, int) or not 0 <= color <= 0xFFFFFF:
+            errors.append(f"EMBED_COLOR[{key!r}] is not a valid color")
+    return errors
+
+
+class ConfigWatcher:
+    """Reloads the configuration and notifies the subscribers of changes."""
+
+    def __init__(self):
+        self._subscribers: List[Tuple[Optional[FrozenSet[str]], Callback]] = []
+
+    def subscribe(self, settings: Optional[Iterable[str]], callback: Callback):
+        """Call `callback` with the changed settings when any of them changes.
+
+        With `settings` set to None, the callback is called on every change.
+        Subscribing the same callback to the same settings again does nothing.
+        """
+        subscriber = (frozenset(settings) if settings is not None else None, callback)
+        if subscriber not in self._subscribers:
+            self._subscribers.append(subscriber)
+
+    def reload(self) -> Set[str]:
+        """Reload the config module and notify the subscribers.
+
+        Returns the names of the changed settings. Raises ValueError and keeps
+        the previous settings if the new configuration is invalid.
+        """
+        old = snapshot()
+        # Reloading keeps the names missing from the new module, remove them
+        # first so that a removed setting is noticed
+        for name in old:
+            delattr(cfg, name)
+        try:
+            importlib.reload(cfg)
+        except Exception as e:
+            self._restore(old)
+            raise ValueError(f"Failed to load the configuration: {e}") from e
+        new = snapshot()
+        errors = validate(old, new)
+        if errors:
+            self._restore(old)
+            raise ValueError("Invalid configuration:\n" + "\n".join(errors))
+        changed = {
+            name for name, value in new.items() if name not in old or old[name] != value
+        }
+        if changed:
+            logging.info(f"Reloaded the configuration: {', '.join(sorted(changed))}")
+        self.notify(changed)
+        return changed
+
+    def notify(self, changed: Set[str]):
+        for settings, callback in list(self._subscribers):
+            affected = changed if settings is None else changed & settings
+            if not affected:
+                continue
+            try:
+                callback(set(affected))
+            except Exception:
+                logging.exception(f"Failed to apply the config change to {callback}")
+
+    def _restore(self, settings: Dict[str, Any]):
+        for name in list(vars(cfg)):
+            if name.isupper() and name not in settings:
+                delattr(cfg, name)
+        for name, value in settings.items():
+            setattr(cfg, name, value)
+
+
+config_watcher = ConfigWatcher()
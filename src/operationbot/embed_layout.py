@@ -0,0 +1,119 @@
+"""Fitting the event embeds into the Discord embed limits.
+
+Discord rejects an embed edit if a field value is over 1024 characters, the
+embed has more than 25 fields or the text of the whole embed is over 6000
+characters. The event embed is laid out against these limits before it is
+sent: role groups too long for a single field continue in the following
+fields, and when the whole embed is still too large the parts that can be
+looked up elsewhere are shortened, so the edits never fail because of the
+size of the event.
+"""
+
+from typing import List, Tuple
+
+TITLE_LIMIT = 256
+DESCRIPTION_LIMIT = 4096
+FIELD_COUNT_LIMIT = 25
+FIELD_NAME_LIMIT = 256
+FIELD_VALUE_LIMIT = 1024
+FOOTER_LIMIT = 2048
+TOTAL_LIMIT = 6000
+
+# Name of the continuation fields of a group, displayed as an empty line
+CONTINUATION = "\N{ZERO WIDTH SPACE}"
+ELLIPSIS = "\N{HORIZONTAL ELLIPSIS}"
+
+# The name, value and inline flag of an embed field
+Field = Tuple[str, str, bool]
+
+
+def truncate(text: str, limit: int) -> str:
+    """Cut the text to the limit, marking the cut with an ellipsis.
+
+    >>> truncate("abcdef", 4)
+    'abc…'
+    """
+    if len(text) <= limit:
+        return text
+    return text[: limit - 1] + ELLIPSIS
+
+
+def split_value(value: str, limit: int = FIELD_VALUE_LIMIT) -> List[str]:
+    r"""Split a field value at line boundaries into values under the limit.
+
+    >>> split_value("a\nb\nc\n", limit=4)
+    ['a\nb', 'c']
+    """
+    if len(value) <= limit:
+        return [value]
+    values: List[str] = []
+    chunk = ""
+    for line in value.splitlines():
+        line = truncate(line, limit)
+        if chunk and len(chunk) + len(line) + 1 > limit:
+            values.append(chunk)
+            chunk = ""
+        chunk = f"{chunk}\n{line}" if chunk else line
+    if chunk:
+        values.append(chunk)
+    return values
+
+
+def group_fields(name: str, value: str, inline: bool) -> List[Field]:
+    """Lay out a role group as one field, continued in more if needed."""
+    return [
+        (name if number == 0 else CONTINUATION, chunk, inline)
+        for number, chunk in enumerate(split_value(value))
+    ]
+
+
+def size(title: str, description: str, fields: List[Field], footer: str) -> int:
+    """Count the characters of the embed towards the total limit."""
+    return (
+        len(title)
+        + len(description)
+        + sum(len(name) + len(value) for name, value, _ in fields)
+        + len(footer)
+    )
+
+
+def problems(
+    title: str, description: str, fields: List[Field], footer: str
+) -> List[str]:
+    """Describe the limits the embed exceeds."""
+    found = []
+    if len(title) > TITLE_LIMIT:
+        found.append("title too long")
+    if len(description) > DESCRIPTION_LIMIT:
+        found.append("description too long")
+    if len(fields) > FIELD_COUNT_LIMIT:
+        found.append("too many fields")
+    for name, value, _ in fields:
+        if len(name) > FIELD_NAME_LIMIT or len(value) > FIELD_VALUE_LIMIT:
+            found.append(f"field {name} too long")
+    if len(footer) > FOOTER_LIMIT:
+        found.append("footer too long")
+    if size(title, description, fields, footer) > TOTAL_LIMIT:
+        found.append("embed too long")
+    return found
+
+
+def fit(
+    title: str, description: str, fields: List[Field], footer: str
+) -> Tuple[str, str, List[Field]]:
+    """Shorten the embed until it is within the limits.
+
+    The parts over their own limits are cut first, then the last fields are
+    dropped and only then the description is cut further.
+    """
+    title = truncate(title, TITLE_LIMIT)
+    description = truncate(description, DESCRIPTION_LIMIT)
+    fields = [
+        (truncate(name, FIELD_NAME_LIMIT), truncate(value, FIELD_VALUE_LIMIT), inline)
+        for name, value, inline in fields
+    ][:FIELD_COUNT_LIMIT]
+    while fields and size(title, description, fields, footer) > TOTAL_LIMIT:
+        fields.pop()
+    available = TOTAL_LIMIT - len(title) - len(footer)
+    description = truncate(description, max(available, 1))
+    return title, description, fields
@@ -32,3 +32,7 @@ class UnknownEmoji(Exception):
 
 class EventUpdateFailed(Exception):
     pass
+
+
+class LeaseNotAcquired(Exception):
+    pass
@@ -7,13 +7,21 @@ import discord
 from discord import Embed, Emoji
 
 from operationbot import config as cfg
+from operationbot import embed_layout, metrics
 from operationbot.additional_role_group import AdditionalRoleGroup
-from operationbot.config import EMBED_COLOR, OVERHAUL_MODS
 from operationbot.errors import RoleError, RoleGroupNotFound, RoleNotFound, RoleTaken
+from operationbot.platoon_templates import get_template
 from operationbot.role import Role
 from operationbot.roleGroup import RoleGroup
+from operationbot.secret import COMMAND_CHAR as CMD
 from operationbot.secret import PLATOON_SIZE
 
+log = logging.getLogger(__name__)
+
+CREATE_EMBED_SECONDS = metrics.registry.histogram(
+    "operationbot_create_embed_seconds", "Time spent creating event embeds"
+)
+
 TITLE = "Operation"
 REFORGER = "Reforger"
 SIDEOP_TITLE = "Side Operation"
@@ -83,10 +91,10 @@ class Event:
         if self.platoon_size.startswith("WW2"):
             self.title = "WW2 " + self.title
 
-        self.normalEmojis = self._getNormalEmojis(guildEmojis)
+        template = get_template(self.platoon_size, guildEmojis)
+        self.normalEmojis = template.emojis
         if not importing:
-            self._add_default_role_groups()
-            self._add_default_roles()
+            self.roleGroups = template.instantiate()
 
     @property
     def additional_role_count(self) -> int:
@@ -95,24 +103,24 @@ class Event:
     @property
     def color(self) -> int:
         if self.cancelled:
-            return EMBED_COLOR["CANCELLED"]
+            return cfg.EMBED_COLOR["CANCELLED"]
         if self.overhaul:
-            return EMBED_COLOR["OVERHAUL"]
+            return cfg.EMBED_COLOR["OVERHAUL"]
         if self.reforger and self.dlc and self.sideop:
-            return EMBED_COLOR["REFORGER_DLC_SIDEOP"]
+            return cfg.EMBED_COLOR["REFORGER_DLC_SIDEOP"]
         if self.reforger and self.dlc:
-            return EMBED_COLOR["REFORGER_DLC"]
+            return cfg.EMBED_COLOR["REFORGER_DLC"]
         if self.reforger and self.sideop:
-            return EMBED_COLOR["REFORGER_SIDEOP"]
+            return cfg.EMBED_COLOR["REFORGER_SIDEOP"]
         if self.dlc and self.sideop:
-            return EMBED_COLOR["DLC_SIDEOP"]
+            return cfg.EMBED_COLOR["DLC_SIDEOP"]
         if self.dlc:
-            return EMBED_COLOR["DLC"]
+            return cfg.EMBED_COLOR["DLC"]
         if self.sideop:
-            return EMBED_COLOR["SIDEOP"]
+            return cfg.EMBED_COLOR["SIDEOP"]
         if self.reforger:
-            return EMBED_COLOR["REFORGER"]
-        return EMBED_COLOR["DEFAULT"]
+            return cfg.EMBED_COLOR["REFORGER"]
+        return cfg.EMBED_COLOR["DEFAULT"]
 
     @property
     def title(self) -> str:
@@ -156,12 +164,14 @@ class Event:
             raise ValueError(f"Unsupported new platoon size: {new_size}")
 
         def _moveRole(roleName, sourceGroup: RoleGroup, targetGroupName=None):
-            print("sourcegroup", type(sourceGroup), sourceGroup.name)
             msg = ""
             role = sourceGroup[roleName]
-            print(
-                f"moving role {roleName} from {sourceGroup.name} to "
-                f"{targetGroupName}"
+            log.debug(
+                "Moving role %s from %s to %s",
+                roleName,
+                sourceGroup.name,
+                targetGroupName,
+                extra={"event_id": self.id},
             )
             if targetGroupName is None:
                 if role.userID is not None:
@@ -169,16 +179,24 @@ class Event:
                         f"Warning: removing an active role {role} "
                         f"from {sourceGroup.name}, {self}"
                     )
-                    print("removing active role")
+                    log.debug("Removing active role", extra={"event_id": self.id})
                 sourceGroup.removeRole(roleName)
             else:
                 if targetGroupName not in self.roleGroups:
-                    print("creating target group")
+                    log.debug(
+                        "Creating target group %s",
+                        targetGroupName,
+                        extra={"event_id": self.id},
+                    )
                     self.roleGroups[targetGroupName] = RoleGroup(targetGroupName)
                 self.roleGroups[targetGroupName][roleName] = role
                 self.roleGroups[sourceGroup.name].removeRole(roleName)
             if not self.roleGroups[sourceGroup.name]:
-                print("deleting target group")
+                log.debug(
+                    "Deleting source group %s",
+                    sourceGroup.name,
+                    extra={"event_id": self.id},
+                )
                 del self.roleGroups[sourceGroup.name]
             return msg
 
@@ -197,25 +215,25 @@ class Event:
                 sourceGroup = self.roleGroups["Battalion"]
                 msg = _moveRole("ZEUS", sourceGroup, "Company")
                 if msg != "":
-                    print(msg)
+                    log.warning(msg)
                     warnings += msg + "\n"
 
                 sourceGroup = self.roleGroups["Company"]
                 for roleName in ["FAC", "RTO"]:
                     msg = _moveRole(roleName, sourceGroup, "1st Platoon")
                     if msg != "":
-                        print(msg)
+                        log.warning(msg)
                         warnings += msg + "\n"
                 sourceGroup = self.roleGroups["Company"]
                 msg = _moveRole("CO", sourceGroup, None)
                 if msg != "":
-                    print(msg)
+                    log.warning(msg)
                     warnings += msg + "\n"
 
                 sourceGroup = self.roleGroups["2nd Platoon"]
                 msg = _moveRole("2PLT", self.roleGroups["2nd Platoon"], None)
                 if msg != "":
-                    print(msg)
+                    log.warning(msg)
                     warnings += msg + "\n"
 
                 targetGroup = _getTargetGroup(new_groups)
@@ -224,7 +242,7 @@ class Event:
                 for roleName in ["ESL", "E1"]:
                     msg = _moveRole(roleName, sourceGroup, targetGroup)
                     if msg != "":
-                        print(msg)
+                        log.warning(msg)
                         warnings += msg + "\n"
 
                 targetGroup = _getTargetGroup(new_groups)
@@ -238,7 +256,8 @@ class Event:
                 if signupFound:
                     for roleName in ["FSL", "F1"]:
                         msg = _moveRole(roleName, sourceGroup, targetGroup)
-                        print(msg)
+                        if msg != "":
+                            log.warning(msg)
                         warnings += msg + "\n"
                 else:
                     del self.roleGroups[sourceGroupName]
@@ -286,15 +305,16 @@ class Event:
             except KeyError:
                 group = RoleGroup("Dummy")
                 msg = f"Could not find group {groupName}"
-                print(msg)
+                log.warning(msg)
                 warnings += msg + "\n"
             newGroups[groupName] = group
         self.roleGroups = newGroups
         return warnings
 
     # Return an embed for the event
+    @metrics.timed(CREATE_EMBED_SECONDS)
     def createEmbed(self, cache=True) -> Embed | None:
-        logging.info(f"Creating embed for {self}")
+        log.debug("Creating embed for %s", self, extra={"event_id": self.id})
         date_tz = self.date.replace(tzinfo=cfg.TIME_ZONE)
         date = date_tz.strftime(f"%a %Y-%m-%d - %H:%M {date_tz.tzname()}")
         title = f"{self.title} ({date})"
@@ -322,32 +342,34 @@ class Event:
                 mods = f"\n\nMods: {self.mods}\n"
         else:
             mods = ""
-        description = (
+        details = (
             f"Local time: {local_time} ({relative_time})\n"
             f"Terrain: {self.terrain} - Faction: {self.faction}"
             f"{server_port}"
             f"{reforger_note}"
             f"{dlc_note}"
             f"{event_description}"
-            f"{mods}"
         )
-        eventEmbed = Embed(title=title, description=description, colour=self.color)
+        description = f"{details}{mods}"
         hash_string = f"{title}\n{description}\n{self.color}\n"
 
         # Add field to embed for every rolegroup
+        fields: list[embed_layout.Field] = []
         for group in self.roleGroups.values():
             if len(group.roles) > 0:
-                eventEmbed.add_field(
-                    name=group.name, value=str(group), inline=group.isInline
+                fields += embed_layout.group_fields(
+                    group.name, str(group), group.isInline
                 )
                 hash_string += (
                     f"{hash_string}{group.name} {str(group)} " f"{group.isInline}\n"
                 )
             elif group.name.startswith("Dummy"):
-                eventEmbed.add_field(
-                    name="\N{ZERO WIDTH SPACE}",
-                    value="\N{ZERO WIDTH SPACE}",
-                    inline=group.isInline,
+                fields.append(
+                    (
+                        embed_layout.CONTINUATION,
+                        embed_layout.CONTINUATION,
+                        group.isInline,
+                    )
                 )
                 hash_string += f"{hash_string}{group.name}\n"
 
@@ -356,34 +378,38 @@ class Event:
         else:
             attendees = ""
         footer_text = f"{attendees}Event ID: {str(self.id)}"
+        problems = embed_layout.problems(title, description, fields, footer_text)
+        if problems:
+            # The mod list can be looked up with a command, the rest of the
+            # embed is only cut if it is still too large without it
+            if mods:
+                mods = f"\n\nMods: too many to list, see `{CMD}mods {self.id}`\n"
+            description = f"{details}{mods}"
+            title, description, fields = embed_layout.fit(
+                title, description, fields, footer_text
+            )
+            log.warning(
+                "Embed of %s over the limits (%s), shortened it",
+                self,
+                ", ".join(problems),
+                extra={"event_id": self.id},
+            )
+        eventEmbed = Embed(title=title, description=description, colour=self.color)
+        for name, value, inline in fields:
+            eventEmbed.add_field(name=name, value=value, inline=inline)
         eventEmbed.set_footer(text=footer_text)
         hash_string += f"{hash_string}{footer_text}\n"
         embed_hash = hashlib.sha256(hash_string.encode("utf-8")).hexdigest()
         if cache:
             if embed_hash == self.embed_hash:
-                logging.info("Embed is unchanged, not updating")
+                log.debug("Embed is unchanged, not updating")
                 return None
-            logging.info("Cached embed is changed, updating")
+            log.debug("Cached embed is changed, updating")
             self.embed_hash = embed_hash
         else:
-            logging.info("Ignoring cache")
+            log.debug("Ignoring cache")
         return eventEmbed
 
-    # Add default role groups
-    def _add_default_role_groups(self):
-        for group in cfg.DEFAULT_GROUPS[self.platoon_size]:
-            self.roleGroups[group] = RoleGroup(group)
-        self.roleGroups["Additional"] = AdditionalRoleGroup()
-
-    # Add default roles
-    def _add_default_roles(self):
-        for name, groupName in cfg.DEFAULT_ROLES[self.platoon_size].items():
-            # Only add role if the group exists
-            if groupName in self.roleGroups:
-                emoji = self.normalEmojis[name]
-                newRole = Role(name, emoji, False)
-                self.roleGroups[groupName].addRole(newRole)
-
     # Add an additional role to the event
     def addAdditionalRole(self, name: str) -> str:
         # check if this role already exists
@@ -470,23 +496,13 @@ class Event:
         if self._mods:
             return self._mods
         if self.overhaul:
-            return OVERHAUL_MODS
+            return cfg.OVERHAUL_MODS
         return MODS
 
     @mods.setter
     def mods(self, mods):
         self._mods = mods
 
-    # Get emojis for normal roles
-    def _getNormalEmojis(self, guildEmojis: tuple[Emoji, ...]) -> dict[str, Emoji]:
-        normalEmojis = {}
-
-        for emoji in guildEmojis:
-            if emoji.name in cfg.DEFAULT_ROLES[self.platoon_size]:
-                normalEmojis[emoji.name] = emoji
-
-        return normalEmojis
-
     def getReactions(self) -> list[str | Emoji]:
         """Return reactions of all roles and extra reactions"""
         if self.cancelled:
@@ -688,7 +704,7 @@ class Event:
                 self.attendees.append(User(int(userID), name))
 
         # TODO: Handle missing roleGroups
-        groups: list[str] = []
+        groups: set[str] = set()
         for groupName, roleGroupData in data["roleGroups"].items():
             if not manual_load:
                 # Only create new role groups if we're not loading data
@@ -700,7 +716,7 @@ class Event:
                 self.roleGroups[groupName] = roleGroup
             else:
                 roleGroup = self.roleGroups[groupName]
-                groups.append(groupName)
+                groups.add(groupName)
             roleGroup.fromJson(roleGroupData, emojis, manual_load)
         if manual_load:
             # Remove role groups that were not present in imported data
@@ -1,37 +1,57 @@
 import json
+import logging
 import os
 from datetime import date, datetime, timedelta
-from typing import Any, Dict, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple, cast
 
 from discord import Emoji
 
 from operationbot import config as cfg
+from operationbot import metrics, partitions, warm_cache
 from operationbot.errors import EventNotFound
 from operationbot.event import Event
+from operationbot.event_index import SummaryIndex
+from operationbot.search_index import SearchIndex
+from operationbot.shards import coordinator
+
+log = logging.getLogger(__name__)
+
+SAVE_SECONDS = metrics.registry.histogram(
+    "operationbot_database_save_seconds",
+    "Time spent saving the event database to disk",
+    ["database"],
+)
 
 DATABASE_VERSION = 4
 
 
-class EventDatabase:
-    """Represents a database containing current events."""
+class EventStore:
+    """Represents a database containing the events of a partition.
 
-    events: Dict[int, Event] = {}
-    eventsArchive: Dict[int, Event] = {}
-    nextID: int = 0
-    _emojis: Optional[Tuple[Emoji, ...]] = None
+    Use the `EventDatabase` proxy for accessing the database of the current
+    partition.
+    """
+
+    def __init__(self, partition: str = partitions.DEFAULT):
+        self.partition = partition
+        self.events: Dict[int, Event] = {}
+        self.eventsArchive: Dict[int, Event] = {}
+        self.nextID: int = 0
+        self._emojis: Optional[Tuple[Emoji, ...]] = None
+        # Summaries of the active and the archived events for listing
+        self.index = SummaryIndex()
+        self.archiveIndex = SummaryIndex()
+        # Full-text search over the active and the archived events
+        self.search = SearchIndex()
 
-    # FIXME: class properties will be deprecated in Python 3.11,
-    # find an alternative
-    @classmethod  # type: ignore
     @property
-    def emojis(cls) -> Tuple[Emoji, ...]:
-        if cls._emojis is None:
+    def emojis(self) -> Tuple[Emoji, ...]:
+        if self._emojis is None:
             raise ValueError("No EventDatabase.emojis set")
-        return cls._emojis
+        return self._emojis
 
-    @classmethod
     def createEvent(
-        cls,
+        self,
         event_date: datetime,
         eventID: int = -1,
         sideop=False,
@@ -43,8 +63,8 @@ class EventDatabase:
         Does not create a message for the event.
         """
         if eventID == -1:
-            eventID = cls.nextID
-            cls.nextID += 1
+            eventID = self.nextID
+            self.nextID += 1
             importing = False
         else:
             importing = True
@@ -52,7 +72,7 @@ class EventDatabase:
         # Create event
         event = Event(
             event_date,
-            cls.emojis,  # type: ignore
+            self.emojis,
             eventID=eventID,
             importing=importing,
             sideop=sideop,
@@ -61,66 +81,76 @@ class EventDatabase:
         )
 
         # Store event
-        cls.events[eventID] = event
+        self.events[eventID] = event
+        self.index.update(event)
 
         return event
 
-    @classmethod
-    def archiveEvent(cls, event: Event):
+    def archiveEvent(self, event: Event):
         """Move event to archive.
 
         Does not remove or create messages.
         """
-        # Remove event from events
-        cls.removeEvent(event.id)
+        self.archiveEvents([event])
+
+    def archiveEvents(self, events: List[Event]):
+        """Move events to archive, saving the database once.
 
-        # Add event to eventsArchive
-        cls.eventsArchive[event.id] = event
-        cls.toJson(archive=False)
-        cls.toJson(archive=True)
+        Does not remove or create messages.
+        """
+        for event in events:
+            # Remove event from events
+            self.removeEvent(event.id)
 
-    @classmethod
-    def cancel_event(cls, event: Event):
+            # Add event to eventsArchive
+            self.eventsArchive[event.id] = event
+            self.archiveIndex.update(event)
+            self.search.add(event, archived=True)
+        self.toJson(archive=False)
+        self.toJson(archive=True)
+
+    def cancel_event(self, event: Event):
         """Cancel event."""
         event.cancelled = True
+        self.index.update(event)
 
-    @classmethod
-    def removeEvent(cls, eventID: int, archived=False) -> Optional[Event]:
+    def removeEvent(self, eventID: int, archived=False) -> Optional[Event]:
         """Remove event.
 
         Does not remove the message associated with the event.
         """
-        events = cls.events if not archived else cls.eventsArchive
+        events = self.events if not archived else self.eventsArchive
+        index = self.index if not archived else self.archiveIndex
+        index.remove(eventID)
+        self.search.remove(eventID)
         return events.pop(eventID, None)
 
     # was: findEvent
-    @classmethod
-    def getEventByMessage(cls, messageID: int, archived=False) -> Event:
+    def getEventByMessage(self, messageID: int, archived=False) -> Event:
         """Finds an event with its message ID.
 
         Raises EventNotFound if event cannot be found
         """
         if archived:
-            collection = cls.eventsArchive
+            collection = self.eventsArchive
         else:
-            collection = cls.events
+            collection = self.events
 
         for event in collection.values():
             if event.messageID == messageID:
                 return event
         raise EventNotFound(f"No event found with message ID {messageID}")
 
-    @classmethod
-    def get_event_by_date(cls, event_date: date, archived=False) -> Event:
+    def get_event_by_date(self, event_date: date, archived=False) -> Event:
         """Find an event based on its date.
 
         Raises EventNotFound if an event cannot be found and ValueError if
         there are multiple events on the same date.
         """
         if archived:
-            collection = cls.eventsArchive
+            collection = self.eventsArchive
         else:
-            collection = cls.events
+            collection = self.events
 
         events = list(
             filter(lambda event: event.date.date() == event_date, collection.values())
@@ -135,46 +165,42 @@ class EventDatabase:
             )
         return events[0]
 
-    @classmethod
-    def getEventByID(cls, eventID: int, archived=False) -> Event:
+    def getEventByID(self, eventID: int, archived=False) -> Event:
         """Finds an event with its ID.
 
         Raises EventNotFound if event cannot be found.
         """
         if archived:
-            collection = cls.eventsArchive
+            collection = self.eventsArchive
         else:
-            collection = cls.events
+            collection = self.events
 
         try:
             return collection[eventID]
         except KeyError as e:
             raise EventNotFound(f"No event found with ID {eventID}") from e
 
-    @classmethod
-    def getArchivedEventByMessage(cls, messageID: int) -> Event:
+    def getArchivedEventByMessage(self, messageID: int) -> Event:
         """Finds an archived event with its message ID.
 
         Raises EventNotFound if event cannot be found
         """
-        return cls.getEventByMessage(messageID, archived=True)
+        return self.getEventByMessage(messageID, archived=True)
 
     # was: findEventInArchiveeventid
-    @classmethod
-    def getArchivedEventByID(cls, eventID: int):
+    def getArchivedEventByID(self, eventID: int):
         """Finds an archived event with its ID.
 
         Raises EventNotFound if event cannot be found.
         """
-        return cls.getEventByID(eventID, archived=True)
+        return self.getEventByID(eventID, archived=True)
 
-    @classmethod
-    def sortEvents(cls):
+    def sortEvents(self):
         sortedEvents: list[Event] = []
         messageIDs: list[int] = []
 
         # Store existing events
-        for event in cls.events.values():
+        for event in self.events.values():
             sortedEvents.append(event)
             messageIDs.append(event.messageID)
 
@@ -183,7 +209,7 @@ class EventDatabase:
         messageIDs.sort(reverse=True)
 
         # Fill events again
-        cls.events = {}
+        self.events = {}
         for event in sortedEvents:
             # event = sortedEvents[index]
             new_id = messageIDs.pop()
@@ -192,66 +218,102 @@ class EventDatabase:
                 # If the message ID has changed, the new message needs a new
                 # embed
                 event.embed_hash = ""
-            cls.events[event.id] = event
+            self.events[event.id] = event
 
-    @classmethod
-    def archive_past_events(cls, delta: timedelta = timedelta()) -> list[Event]:
+    def archive_past_events(self, delta: timedelta = timedelta()) -> list[Event]:
         """Move events with the date in the past to the archive
 
+        Events leased by another shard are left for the next run.
+
         Returns a list of the archived events
         """
-        archived = []
-
-        for event in cls.events.values():
-            # TODO: check timezones
-            if datetime.now() - event.date > delta:
-                archived.append(event)
-        # Archiving in a separate loop to prevent modifying cls.events while
-        # looping over it
+        self.refresh()
+        # TODO: check timezones
+        cutoff = datetime.now() - delta
+        archived = [
+            event
+            for event in self._events_before(cutoff)
+            if event.date < cutoff and coordinator.acquire(self.lease_name(event))
+        ]
+        if archived:
+            self.archiveEvents(archived)
         for event in archived:
-            cls.archiveEvent(event)
+            coordinator.release(self.lease_name(event))
 
         return archived
 
-    @classmethod
     def cancel_empty_events(
-        cls,
+        self,
         threshold: timedelta = timedelta(),
     ) -> list[Event]:
         """Cancel (archive) empty events a certain time before the event time.
 
         Returns a list of the cancelled events
         """
-        events: list[Event] = []
-
-        now = datetime.now(cfg.TIME_ZONE)
-        for event in cls.events.values():
-            if (
-                not event.cancelled
-                and event.date.astimezone(cfg.TIME_ZONE) - now < threshold
-                and event.is_empty()
-            ):
-                events.append(event)
-
-        # Using a separate loop to prevent modifying cls.events while looping
-        # over it
+        self.refresh()
+        # The event dates are compared as local times, convert the cutoff
+        # instead of every event date
+        cutoff = (datetime.now(cfg.TIME_ZONE) + threshold).astimezone()
+        cutoff = cutoff.replace(tzinfo=None)
+        events = [
+            event
+            for event in self._events_before(cutoff)
+            if not event.cancelled
+            and event.date < cutoff
+            and event.is_empty()
+            and coordinator.acquire(self.lease_name(event))
+        ]
+
         for event in events:
-            cls.cancel_event(event)
+            self.cancel_event(event)
 
-        cls.toJson(archive=False)
+        if events:
+            self.toJson(archive=False)
+        for event in events:
+            coordinator.release(self.lease_name(event))
 
         return events
 
-    @classmethod
-    def toJson(cls, archive=False):
-        # TODO: rename to saveDatabase
-        events = cls.events if not archive else cls.eventsArchive
-        filename = cfg.JSON_FILEPATH["events" if not archive else "archive"]
+    def _events_before(self, cutoff: datetime) -> List[Event]:
+        """Find the active events dated before the cutoff.
 
-        cls.writeJson(events, filename)
+        Walks the date ordered index only up to the cutoff, the order is
+        only sorted again after the events have changed.
+        """
+        found = []
+        for summary in self.index.sorted():
+            if summary.date >= cutoff:
+                break
+            event = self.events.get(summary.id)
+            if event is not None:
+                found.append(event)
+        return found
+
+    def toJson(self, archive=False):
+        # TODO: rename to saveDatabase
+        events = self.events if not archive else self.eventsArchive
+        filename = partitions.path("events" if not archive else "archive")
+
+        with SAVE_SECONDS.labels("archive" if archive else "events").time():
+            self.writeJson(events, filename)
+            if archive:
+                self.search.save()
+            if not archive and cfg.WARM_START and self._emojis is not None:
+                warm_cache.save_cache(events, self._emojis)
+            if coordinator.active:
+                self._share(archive)
+
+    def _share(self, archive: bool):
+        """Save the events to the store shared with the other shards."""
+        events = self.events if not archive else self.eventsArchive
+        coordinator.save(
+            self.partition,
+            {eventID: event.toJson() for eventID, event in events.items()},
+            archive,
+            self.nextID,
+        )
 
-    @classmethod
-    def writeJson(cls, events: Dict[int, Event], filename: str):
+    def writeJson(self, events: Dict[int, Event], filename: str):
         # Get eventsData
         eventsData = {}
         for messageID, event in events.items():
@@ -260,36 +322,80 @@ class EventDatabase:
         # Store data and return
         data: Dict[str, Any] = {}
         data["version"] = DATABASE_VERSION
-        data["nextID"] = cls.nextID
+        data["nextID"] = self.nextID
         data["events"] = eventsData
 
         os.makedirs(os.path.dirname(filename), exist_ok=True)
         with open(filename, "w") as jsonFile:
             json.dump(data, jsonFile, indent=2)
 
-    @classmethod
-    def loadDatabase(cls, emojis: Optional[Tuple[Emoji, ...]] = None):
-        if cls._emojis is None:
+    def loadDatabase(self, emojis: Optional[Tuple[Emoji, ...]] = None):
+        if self._emojis is None:
             if emojis is None:
                 raise ValueError("No emojis provided")
-            cls._emojis = emojis
-        print("Importing events")
-        cls.events, cls.nextID = cls.readJson(cfg.JSON_FILEPATH["events"])
-        print("Importing archive")
-        cls.eventsArchive, _ = cls.readJson(
-            cfg.JSON_FILEPATH["archive"], output_events=False
+            self._emojis = emojis
+        log.info("Importing events", extra={"partition": self.partition})
+        self.events, self.nextID = self.readJson(partitions.path("events"))
+        log.info("Importing archive", extra={"partition": self.partition})
+        self.eventsArchive, _ = self.readJson(
+            partitions.path("archive"), output_events=False
         )
+        if coordinator.active:
+            if coordinator.has_events(self.partition):
+                log.info("Importing events from the shard store")
+                # The store is up to date, the files are only a snapshot
+                self.events, self.eventsArchive = {}, {}
+                self.nextID = 0
+                self.refresh(rebuild=False)
+            else:
+                # The first shard to start seeds the store
+                self._share(archive=False)
+                self._share(archive=True)
+        self.rebuildIndexes(search=False)
+        if not self.search.load(self.eventsArchive):
+            log.info("Indexing archive for search")
+            self.search.rebuild(self.eventsArchive.values())
+            self.search.save()
+
+    def refresh(self, rebuild=True) -> bool:
+        """Apply the event changes saved by the other shards.
+
+        Replaces the instances of the changed events. Returns True if any
+        events changed.
+        """
+        if not coordinator.active:
+            return False
+        changes = coordinator.changes(self.partition)
+        for eventID, archived, data in changes:
+            self.events.pop(eventID, None)
+            self.eventsArchive.pop(eventID, None)
+            if data is not None:
+                events = self.eventsArchive if archived else self.events
+                events[eventID] = self._buildEvent(eventID, data)
+        self.nextID = max(self.nextID, coordinator.next_id(self.partition))
+        if changes and rebuild:
+            self.rebuildIndexes(search=any(archived for _, archived, _ in changes))
+        return bool(changes)
+
+    def lease_name(self, event: Event) -> str:
+        """Name of the shard lease for changing the event."""
+        return f"{self.partition}:{event.id}"
+
+    def rebuildIndexes(self, search=True):
+        self.index.rebuild(self.events.values())
+        self.archiveIndex.rebuild(self.eventsArchive.values())
+        if search:
+            self.search.rebuild(self.eventsArchive.values())
 
-    @classmethod
     def readJson(
-        cls, filename: str, output_events=True
+        self, filename: str, output_events=True
     ) -> Tuple[Dict[int, Event], int]:
         """Fill events and eventsArchive with data from JSON."""
-        print("Importing")
+        log.info("Importing %s", filename)
 
         # Try to access emojis early so that we immediately bail out on error
         # We don't need to touch the database file if emojis is not set
-        emojis = cls.emojis
+        self.emojis  # pylint: disable=pointless-statement
 
         # Import events
         try:
@@ -297,16 +403,18 @@ class EventDatabase:
                 with open(filename) as jsonFile:
                     data: Dict = json.load(jsonFile)
             except json.decoder.JSONDecodeError as e:
-                print("Malformed JSON file! Backing up and creating an empty database")
+                log.error(
+                    "Malformed JSON file! Backing up and creating an empty database"
+                )
                 backup_date = datetime.now().strftime("%Y-%m-%dT%H-%M-%S")
                 # Backup old file
                 backupName = f"{filename}-{backup_date}.bak"
                 os.rename(filename, backupName)
-                print("Backed up to", backupName)
+                log.warning(f"Backed up to {backupName}")
                 # Let next handler create the file and continue importing
                 raise FileNotFoundError from e
         except FileNotFoundError:
-            print("JSON not found, creating")
+            log.warning("JSON not found, creating")
             os.makedirs(os.path.dirname(filename), exist_ok=True)
             with open(filename, "w") as jsonFile:
                 # Create a new file with empty JSON structure inside
@@ -320,7 +428,7 @@ class EventDatabase:
                     indent=2,
                 )
             # Try to import again
-            return cls.readJson(filename)
+            return self.readJson(filename)
 
         databaseVersion = int(data.get("version", 0))
         if databaseVersion != DATABASE_VERSION:
@@ -328,7 +436,7 @@ class EventDatabase:
                 "Incorrect database version. Expected: "
                 f"{DATABASE_VERSION}, got: {databaseVersion}."
             )
-            print(msg)
+            log.error(msg)
             raise ValueError(msg)
 
         events = {}
@@ -340,16 +448,34 @@ class EventDatabase:
             (int(_id), _data) for _id, _data in eventsData.items()
         ]:
             # Create event
-            event_date = datetime.strptime(eventData["date"], "%Y-%m-%d")
-            # NOTE: Ignoring the type here because mypy is buggy and doesn't
-            # detect class properties correctly
-            event = Event(event_date, emojis, importing=True)  # type: ignore
-            event.fromJson(eventID, eventData, emojis)
+            event = self._buildEvent(eventID, eventData)
             events[event.id] = event
 
-        if output_events:
+        if output_events and log.isEnabledFor(logging.DEBUG):
             for eventID, event in events.items():
-                print(eventID, event)
+                log.debug("Imported %s", event, extra={"event_id": eventID})
 
-        print("Import done")
+        log.info(f"Imported {len(events)} events from {filename}")
         return events, nextID
+
+    def _buildEvent(self, eventID: int, eventData: Dict[str, Any]) -> Event:
+        event_date = datetime.strptime(eventData["date"], "%Y-%m-%d")
+        event = Event(event_date, self.emojis, importing=True)
+        event.fromJson(eventID, eventData, self.emojis)
+        return event
+
+
+# The database of the current partition
+EventDatabase = cast(EventStore, partitions.PartitionLocal(EventStore))
+
+
+def _stores() -> List[EventStore]:
+    return EventDatabase._all()  # type: ignore  # pylint: disable=protected-access
+
+
+metrics.registry.gauge("operationbot_events", "Number of active events").set_function(
+    lambda: sum(len(store.events) for store in _stores())
+)
+metrics.registry.gauge(
+    "operationbot_archived_events", "Number of archived events"
+).set_function(lambda: sum(len(store.eventsArchive) for store in _stores()))
@@ -1,63 +1,169 @@
-import importlib
+import logging
 from datetime import datetime, timedelta
-from typing import Optional, Union, cast
+from typing import Any, Dict, Optional, Union, cast
 
 from discord import Game, Message, RawReactionActionEvent
-from discord.ext.commands import Cog
+from discord.ext.commands import Cog, Context
 from discord.partial_emoji import PartialEmoji
 from discord.user import User
 
 from operationbot import config as cfg
 from operationbot import messageFunctions as msgFnc
+from operationbot import metrics, partitions, warm_cache
 from operationbot.bot import OperationBot
 from operationbot.errors import EventNotFound, RoleNotFound, RoleTaken, UnknownEmoji
 from operationbot.event import Event
 from operationbot.eventDatabase import EventDatabase
+from operationbot.recorder import recorder
 from operationbot.role import Role
+from operationbot.secret import COMMAND_CHAR as CMD
+from operationbot.shards import coordinator
+from operationbot.signup_tracker import tracker
+from operationbot.startup import profile
+
+log = logging.getLogger(__name__)
+
+REACTIONS = metrics.registry.counter(
+    "operationbot_reactions_total",
+    "Number of processed event message reactions",
+    ["action"],
+)
+REACTION_SECONDS = metrics.registry.histogram(
+    "operationbot_reaction_seconds", "Time spent handling a reaction"
+)
+reaction_rate = metrics.RateMeter(window=60)
+metrics.registry.gauge(
+    "operationbot_reactions_last_minute",
+    "Number of reactions processed during the last minute",
+).set_function(reaction_rate.rate)
 
 
 class EventListener(Cog):
     def __init__(self, bot: OperationBot):
         self.bot = bot
 
+    def export_state(self) -> Dict[str, Any]:
+        return {"reaction_rate": reaction_rate}
+
+    def import_state(self, state: Dict[str, Any]):
+        # Keep the reactions of the last minute counted across reloads
+        reaction_rate.merge(state["reaction_rate"])
+
     @Cog.listener()
     async def on_ready(self):
-        print("Waiting until ready")
-        await self.bot.wait_until_ready()
-        self.bot.fetch_data()
-        commandchannel = self.bot.commandchannel
+        log.info("Waiting until ready")
+        with profile.phase("wait_until_ready"):
+            await self.bot.wait_until_ready()
+        with profile.phase("fetch_data"):
+            await self.bot.fetch_data()
         if self.bot.user is None:
             raise ValueError("Bot failed to log in")
-        print(f"Logged in as {self.bot.user.name} {self.bot.user.id}")
-        print(f"Command channel: {commandchannel} on server {commandchannel.guild}")
+        log.info(f"Logged in as {self.bot.user.name} {self.bot.user.id}")
+        warm_starts = []
+        for partition in self.bot.partition_names:
+            with partitions.use(partition):
+                await self._import_partition()
+        # The commands can run while the messages are synced, the sync locks
+        # each event while checking its message
+        self.bot.processing = False
+        for partition in self.bot.partition_names:
+            with partitions.use(partition):
+                if await self._sync_partition():
+                    warm_starts.append(partition)
+        if cfg.GATEWAY_RECORDING and not recorder.active:
+            recorder.start(cfg.GATEWAY_RECORDING, EventDatabase.emojis)
+        await self.bot.change_presence(activity=Game(name=cfg.GAME))
+        self.bot.watch_config()
+        with profile.phase("start_tasks"):
+            self.bot.start_tasks()
+        log.info("Started the tasks")
+        if profile.enabled and not profile.finished:
+            log.info(profile.finish())
+        for partition in warm_starts:
+            with partitions.use(partition):
+                await self._verify_messages()
+
+    async def _import_partition(self):
+        """Import the events of the current partition."""
+        commandchannel = self.bot.commandchannel
+        log.info(
+            f"Command channel of partition {partitions.current()}: "
+            f"{commandchannel} on server {commandchannel.guild}"
+        )
         await commandchannel.send("Connected")
-        print("Ready, importing")
+        log.info("Ready, importing")
         await commandchannel.send("Importing events")
-        await self.bot.import_database()
-        await commandchannel.send("Syncing")
-        await msgFnc.syncMessages(EventDatabase.events, self.bot)
-        await commandchannel.send("Synced")
+        with profile.phase("import_database"):
+            await self.bot.import_database()
+
+    async def _sync_partition(self) -> bool:
+        """Sync the event messages of the current partition.
+
+        Returns True if the messages still need to be verified after a warm
+        start.
+        """
+        commandchannel = self.bot.commandchannel
+        warm_start = cfg.WARM_START and warm_cache.is_valid(
+            warm_cache.load_cache(), EventDatabase.events, EventDatabase.emojis
+        )
+        if warm_start:
+            await commandchannel.send("Warm start, verifying messages in background")
+        else:
+            await commandchannel.send("Syncing")
+            with profile.phase("syncMessages"), self.bot.jobs.track("startup sync"):
+                await msgFnc.syncMessages(EventDatabase.events, self.bot)
+            await commandchannel.send("Synced")
         msg = f"{len(EventDatabase.events)} events imported"
-        print(msg)
+        log.info(msg)
         await commandchannel.send(msg)
-        await self.bot.change_presence(activity=Game(name=cfg.GAME))
-        self.bot.start_tasks()
-        print("Logged in as", self.bot.user.name, self.bot.user.id)
-        self.bot.processing = False
+        return warm_start
+
+    async def _verify_messages(self):
+        """Sync the event messages after a warm start.
+
+        Signups are already accepted at this point. With a valid cache the
+        sync does not need to edit any messages, it only confirms that they
+        still exist and match the events.
+        """
+        log.info("Verifying event messages in the background")
+        try:
+            with self.bot.jobs.track("message verification"):
+                await msgFnc.syncMessages(EventDatabase.events, self.bot)
+        except Exception:  # pylint: disable=broad-except
+            log.exception("Background message verification failed")
+            await self.bot.commandchannel.send(
+                "Background message verification failed, check the log. "
+                f"Run `{CMD}syncmessages` to retry."
+            )
+        else:
+            log.info("Event messages verified")
 
     @Cog.listener()
     async def on_raw_reaction_add(self, payload: RawReactionActionEvent):
-        if (
-            payload.member == self.bot.user
-            or payload.channel_id != self.bot.eventchannel.id
-        ):
-            # Bot's own reaction, or reaction outside of the event channel
+        partition = self.bot.partition_of(payload.channel_id, "eventchannel")
+        if payload.member == self.bot.user or partition is None:
+            # Bot's own reaction, or reaction outside of the event channels
             return
 
+        with partitions.use(partition):
+            await self._process_reaction(payload)
+
+    async def _process_reaction(self, payload: RawReactionActionEvent):
+        recorder.record_reaction(payload, "event")
+
         if payload.emoji.name in cfg.IGNORED_EMOJIS:
+            REACTIONS.labels("ignored").inc()
             return
 
-        message: Message = await self.bot.eventchannel.fetch_message(payload.message_id)
+        reaction_rate.mark()
+        with REACTION_SECONDS.time():
+            await self._handle_reaction(payload)
+
+    async def _handle_reaction(self, payload: RawReactionActionEvent):
+        with msgFnc.FETCH_MESSAGE_SECONDS.time():
+            message: Message = await self.bot.eventchannel.fetch_message(
+                payload.message_id
+            )
         if message.author != self.bot.user:
             # We don't care about reactions to other messages than our own.
             # Makes it easier to test multiple bot instances on the same
@@ -69,16 +175,18 @@ class EventListener(Cog):
         await message.remove_reaction(payload.emoji, user)
 
         # Get event from database with message ID
+        EventDatabase.refresh()
         try:
             event: Event = EventDatabase.getEventByMessage(message.id)
         except EventNotFound as e:
-            print(e)
-            await self.bot.logchannel.send(
+            log.info(str(e), extra={"message_id": message.id, "user_id": user.id})
+            self.bot.log_sink.write(
+                self.bot.logchannel,
                 "NOTE: reaction to a non-existent event. "
                 f"msg: {message.id} role: {payload.emoji} "
                 f"user: {user.display_name} "
                 f"({user.name}#{user.discriminator})\n"
-                f"{message.jump_url}"
+                f"{message.jump_url}",
             )
             return
         else:
@@ -87,10 +195,17 @@ class EventListener(Cog):
             else:
                 emoji = cast(str, payload.emoji.name)
 
-            if payload.emoji.name in cfg.SPECIAL_EMOJIS:
-                await self._handle_special_emoji(event, emoji, user, message)
-            else:
-                await self._handle_signup(event, emoji, user, message)
+            lease = coordinator.lease(EventDatabase.lease_name(event))
+            async with lease, self.bot.jobs.lock([event]):
+                if EventDatabase.refresh():
+                    # Another shard changed the events while the lease was
+                    # held
+                    event = EventDatabase.getEventByID(event.id)
+                if payload.emoji.name in cfg.SPECIAL_EMOJIS:
+                    REACTIONS.labels("special").inc()
+                    await self._handle_special_emoji(event, emoji, user, message)
+                else:
+                    await self._handle_signup(event, emoji, user, message)
 
     async def _handle_signup(
         self,
@@ -147,6 +262,17 @@ class EventListener(Cog):
                 message_action = "CHANGE"
                 old_role = f"{removed_role.display_name} -> "
 
+        REACTIONS.labels(message_action.lower()).inc()
+        log.debug(
+            "%s: %s, role: %s, user: %s",
+            message_action,
+            event,
+            role.name,
+            user.id,
+            extra={"event_id": event.id, "message_id": message.id, "user_id": user.id},
+        )
+        tracker.record(event, message_action, role.name)
+
         # Update discord embed
         await msgFnc.updateMessageEmbed(message, event)
         EventDatabase.toJson()
@@ -171,7 +297,8 @@ class EventListener(Cog):
             f"({user.name}#{user.discriminator})"
         )
 
-        await self.bot.logchannel.send(text)
+        # Signoff pings skip the queue, the rest is sent in batches
+        self.bot.log_sink.write(self.bot.logchannel, text, priority=bool(delta_message))
 
     async def _handle_special_emoji(
         self,
@@ -200,6 +327,25 @@ class EventListener(Cog):
         if message.guild is None:
             owner = self.bot.owner
             await owner.send(f"DM: [{message.author}]: {message.content}")
+        elif recorder.active:
+            channel = self._channel_name(message.channel.id)
+            # The messages outside of the bot channels are not recorded
+            if channel is not None:
+                recorder.record_message(message, channel)
+
+    @Cog.listener()
+    async def on_command(self, ctx: Context):
+        recorder.record_command(ctx)
+
+    def _channel_name(self, channel_id: int) -> Optional[str]:
+        """Name the bot channel with the given ID for the gateway recording.
+
+        Returns None if the channel is not a bot channel.
+        """
+        for name in ("command", "event", "eventarchive", "log"):
+            if self.bot.partition_of(channel_id, f"{name}channel") is not None:
+                return name
+        return None
 
     def _calculate_signoff_delta(self, event: Event, role: Role, user):
         """Calculate the time delta between now and the operation start
@@ -226,5 +372,4 @@ class EventListener(Cog):
 
 
 def setup(bot: OperationBot):
-    importlib.reload(cfg)
     bot.add_cog(EventListener(bot))
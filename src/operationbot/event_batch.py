@@ -0,0 +1,174 @@
+"""Creation of multiple events with a single pass over the event messages.
+
+Creating events one by one sends a message for each new event and then sorts
+the event channel by fetching and re-editing every message that ended up in
+the wrong position. The batch instead creates all the events in memory first,
+computes their final message positions and then sends each new message exactly
+once with its final embed, editing only the existing messages that have to
+make room for the new events. The database is saved once after all messages
+are in place.
+"""
+
+import logging
+from datetime import datetime
+from typing import TYPE_CHECKING, Dict, List
+
+from discord import Message
+from discord.errors import HTTPException
+
+from operationbot import messageFunctions as msgFnc
+from operationbot.errors import MessageNotFound
+from operationbot.event import Event
+from operationbot.eventDatabase import EventDatabase
+from operationbot.history import history
+
+if TYPE_CHECKING:
+    from operationbot.bot import OperationBot
+
+
+class EventBatch:
+    """Creates multiple events as a single transaction.
+
+    Usage:
+        batch = EventBatch(bot)
+        event = batch.add(date)
+        event.terrain = "Altis"
+        await batch.commit()
+
+    The events are added to the database immediately, but their messages are
+    created in `commit`. If `commit` fails, the batch is rolled back: the new
+    events are removed from the database, their messages are deleted and the
+    existing messages are restored.
+    """
+
+    def __init__(self, bot: "OperationBot"):
+        self.bot = bot
+        self.events: List[Event] = []
+        # Message API calls (sends, fetches and edits) made by the batch and
+        # the calls creating the events one by one would have made. The
+        # reaction updates are the same for both and not counted.
+        self.api_calls = 0
+        self.naive_api_calls = 0
+        self._next_id = EventDatabase.nextID
+        self._message_ids: Dict[int, int] = {}
+        self._sent: List[Message] = []
+        self._edited: List[int] = []
+
+    def add(
+        self,
+        event_date: datetime,
+        sideop=False,
+        platoon_size=None,
+        reforger=False,
+    ) -> Event:
+        """Create a new event without a message."""
+        event = EventDatabase.createEvent(
+            event_date, sideop=sideop, platoon_size=platoon_size, reforger=reforger
+        )
+        self.events.append(event)
+        return event
+
+    @property
+    def saved_api_calls(self) -> int:
+        return max(self.naive_api_calls - self.api_calls, 0)
+
+    def summary(self) -> str:
+        return (
+            f"{len(self.events)} events created with {self.api_calls} message "
+            f"API calls ({self.saved_api_calls} saved)"
+        )
+
+    async def commit(self):
+        """Create the messages of the new events and save the database.
+
+        Raises the original exception after rolling back on failure.
+        """
+        new_ids = {event.id for event in self.events}
+        self._message_ids = {
+            event.id: event.messageID
+            for event in EventDatabase.events.values()
+            if event.id not in new_ids
+        }
+        existing = sorted(
+            (
+                event
+                for event in EventDatabase.events.values()
+                if event.id not in new_ids and event.messageID
+            ),
+            key=lambda event: event.messageID,
+        )
+        slots = [event.messageID for event in existing]
+
+        # The event with the latest date goes to the oldest message, like in
+        # EventDatabase.sortEvents. New messages always get newer IDs than the
+        # existing ones, so the events without a message are sent in order
+        # after the existing messages have been filled.
+        ordered = sorted(
+            EventDatabase.events.values(), key=lambda event: event.date, reverse=True
+        )
+        moved = ordered[: len(slots)]
+        to_send = ordered[len(slots) :]
+        self.naive_api_calls = self._naive_api_calls(existing)
+
+        try:
+            for event in to_send:
+                message = await msgFnc.createEventMessage(event, self.bot.eventchannel)
+                self._sent.append(message)
+                self.api_calls += 1
+                await msgFnc.updateReactions(event, message=message)
+            for slot, event in zip(slots, moved):
+                if event.messageID == slot:
+                    continue
+                event.messageID = slot
+                event.embed_hash = ""
+                self._edited.append(slot)
+                await msgFnc.update_event_message(self.bot, event)
+                self.api_calls += 2
+        except Exception:
+            logging.exception("Failed to create events, rolling back")
+            await self.rollback()
+            raise
+
+        # Only reorders the database, the message IDs are already in order
+        EventDatabase.sortEvents()
+        EventDatabase.toJson()
+        history.track(self.events)
+        # The details of the events were filled after adding them
+        for event in self.events:
+            EventDatabase.index.update(event)
+        logging.info(self.summary())
+
+    def _naive_api_calls(self, existing: List[Event]) -> int:
+        """Count the message API calls of creating the events one by one.
+
+        Each event gets a new message, after which sorting fetches every
+        message and edits the ones that ended up in the wrong position.
+        """
+        created = existing + self.events
+        ordered = sorted(created, key=lambda event: event.date, reverse=True)
+        edits = sum(1 for old, new in zip(created, ordered) if old is not new)
+        return len(self.events) + len(created) + edits
+
+    async def rollback(self):
+        """Remove the new events and restore the previous event messages."""
+        for message in self._sent:
+            try:
+                await message.delete()
+            except HTTPException as e:
+                logging.error(f"Failed to delete message {message.id}: {e}")
+        for event in self.events:
+            EventDatabase.events.pop(event.id, None)
+            EventDatabase.index.remove(event.id)
+        EventDatabase.nextID = self._next_id
+        for event in EventDatabase.events.values():
+            event.messageID = self._message_ids.get(event.id, event.messageID)
+
+        # Put the original events back on the messages that were edited
+        for event in EventDatabase.events.values():
+            if event.messageID in self._edited:
+                event.embed_hash = ""
+                try:
+                    await msgFnc.update_event_message(self.bot, event)
+                except (HTTPException, MessageNotFound) as e:
+                    logging.error(f"Failed to restore the message of {event}: {e}")
+        EventDatabase.toJson()
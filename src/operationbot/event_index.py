@@ -0,0 +1,196 @@
+"""Summary index of the events for the listing commands.
+
+The index keeps a short summary of each event, updated when the event is
+created, changed, archived or removed, so that listing and filtering the
+events does not need to walk the full event objects.
+"""
+
+from datetime import date, datetime
+from typing import Callable, Dict, Iterable, List, Optional
+
+from operationbot.event import Event
+
+FLAGS = ("sideop", "reforger", "dlc", "cancelled")
+TEXT_FILTERS = ("terrain", "faction", "title")
+
+
+class EventSummary:
+    __slots__ = (
+        "id",
+        "date",
+        "title",
+        "terrain",
+        "faction",
+        "sideop",
+        "reforger",
+        "dlc",
+        "cancelled",
+        "line",
+    )
+
+    def __init__(self, event: Event):
+        self.id = event.id
+        self.date = event.date
+        self.title = event.title
+        self.terrain = str(event.terrain)
+        self.faction = str(event.faction)
+        self.sideop = event.sideop
+        self.reforger = event.reforger
+        self.dlc = event.dlc
+        self.cancelled = event.cancelled
+        flags = [flag for flag in FLAGS if getattr(self, flag)]
+        flag_text = f" [{', '.join(flags)}]" if flags else ""
+        self.line = (
+            f"{self.id}: {self.date:%a %Y-%m-%d %H:%M} {self.title} - "
+            f"{self.terrain}, {self.faction}{flag_text}"
+        )
+
+
+class SummaryIndex:
+    """Event summaries ordered by the event date."""
+
+    def __init__(self):
+        self.summaries: Dict[int, EventSummary] = {}
+        self._sorted: Optional[List[EventSummary]] = None
+        # Incremented on every change, for invalidating results derived from
+        # the indexed events
+        self.generation = 0
+
+    def __len__(self) -> int:
+        return len(self.summaries)
+
+    def rebuild(self, events: Iterable[Event]):
+        self.summaries = {event.id: EventSummary(event) for event in events}
+        self._sorted = None
+        self.generation += 1
+
+    def update(self, event: Event):
+        self.summaries[event.id] = EventSummary(event)
+        self._sorted = None
+        self.generation += 1
+
+    def remove(self, event_id: int):
+        if self.summaries.pop(event_id, None) is not None:
+            self._sorted = None
+            self.generation += 1
+
+    def sorted(self) -> List[EventSummary]:
+        if self._sorted is None:
+            self._sorted = sorted(self.summaries.values(), key=lambda s: s.date)
+        return self._sorted
+
+    def query(self, filters: Optional[Dict[str, str]] = None) -> List[EventSummary]:
+        """Return the summaries matching all filters, ordered by date.
+
+        See `parse_filters` for the supported filters.
+        """
+        checks = _compile_filters(filters or {})
+        return [
+            summary
+            for summary in self.sorted()
+            if all(check(summary) for check in checks)
+        ]
+
+
+def _parse_bool(name: str, value: str) -> bool:
+    if value.lower() in ("yes", "true", "1", "y"):
+        return True
+    if value.lower() in ("no", "false", "0", "n"):
+        return False
+    raise ValueError(f"Invalid value for {name}: {value}. Use yes or no.")
+
+
+def _parse_date(name: str, value: str) -> date:
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError as e:
+        raise ValueError(f"Invalid date for {name}: {value}. Use YYYY-MM-DD.") from e
+
+
+def parse_filters(arguments: Iterable[str]) -> Dict[str, str]:
+    """Parse `key=value` filter arguments.
+
+    Supported filters: `from` and `to` (dates, inclusive), `sideop`,
+    `reforger`, `dlc` and `cancelled` (yes/no) and `terrain`, `faction` and
+    `title` (case-insensitive substrings).
+
+    >>> parse_filters(["from=2024-01-01", "terrain=Altis"])
+    {'from': '2024-01-01', 'terrain': 'Altis'}
+    """
+    filters = {}
+    for argument in arguments:
+        key, sep, value = argument.partition("=")
+        key = key.lower()
+        if not sep or key not in ("from", "to") + FLAGS + TEXT_FILTERS:
+            raise ValueError(f"Invalid filter: {argument}")
+        filters[key] = value
+    # Validate the values early
+    _compile_filters(filters)
+    return filters
+
+
+# A compiled filter
+Check = Callable[[EventSummary], bool]
+
+
+def _from_check(start: date) -> Check:
+    def check(summary: EventSummary) -> bool:
+        return summary.date.date() >= start
+
+    return check
+
+
+def _to_check(end: date) -> Check:
+    def check(summary: EventSummary) -> bool:
+        return summary.date.date() <= end
+
+    return check
+
+
+def _flag_check(key: str, wanted: bool) -> Check:
+    def check(summary: EventSummary) -> bool:
+        return bool(getattr(summary, key)) == wanted
+
+    return check
+
+
+def _text_check(key: str, text: str) -> Check:
+    def check(summary: EventSummary) -> bool:
+        return text in str(getattr(summary, key)).lower()
+
+    return check
+
+
+def _compile_filters(filters: Dict[str, str]) -> List[Check]:
+    checks: List[Check] = []
+    for key, value in filters.items():
+        if key == "from":
+            checks.append(_from_check(_parse_date(key, value)))
+        elif key == "to":
+            checks.append(_to_check(_parse_date(key, value)))
+        elif key in FLAGS:
+            checks.append(_flag_check(key, _parse_bool(key, value)))
+        else:
+            checks.append(_text_check(key, value.lower()))
+    return checks
+
+
+def paginate(lines: List[str], per_page: int, limit: int = 1900) -> List[str]:
+    r"""Split lines into pages of at most `per_page` lines and `limit` chars.
+
+    >>> paginate(["a", "b", "c"], 2)
+    ['a\nb', 'c']
+    """
+    pages: List[str] = []
+    page: List[str] = []
+    length = 0
+    for line in lines:
+        line = line[:limit]
+        if page and (len(page) >= per_page or length + len(line) + 1 > limit):
+            pages.append("\n".join(page))
+            page, length = [], 0
+        page.append(line)
+        length += len(line) + 1
+    if page:
+        pages.append("\n".join(page))
+    return pages
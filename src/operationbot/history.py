@@ -0,0 +1,289 @@
+"""Versioned history of the event structure for undoing edits.
+
+The history tracks the structure of each event (title, details, role groups
+and roles), leaving out the signups so that reacting to an event does not
+create new versions. For each event the current structure is kept in full,
+along with a bounded ring of reverse diffs, each of which turns a version back
+into the previous one. Restoring an older version applies the diffs from the
+newest one backwards and keeps the current signups of the roles that still
+exist.
+"""
+
+import copy
+import json
+import os
+import time
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple, cast
+
+from operationbot import config as cfg
+from operationbot import partitions
+from operationbot.event import Event
+from operationbot.eventDatabase import EventDatabase
+
+HISTORY_VERSION = 1
+
+# Description of the change being made, set by the command listener
+reason: ContextVar[str] = ContextVar("reason", default="")
+
+
+def structure(event: Event) -> Dict[str, Any]:
+    """Return the event data without the signups and the message state."""
+    # Round trip through JSON for normalising the role keys into strings
+    data = json.loads(json.dumps(event.toJson()))
+    for key in ("messageID", "embed_hash", "attendees"):
+        data.pop(key, None)
+    for group in data["roleGroups"].values():
+        for role in group["roles"].values():
+            role.pop("userID", None)
+            role.pop("userName", None)
+    return data
+
+
+def diff(source: Dict[str, Any], target: Dict[str, Any]) -> Dict[str, list]:
+    """Create a patch that turns `source` into `target`.
+
+    The patch maps the changed keys to `["=", value]` (set), `["-"]`
+    (delete) or `["~", patch, order]` (nested patch). The key order of a
+    nested dict is included only if it changes.
+    """
+    patch: Dict[str, list] = {}
+    for key, value in target.items():
+        if key not in source:
+            patch[key] = ["=", value]
+        elif isinstance(value, dict) and isinstance(source[key], dict):
+            nested = diff(source[key], value)
+            order = list(value) if list(source[key]) != list(value) else None
+            if nested or order is not None:
+                patch[key] = ["~", nested, order]
+        elif value != source[key]:
+            patch[key] = ["=", value]
+    for key in source:
+        if key not in target:
+            patch[key] = ["-"]
+    return patch
+
+
+def apply(data: Dict[str, Any], patch: Dict[str, list]) -> Dict[str, Any]:
+    """Apply a patch created by `diff`, returning a new dict."""
+    result = dict(data)
+    for key, change in patch.items():
+        if change[0] == "=":
+            result[key] = copy.deepcopy(change[1])
+        elif change[0] == "-":
+            result.pop(key, None)
+        else:
+            _, nested, order = change
+            value = apply(result.get(key, {}), nested)
+            if order is not None:
+                value = {name: value[name] for name in order}
+            result[key] = value
+    return result
+
+
+def describe(
+    source: Dict[str, Any], patch: Dict[str, list], path: Tuple[str, ...] = ()
+) -> List[str]:
+    """Describe the changes of a patch applied to `source`, one per line."""
+    lines = []
+    for key, change in patch.items():
+        name = "/".join(path + (str(key),))
+        if change[0] == "=":
+            if key in source:
+                lines.append(f"{name}: {source[key]!r} -> {change[1]!r}")
+            else:
+                lines.append(f"{name}: added {change[1]!r}")
+        elif change[0] == "-":
+            lines.append(f"{name}: removed")
+        else:
+            _, nested, order = change
+            lines.extend(describe(source.get(key, {}), nested, path + (str(key),)))
+            if order is not None and not nested:
+                lines.append(f"{name}: reordered")
+    return lines
+
+
+def build_event(event_id: int, data: Dict[str, Any]) -> Event:
+    """Create a new event instance from the full event data."""
+    emojis = EventDatabase.emojis
+    event_date = datetime.strptime(data["date"], "%Y-%m-%d")
+    event = Event(event_date, emojis, importing=True)  # type: ignore
+    event.fromJson(event_id, data, emojis)
+    return event
+
+
+class EventHistory:
+    def __init__(self, length: Optional[int] = None):
+        self.length = length if length is not None else cfg.HISTORY_LENGTH
+        # Current structure and version of each event
+        self.heads: Dict[int, Dict[str, Any]] = {}
+        self.versions: Dict[int, int] = {}
+        # Reverse diffs, the newest last
+        self.entries: Dict[int, Deque[Dict[str, Any]]] = {}
+        self._loaded = False
+        # The history is saved once per command, not on every change
+        self._dirty = False
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self.load()
+
+    def track(self, events: Iterable[Event]):
+        """Start tracking the events that do not have a history yet."""
+        self._ensure_loaded()
+        for event in events:
+            if event.id not in self.heads:
+                self.heads[event.id] = structure(event)
+                self.versions[event.id] = 1
+                self.entries[event.id] = deque(maxlen=self.length)
+                self._dirty = True
+
+    def commit(self, event: Event, description: Optional[str] = None) -> bool:
+        """Record the current structure of the event as a new version.
+
+        Returns True if the structure changed since the previous version.
+        """
+        self._ensure_loaded()
+        current = structure(event)
+        head = self.heads.get(event.id)
+        if head is None:
+            self.track([event])
+            return False
+        if current == head:
+            return False
+        self.entries[event.id].append(
+            {
+                "version": self.versions[event.id] + 1,
+                "time": round(time.time()),
+                "reason": description if description is not None else reason.get(),
+                "patch": diff(current, head),
+            }
+        )
+        self.heads[event.id] = current
+        self.versions[event.id] += 1
+        self._dirty = True
+        return True
+
+    def forget(self, event_id: int):
+        self._ensure_loaded()
+        self.heads.pop(event_id, None)
+        self.versions.pop(event_id, None)
+        self.entries.pop(event_id, None)
+        self._dirty = True
+
+    def log(self, event_id: int) -> List[Tuple[int, int, str]]:
+        """List the available versions as (version, time, reason), newest first.
+
+        The time and the reason of a version are the ones of the change that
+        created it. The oldest version has no recorded change.
+        """
+        self._ensure_loaded()
+        if event_id not in self.heads:
+            return []
+        versions = []
+        entries = list(self.entries[event_id])
+        for entry in reversed(entries):
+            versions.append((entry["version"], entry["time"], entry["reason"]))
+        oldest = self.versions[event_id] - len(entries)
+        versions.append((oldest, 0, ""))
+        return versions
+
+    def get(self, event_id: int, version: int) -> Dict[str, Any]:
+        """Return the structure of an event at the given version."""
+        self._ensure_loaded()
+        if event_id not in self.heads:
+            raise ValueError(f"No history for event {event_id}")
+        data = self.heads[event_id]
+        current = self.versions[event_id]
+        oldest = current - len(self.entries[event_id])
+        if not oldest <= version <= current:
+            raise ValueError(
+                f"Version {version} not available, versions: {oldest}-{current}"
+            )
+        for entry in reversed(self.entries[event_id]):
+            if entry["version"] <= version:
+                break
+            data = apply(data, entry["patch"])
+        return data
+
+    def restore(
+        self, event: Event, version: Optional[int] = None
+    ) -> Tuple[Event, List[str]]:
+        """Replace the event in the database with an earlier version.
+
+        Defaults to the version before the current one. Returns the restored
+        event and the names of the users whose roles do not exist in the
+        restored version.
+        """
+        self._ensure_loaded()
+        if version is None:
+            version = self.versions.get(event.id, 1) - 1
+        data = copy.deepcopy(self.get(event.id, version))
+        current = json.loads(json.dumps(event.toJson()))
+
+        signups: Dict[str, Tuple[Any, Any]] = {}
+        for group in current["roleGroups"].values():
+            for key, role in group["roles"].items():
+                if role["userID"] is not None:
+                    signups[key] = (role["userID"], role["userName"])
+        for group in data["roleGroups"].values():
+            for key, role in group["roles"].items():
+                role["userID"], role["userName"] = signups.pop(key, (None, ""))
+        lost = [name for _, name in signups.values()]
+
+        data["messageID"] = event.messageID
+        data["embed_hash"] = ""
+        data["attendees"] = current["attendees"]
+        restored = build_event(event.id, data)
+        EventDatabase.events[event.id] = restored
+        return restored, lost
+
+    def save_changes(self):
+        """Save the history if it has changed since it was last saved."""
+        if self._dirty:
+            self.save()
+
+    def save(self, filename: Optional[str] = None):
+        if filename is None:
+            filename = partitions.path("history")
+        data = {
+            "version": HISTORY_VERSION,
+            "events": {
+                event_id: {
+                    "version": self.versions[event_id],
+                    "head": head,
+                    "entries": list(self.entries[event_id]),
+                }
+                for event_id, head in self.heads.items()
+            },
+        }
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        with open(filename, "w") as jsonFile:
+            json.dump(data, jsonFile, separators=(",", ":"))
+        self._dirty = False
+
+    def load(self, filename: Optional[str] = None):
+        if filename is None:
+            filename = partitions.path("history")
+        self._loaded = True
+        self._dirty = False
+        self.heads, self.versions, self.entries = {}, {}, {}
+        try:
+            with open(filename) as jsonFile:
+                data = json.load(jsonFile)
+        except (FileNotFoundError, json.decoder.JSONDecodeError):
+            return
+        if data.get("version") != HISTORY_VERSION:
+            return
+        for event_id, event_data in data["events"].items():
+            self.heads[int(event_id)] = event_data["head"]
+            self.versions[int(event_id)] = event_data["version"]
+            self.entries[int(event_id)] = deque(
+                event_data["entries"], maxlen=self.length
+            )
+
+
+# The history of the current partition
+history = cast(EventHistory, partitions.PartitionLocal(lambda _: EventHistory()))
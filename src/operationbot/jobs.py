@@ -0,0 +1,165 @@
+"""Tracking of the running commands and locking of the events.
+
+Commands run concurrently. Instead of a global flag blocking every command,
+the events a command operates on are locked for the duration of the command, a
+pending prompt only blocks the user it was sent to in that channel and every
+running command is registered as a job that can be listed with `jobs` and
+cancelled with `canceljob`.
+"""
+
+import asyncio
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from operationbot import partitions
+from operationbot.event import Event
+
+
+class Job:
+    """A running command or another long operation."""
+
+    def __init__(self, job_id: int, name: str, user: str, task: asyncio.Task):
+        self.id = job_id
+        self.name = name
+        self.user = user
+        self.task = task
+        self.partition = partitions.current()
+        self.status = "running"
+        self._start = time.monotonic()
+
+    @property
+    def elapsed(self) -> float:
+        """Seconds since the job was started."""
+        return time.monotonic() - self._start
+
+    def __str__(self) -> str:
+        user = f" by {self.user}" if self.user else ""
+        return f"#{self.id} {self.name}{user}: {self.status} ({self.elapsed:.0f} s)"
+
+
+class EventLock:
+    """An asyncio lock that the task holding it can acquire again."""
+
+    def __init__(self):
+        self._lock = asyncio.Lock()
+        self._owner: Optional[asyncio.Task] = None
+        self._count = 0
+
+    async def acquire(self):
+        task = asyncio.current_task()
+        if self._owner is not task:
+            await self._lock.acquire()
+            self._owner = task
+        self._count += 1
+
+    def release(self):
+        self._count -= 1
+        if self._count == 0:
+            self._owner = None
+            self._lock.release()
+
+
+class JobRegistry:
+    """Keeps track of the jobs, the pending prompts and the event locks."""
+
+    def __init__(self):
+        self.jobs: Dict[int, Job] = {}
+        self._next_id = 1
+        # Users with a pending prompt, by user and channel ID
+        self._prompts: Set[Tuple[int, int]] = set()
+        self._locks: Dict[Tuple[str, int], EventLock] = {}
+
+    def start(self, name: str, user: str = "") -> Job:
+        """Register the current task as a job."""
+        task = asyncio.current_task()
+        assert task is not None
+        job = Job(self._next_id, name, user, task)
+        self._next_id += 1
+        self.jobs[job.id] = job
+        return job
+
+    def finish(self, job: Job):
+        self.jobs.pop(job.id, None)
+
+    @contextmanager
+    def track(self, name: str, user: str = "") -> Iterator[Job]:
+        """Run the block as a job."""
+        job = self.start(name, user)
+        try:
+            yield job
+        finally:
+            self.finish(job)
+
+    def current(self) -> Optional[Job]:
+        """Return the job of the current task, if any."""
+        return self._find(asyncio.current_task())
+
+    def _find(self, task: Optional[asyncio.Task]) -> Optional[Job]:
+        # Copying the jobs first as this is also called from the loop watchdog
+        # thread
+        return next((job for job in list(self.jobs.values()) if job.task is task), None)
+
+    def describe(self, task: asyncio.Task) -> str:
+        """Name the task by the command or operation it runs."""
+        job = self._find(task)
+        if job is None:
+            return task.get_name()
+        return f"{job.name} (job #{job.id})"
+
+    def cancel(self, job_id: int) -> Optional[Job]:
+        """Cancel a job. Returns None if there is no job with the ID."""
+        job = self.jobs.get(job_id)
+        if job is not None:
+            job.status = "cancelling"
+            job.task.cancel()
+        return job
+
+    @contextmanager
+    def prompt(self, user_id: int, channel_id: int) -> Iterator[None]:
+        """Mark the user as having to answer a prompt in the channel."""
+        self._prompts.add((user_id, channel_id))
+        job = self.current()
+        if job is not None:
+            job.status = "waiting for a reply"
+        try:
+            yield
+        finally:
+            self._prompts.discard((user_id, channel_id))
+            if job is not None:
+                job.status = "running"
+
+    def prompting(self, user_id: int, channel_id: int) -> bool:
+        return (user_id, channel_id) in self._prompts
+
+    async def acquire(self, events: Iterable[Event]) -> List[EventLock]:
+        """Lock the events for the current task.
+
+        The locks are always taken in the order of the event IDs so that two
+        tasks locking overlapping sets of events cannot deadlock.
+        """
+        partition = partitions.current()
+        keys = sorted({(partition, event.id) for event in events})
+        locks: List[EventLock] = []
+        try:
+            for key in keys:
+                lock = self._locks.setdefault(key, EventLock())
+                await lock.acquire()
+                locks.append(lock)
+        except BaseException:
+            self.release(locks)
+            raise
+        return locks
+
+    def release(self, locks: List[EventLock]):
+        for lock in reversed(locks):
+            lock.release()
+
+    @asynccontextmanager
+    async def lock(self, events: Iterable[Event]) -> AsyncIterator[None]:
+        """Hold the locks of the events for the duration of the block."""
+        locks = await self.acquire(events)
+        try:
+            yield
+        finally:
+            self.release(locks)
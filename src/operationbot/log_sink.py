@@ -0,0 +1,166 @@
+"""Batched writer of the log channel messages.
+
+The reaction handlers queue their log entries instead of sending a message
+for each of them. The queued entries are sent periodically as few messages as
+possible, each under the Discord message length limit, so the log does not
+compete with the event message edits for the rate limits. Entries on the
+priority lane (e.g. late signoff pings) are flushed right away and sent before
+the regular entries.
+"""
+
+import asyncio
+import logging
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from discord import HTTPException, TextChannel
+
+from operationbot import config as cfg
+from operationbot import metrics
+
+MESSAGE_LIMIT = 2000
+# Number of flushes a failed message is retried in before it is dropped
+MAX_RETRIES = 3
+
+LOG_ENTRIES = metrics.registry.counter(
+    "operationbot_log_entries_total", "Number of queued log entries", ["lane"]
+)
+LOG_MESSAGES = metrics.registry.counter(
+    "operationbot_log_messages_total", "Number of sent log messages"
+)
+LOG_DROPPED = metrics.registry.counter(
+    "operationbot_log_dropped_total", "Number of dropped log messages"
+)
+
+
+def pack(entries: List[str], limit: int = MESSAGE_LIMIT) -> List[str]:
+    r"""Join the entries to as few messages under the limit as possible.
+
+    Entries longer than the limit are split into multiple messages.
+
+    >>> pack(["a", "b", "c" * 3], limit=5)
+    ['a\nb', 'ccc']
+    """
+    messages: List[str] = []
+    message = ""
+    for entry in entries:
+        while len(entry) > limit:
+            if message:
+                messages.append(message)
+                message = ""
+            messages.append(entry[:limit])
+            entry = entry[limit:]
+        if message and len(message) + len(entry) + 1 > limit:
+            messages.append(message)
+            message = ""
+        message = f"{message}\n{entry}" if message else entry
+    if message:
+        messages.append(message)
+    return messages
+
+
+class LogSink:
+    """Queues the log entries of each channel and sends them in batches."""
+
+    def __init__(self, interval: Optional[float] = None, limit: int = MESSAGE_LIMIT):
+        self.interval = interval if interval is not None else cfg.LOG_FLUSH_INTERVAL
+        self.limit = limit
+        self._channels: Dict[int, TextChannel] = {}
+        # Queued entries and the number of queued characters per channel
+        self._queues: Dict[int, Deque[str]] = {}
+        self._priority: Dict[int, Deque[str]] = {}
+        self._size: Dict[int, int] = {}
+        # Number of consecutive failed flushes per channel
+        self._failures: Dict[int, int] = {}
+        self._wakeup = asyncio.Event()
+        self._lock = asyncio.Lock()
+
+    @property
+    def pending(self) -> int:
+        """Number of queued entries."""
+        queues = list(self._queues.values()) + list(self._priority.values())
+        return sum(len(queue) for queue in queues)
+
+    def write(self, channel: TextChannel, text: str, priority=False):
+        """Queue an entry to be sent to the channel.
+
+        Priority entries wake up the writer immediately, the regular ones only
+        once a full message is queued.
+        """
+        self._channels[channel.id] = channel
+        if priority:
+            self._priority.setdefault(channel.id, deque()).append(text)
+            LOG_ENTRIES.labels("priority").inc()
+            self._wakeup.set()
+            return
+        self._queues.setdefault(channel.id, deque()).append(text)
+        LOG_ENTRIES.labels("regular").inc()
+        size = self._size.get(channel.id, 0) + len(text) + 1
+        self._size[channel.id] = size
+        if size >= self.limit:
+            self._wakeup.set()
+
+    def _take(self) -> List[Tuple[TextChannel, List[str]]]:
+        # The channels with priority entries are flushed first
+        order = list(self._priority)
+        order.extend(channel for channel in self._queues if channel not in order)
+        batches = []
+        for channel_id in order:
+            entries = list(self._priority.pop(channel_id, ()))
+            entries.extend(self._queues.pop(channel_id, ()))
+            self._size.pop(channel_id, None)
+            if entries:
+                batches.append((self._channels[channel_id], entries))
+        return batches
+
+    def _requeue(self, channel: TextChannel, messages: List[str]):
+        """Put the unsent messages back to the front of the channel queue.
+
+        The messages are dropped once the channel has failed `MAX_RETRIES`
+        flushes in a row.
+        """
+        failures = self._failures.get(channel.id, 0) + 1
+        if failures > MAX_RETRIES:
+            self._failures.pop(channel.id, None)
+            LOG_DROPPED.inc(len(messages))
+            logging.error(f"Dropped {len(messages)} log messages to {channel}")
+            return
+        self._failures[channel.id] = failures
+        self._queues.setdefault(channel.id, deque()).extendleft(reversed(messages))
+        size = sum(len(message) + 1 for message in messages)
+        self._size[channel.id] = self._size.get(channel.id, 0) + size
+
+    async def flush(self):
+        """Send all queued entries.
+
+        The messages that could not be sent because of an unexpected error
+        are queued again and retried on the next flush.
+        """
+        async with self._lock:
+            for channel, entries in self._take():
+                messages = pack(entries, self.limit)
+                for number, message in enumerate(messages):
+                    try:
+                        await channel.send(message)
+                    except HTTPException:
+                        logging.exception(f"Failed to send a log message to {channel}")
+                    except Exception:  # pylint: disable=broad-except
+                        logging.exception(f"Failed to send a log message to {channel}")
+                        self._requeue(channel, messages[number:])
+                        break
+                    else:
+                        LOG_MESSAGES.inc()
+                        self._failures.pop(channel.id, None)
+
+    async def run(self):
+        """Flush the queued entries periodically until cancelled."""
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception:  # pylint: disable=broad-except
+                logging.exception("Failed to flush the log messages")
@@ -0,0 +1,95 @@
+"""Monitoring of the event loop lag and detection of blocking code.
+
+Synchronous work on the event loop (e.g. writing the database or rendering
+embeds) delays everything else running on it, including the gateway
+heartbeats. The monitor measures how late a periodic sleep wakes up and
+records it as the loop lag. A watchdog thread notices when the loop has not
+woken the monitor up for longer than the threshold, and logs the stack of the
+loop thread and the name of the task or command blocking it while it is still
+blocked.
+"""
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from typing import Callable, Optional
+
+from operationbot import config as cfg
+from operationbot import metrics
+
+LOOP_LAG_SECONDS = metrics.registry.histogram(
+    "operationbot_loop_lag_seconds", "Delay of the event loop waking up a task"
+)
+LOOP_BLOCKED = metrics.registry.counter(
+    "operationbot_loop_blocked_total",
+    "Number of times the event loop was blocked past the threshold",
+)
+
+
+class LoopMonitor:
+    """Samples the event loop lag and reports the code blocking the loop."""
+
+    def __init__(
+        self,
+        interval: Optional[float] = None,
+        threshold: Optional[float] = None,
+        describe: Optional[Callable[[asyncio.Task], str]] = None,
+    ):
+        self.interval = interval if interval is not None else cfg.LOOP_LAG_INTERVAL
+        if threshold is None:
+            threshold = cfg.LOOP_BLOCK_THRESHOLD
+        self.threshold = threshold
+        # Names the task blocking the loop, the task name by default
+        self.describe = describe or (lambda task: task.get_name())
+        self.max_lag = 0.0
+        self.blocked = 0
+        self._heartbeat = time.monotonic()
+
+    async def run(self):
+        """Measure the lag and watch the loop until cancelled."""
+        loop = asyncio.get_running_loop()
+        stop = threading.Event()
+        watchdog = threading.Thread(
+            target=self._watch,
+            args=(loop, threading.get_ident(), stop),
+            name="Event loop watchdog",
+            daemon=True,
+        )
+        self._heartbeat = time.monotonic()
+        watchdog.start()
+        try:
+            while True:
+                start = loop.time()
+                await asyncio.sleep(self.interval)
+                self._heartbeat = time.monotonic()
+                lag = max(loop.time() - start - self.interval, 0.0)
+                self.max_lag = max(self.max_lag, lag)
+                LOOP_LAG_SECONDS.observe(lag)
+        finally:
+            stop.set()
+
+    def _watch(
+        self, loop: asyncio.AbstractEventLoop, thread_id: int, stop: threading.Event
+    ):
+        reported = 0.0
+        while not stop.wait(self.threshold / 2):
+            heartbeat = self._heartbeat
+            blocked = time.monotonic() - heartbeat - self.interval
+            # Report each stall once
+            if blocked > self.threshold and heartbeat != reported:
+                reported = heartbeat
+                self._report(loop, thread_id, blocked)
+
+    def _report(self, loop: asyncio.AbstractEventLoop, thread_id: int, blocked: float):
+        self.blocked += 1
+        LOOP_BLOCKED.inc()
+        task = asyncio.current_task(loop)
+        name = self.describe(task) if task is not None else "a callback"
+        frame = sys._current_frames().get(thread_id)
+        stack = "".join(traceback.format_stack(frame)) if frame is not None else ""
+        logging.warning(
+            f"Event loop blocked for over {blocked:.3f} s by {name}:\n{stack}"
+        )
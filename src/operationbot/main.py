@@ -1,13 +1,19 @@
 #!/usr/bin/env python3
 import logging
 import sys
+from typing import Dict, Optional
 
 import discord
 
 from operationbot import config as cfg
 from operationbot import secret as s
+from operationbot import structured_log
 from operationbot.bot import OperationBot
 from operationbot.secret import COMMAND_CHAR, TOKEN
+from operationbot.shards import coordinator
+from operationbot.startup import profile
+
+log = logging.getLogger(__name__)
 
 CONFIG_VERSION = 16
 SECRET_VERSION = 1
@@ -26,29 +32,44 @@ initial_extensions = [
     "operationbot.commandListener",
     "operationbot.eventListener",
     "operationbot.cogs.repl",
+    "operationbot.cogs.profiler",
 ]
 
 intents = discord.Intents.default()
 intents.members = True  # pylint: disable=assigning-non-slot
 intents.messages = True  # pylint: disable=assigning-non-slot
-bot = OperationBot(command_prefix=COMMAND_CHAR, intents=intents)
-# bot.remove_command("help")
 
 if sys.version_info < (3, 10):
     raise Exception("Must be run with Python 3.10 or higher")
 
 
-def main():
-    logging.basicConfig(level=logging.DEBUG)
-    logging.getLogger("discord").setLevel(logging.INFO)
-    logging.getLogger("discord.gateway").setLevel(logging.WARNING)
-    print("Starting up")
-    bot.load_extension("operationbot.reload")
-    print("Loading extensions")
+def main(shard_id: Optional[int] = None):
+    structured_log.configure()
+    log.info("Starting up")
+    # The shard has to be passed to the constructor, the client copies it to
+    # the connection state used for identifying to the gateway
+    shard: Dict[str, int] = {}
+    if cfg.SHARD_COUNT > 1:
+        if shard_id is None or not 0 <= shard_id < cfg.SHARD_COUNT:
+            raise ValueError(
+                f"A --shard-id between 0 and {cfg.SHARD_COUNT - 1} is required"
+            )
+        log.info(f"Running as shard {shard_id} of {cfg.SHARD_COUNT}")
+        shard = {"shard_id": shard_id, "shard_count": cfg.SHARD_COUNT}
+        coordinator.start(cfg.SHARD_STORE, shard_id, cfg.SHARD_LEASE_TIME)
+    bot = OperationBot(command_prefix=COMMAND_CHAR, intents=intents, **shard)
+    # bot.remove_command("help")
+    with profile.phase("load operationbot.reload"):
+        bot.load_extension("operationbot.reload")
+    log.info("Loading extensions")
     for extension in initial_extensions:
         # try:
-        bot.load_extension(extension)
+        with profile.phase(f"load {extension}"):
+            bot.load_extension(extension)
         # except Exception:
         #     print(f'failed to load extension {extension}')
-    print("Running")
-    bot.run(TOKEN)
+    log.info("Running")
+    try:
+        bot.run(TOKEN)
+    finally:
+        coordinator.stop()
@@ -1,6 +1,7 @@
+import asyncio
 import logging
 from datetime import timedelta
-from typing import TYPE_CHECKING, Dict, List, Union, cast
+from typing import TYPE_CHECKING, Dict, Iterable, List, Union, cast
 
 from discord import Emoji, Message, NotFound, TextChannel
 from discord.abc import Messageable
@@ -9,10 +10,25 @@ from discord.errors import Forbidden, HTTPException
 
 if TYPE_CHECKING:
     from operationbot.bot import OperationBot
+from operationbot import metrics
 from operationbot.errors import EventUpdateFailed, MessageNotFound, RoleError
 from operationbot.event import Event
 from operationbot.eventDatabase import EventDatabase
 
+log = logging.getLogger(__name__)
+
+FETCH_MESSAGE_SECONDS = metrics.registry.histogram(
+    "operationbot_fetch_message_seconds", "Time spent fetching event messages"
+)
+UPDATE_REACTIONS_SECONDS = metrics.registry.histogram(
+    "operationbot_update_reactions_seconds",
+    "Time spent updating the reactions of event messages",
+)
+EVENT_UPDATE_FAILURES = metrics.registry.counter(
+    "operationbot_event_update_failures_total",
+    "Number of failed event embed updates",
+)
+
 
 async def getEventMessage(event: Event, bot: "OperationBot", archived=False) -> Message:
     """Get a message related to an event."""
@@ -22,7 +38,8 @@ async def getEventMessage(event: Event, bot: "OperationBot", archived=False) ->
         channel = bot.eventchannel
 
     try:
-        return await channel.fetch_message(event.messageID)
+        with FETCH_MESSAGE_SECONDS.time():
+            return await channel.fetch_message(event.messageID)
     except NotFound as e:
         raise MessageNotFound(
             f"No event message found with message ID {event.messageID}"
@@ -46,7 +63,7 @@ async def sortEventMessages(bot: "OperationBot"):
 
     Raises MessageNotFound if messages are missing.
     """
-    logging.info("sortEventMessages")
+    log.info("Sorting the event messages")
     EventDatabase.sortEvents()
 
     event: Event
@@ -80,6 +97,7 @@ async def updateMessageEmbed(eventMessage: Message, updatedEvent: Event) -> bool
             # Failed to edit the newly-created embed in (probably due to a rate
             # limit), invalidating the embed hash and saving the database
             # before propagating the exception
+            EVENT_UPDATE_FAILURES.inc()
             updatedEvent.embed_hash = ""
             EventDatabase.toJson()
             raise EventUpdateFailed(
@@ -90,7 +108,40 @@ async def updateMessageEmbed(eventMessage: Message, updatedEvent: Event) -> bool
     return False
 
 
+async def refreshEmbeds(bot: "OperationBot", events: Iterable[Event]) -> int:
+    """Edit the messages of the events whose embed has changed.
+
+    The embeds are rendered first and a message is only fetched and edited if
+    its embed differs from the cached one. Returns the number of edited
+    messages.
+    """
+    updated = 0
+    changed = False
+    for event in list(events):
+        async with bot.jobs.lock([event]):
+            embed = event.createEmbed()
+            if embed is None:
+                continue
+            changed = True
+            try:
+                message = await getEventMessage(event, bot)
+                await message.edit(embed=embed)
+            except (MessageNotFound, HTTPException) as e:
+                EVENT_UPDATE_FAILURES.inc()
+                event.embed_hash = ""
+                log.warning(
+                    f"Failed to refresh the embed of {event}: {e}",
+                    extra={"event_id": event.id},
+                )
+                continue
+            updated += 1
+    if changed:
+        EventDatabase.toJson()
+    return updated
+
+
 # from EventDatabase
+@metrics.timed(UPDATE_REACTIONS_SECONDS)
 async def updateReactions(
     event: Event, message: Message | None = None, bot=None, reorder=False
 ):
@@ -183,31 +234,47 @@ async def syncMessages(events: Dict[int, Event], bot: "OperationBot"):
 
     Saves the database to disk after syncing.
     """
-    logging.info("syncMessages")
+    log.info("Syncing the event messages")
     sorted_events = sorted(
         list(events.values()), key=lambda event: event.date, reverse=True
     )
     for event in sorted_events:
-        try:
-            message = await getEventMessage(event, bot)
-        except MessageNotFound:
-            print(f"Missing a message for event {event}, creating")
-            await createEventMessage(event, bot.eventchannel)
-        else:
-            if messageEventId(message) == event.id:
-                print(f"Found message {message.id} for event {event}")
-            else:
-                print(
-                    f"Found incorrect message for event {event}, deleting "
-                    f"and creating"
-                )
-                # Technically multiple events might have the same saved
-                # messageID but it's simpler to just recreate messages here if
-                # the event ID doesn't match
-                await message.delete()
-                await createEventMessage(event, bot.eventchannel)
+        async with bot.jobs.lock([event]):
+            await _syncMessage(event, bot)
 
-    await sortEventMessages(bot)
+    async with bot.jobs.lock(sorted_events):
+        await sortEventMessages(bot)
+
+
+async def _syncMessage(event: Event, bot: "OperationBot"):
+    try:
+        message = await getEventMessage(event, bot)
+    except MessageNotFound:
+        log.info(
+            "Missing a message for event %s, creating",
+            event,
+            extra={"event_id": event.id},
+        )
+        await createEventMessage(event, bot.eventchannel)
+    else:
+        if messageEventId(message) == event.id:
+            log.debug(
+                "Found message %s for event %s",
+                message.id,
+                event,
+                extra={"event_id": event.id, "message_id": message.id},
+            )
+        else:
+            log.info(
+                "Found incorrect message for event %s, deleting and creating",
+                event,
+                extra={"event_id": event.id, "message_id": message.id},
+            )
+            # Technically multiple events might have the same saved
+            # messageID but it's simpler to just recreate messages here if
+            # the event ID doesn't match
+            await message.delete()
+            await createEventMessage(event, bot.eventchannel)
 
 
 # async def importMessages(events: Dict[int, Event], bot):
@@ -235,15 +302,35 @@ async def archive_single_event(
     """Archive a single event."""
     # Archive event and export
     EventDatabase.archiveEvent(event)
-    try:
-        eventMessage = await getEventMessage(event, bot)
-    except MessageNotFound:
-        await target.send(f"Internal error: event {event} without a message found")
-    else:
-        await eventMessage.delete()
+    await move_archived_messages([event], target, bot)
 
-    # Create new message
-    await createEventMessage(event, bot.eventarchivechannel)
+
+async def move_archived_messages(
+    events: List[Event], target: Messageable, bot: "OperationBot"
+) -> None:
+    """Move the messages of archived events to the archive channel.
+
+    The old messages are deleted while the new ones are posted. The new
+    messages are posted one by one, latest event first like in the event
+    channel, to keep the archive channel in order.
+    """
+    messages = await asyncio.gather(
+        *(getEventMessage(event, bot) for event in events), return_exceptions=True
+    )
+    deletions = []
+    for event, message in zip(events, messages):
+        if isinstance(message, MessageNotFound):
+            await target.send(f"Internal error: event {event} without a message found")
+        elif isinstance(message, BaseException):
+            raise message
+        else:
+            deletions.append(message.delete())
+
+    async def post():
+        for event in sorted(events, key=lambda event: event.date, reverse=True):
+            await createEventMessage(event, bot.eventarchivechannel)
+
+    await asyncio.gather(post(), *deletions)
 
 
 async def archive_past_events(
@@ -255,15 +342,17 @@ async def archive_past_events(
     if target is None:
         target = bot.commandchannel
 
-    events = EventDatabase.archive_past_events(delta)
-
-    for event in events:
-        await archive_single_event(event, target, bot)
+    # The commands and bulk operations working on the events finish before
+    # the events are archived underneath them
+    async with bot.jobs.lock(EventDatabase.events.values()):
+        events = EventDatabase.archive_past_events(delta)
+        if events:
+            await move_archived_messages(events, target, bot)
 
     if events:
         msg = f"{len(events)} events archived"
         await target.send(msg)
-        logging.info(msg)
+        log.info(msg)
 
     return events
 
@@ -277,14 +366,13 @@ async def cancel_empty_events(
     if target is None:
         target = bot.commandchannel
 
-    events = EventDatabase.cancel_empty_events(threshold)
-
-    for event in events:
-        await update_event_message(bot, event)
+    async with bot.jobs.lock(EventDatabase.events.values()):
+        events = EventDatabase.cancel_empty_events(threshold)
+        await asyncio.gather(*(update_event_message(bot, event) for event in events))
 
     if events:
         msg = f"{len(events)} events cancelled"
         await target.send(msg)
-        logging.info(msg)
+        log.info(msg)
 
     return events
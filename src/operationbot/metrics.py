@@ -0,0 +1,350 @@
+"""Counters, gauges and latency histograms of the bot internals.
+
+The metrics are collected into a module level registry and can be rendered in
+the Prometheus text exposition format (served over HTTP by the metrics server
+task) or as a short human readable summary (the `stats` command).
+"""
+
+import asyncio
+import functools
+import inspect
+import logging
+import math
+import time
+from collections import deque
+from typing import Callable, Dict, Optional, Tuple, TypeVar
+
+DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+LabelValues = Tuple[str, ...]
+F = TypeVar("F", bound=Callable)
+
+
+def _format_labels(names: Tuple[str, ...], values: LabelValues, extra="") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric:
+    """A metric family with optional labels."""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[LabelValues, "Metric"] = {}
+
+    def labels(self, *values: str):
+        """Return the child metric for the given label values."""
+        if len(values) != len(self.labelnames):
+            raise ValueError(
+                f"{self.name} expects labels {self.labelnames}, got {values}"
+            )
+        values = tuple(str(value) for value in values)
+        if values not in self._children:
+            self._children[values] = self._child()
+        return self._children[values]
+
+    def _child(self) -> "Metric":
+        return self.__class__(self.name, self.documentation)
+
+    def _samples(self) -> list[Tuple[LabelValues, "Metric"]]:
+        if self.labelnames:
+            return sorted(self._children.items())
+        return [((), self)]
+
+    def render(self) -> list[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        for values, metric in self._samples():
+            lines.extend(metric._render_sample(self.labelnames, values))
+        return lines
+
+    def _render_sample(self, names, values) -> list[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+    def _render_sample(self, names, values) -> list[str]:
+        labels = _format_labels(names, values)
+        return [f"{self.name}{labels} {_format_value(self.value)}"]
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._value = 0.0
+        self._function: Optional[Callable[[], float]] = None
+
+    @property
+    def value(self) -> float:
+        if self._function is not None:
+            return self._function()
+        return self._value
+
+    def set(self, value: float):
+        self._value = value
+
+    def inc(self, amount: float = 1.0):
+        self._value += amount
+
+    def dec(self, amount: float = 1.0):
+        self._value -= amount
+
+    def set_function(self, function: Callable[[], float]):
+        """Compute the value with the given function when it is read."""
+        self._function = function
+
+    def _render_sample(self, names, values) -> list[str]:
+        labels = _format_labels(names, values)
+        return [f"{self.name}{labels} {_format_value(self.value)}"]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames=(),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets) + (math.inf,)
+        self.counts = [0] * len(self.buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def _child(self) -> "Histogram":
+        return Histogram(self.name, self.documentation, buckets=self.buckets[:-1])
+
+    def observe(self, value: float):
+        self.sum += value
+        self.count += 1
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+
+    def quantile(self, quantile: float) -> float:
+        """Estimate a quantile as the upper bound of the matching bucket."""
+        if self.count == 0:
+            return 0.0
+        target = quantile * self.count
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            if cumulative >= target:
+                return bound
+        return math.inf
+
+    def time(self):
+        """Measure the duration of the wrapped block."""
+        return _Timer(self)
+
+    def _render_sample(self, names, values) -> list[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            labels = _format_labels(names, values, f'le="{_format_value(bound)}"')
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(names, values)
+        lines.append(f"{self.name}_sum{labels} {_format_value(self.sum)}")
+        lines.append(f"{self.name}_count{labels} {self.count}")
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram):
+        self.histogram = histogram
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *_):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+class RateMeter:
+    """Counts the events of the last `window` seconds."""
+
+    def __init__(self, window: float = 60.0):
+        self.window = window
+        self._times: deque[float] = deque()
+
+    def mark(self):
+        self._times.append(time.monotonic())
+
+    def merge(self, other: "RateMeter"):
+        """Count the events marked on another meter as well."""
+        if other is not self:
+            self._times = deque(sorted([*other._times, *self._times]))
+
+    def rate(self) -> int:
+        threshold = time.monotonic() - self.window
+        while self._times and self._times[0] < threshold:
+            self._times.popleft()
+        return len(self._times)
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+        self.started = time.time()
+
+    def _get(self, cls, name: str, documentation: str, labelnames=(), **kwargs):
+        # Modules may get reloaded, returning the already registered metric so
+        # that the collected values are kept
+        metric = self.metrics.get(name)
+        if metric is None:
+            metric = cls(name, documentation, labelnames, **kwargs)
+            self.metrics[name] = metric
+        elif not isinstance(metric, cls):
+            raise ValueError(f"Metric {name} already registered as {metric.kind}")
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames=()) -> Counter:
+        return self._get(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames=()) -> Gauge:
+        return self._get(Gauge, name, documentation, labelnames)
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames=(),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._get(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text format."""
+        lines: list[str] = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> str:
+        """Summarize the metrics in a human readable form."""
+        uptime = time.time() - self.started
+        lines = [f"uptime: {uptime / 3600:.1f} h"]
+        for metric in self.metrics.values():
+            for values, sample in metric._samples():
+                name = metric.name.removeprefix("operationbot_")
+                if values:
+                    name += f"[{','.join(values)}]"
+                if isinstance(sample, Histogram):
+                    if sample.count == 0:
+                        continue
+                    mean = sample.sum / sample.count * 1000
+                    p99 = sample.quantile(0.99) * 1000
+                    lines.append(
+                        f"{name}: n={sample.count} mean={mean:.1f}ms p99<={p99:g}ms"
+                    )
+                elif isinstance(sample, (Counter, Gauge)):
+                    lines.append(f"{name}: {_format_value(sample.value)}")
+        return "\n".join(lines)
+
+
+registry = Registry()
+
+
+def timed(histogram: Histogram) -> Callable[[F], F]:
+    """Record the duration of each call of the decorated function.
+
+    Works with both regular and coroutine functions.
+    """
+
+    def decorator(function: F) -> F:
+        if inspect.iscoroutinefunction(function):
+
+            @functools.wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                with histogram.time():
+                    return await function(*args, **kwargs)
+
+            return async_wrapper  # type: ignore
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with histogram.time():
+                return function(*args, **kwargs)
+
+        return wrapper  # type: ignore
+
+    return decorator
+
+
+async def _handle_request(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    try:
+        request = await reader.readline()
+        # Skip the request headers
+        while (await reader.readline()).strip():
+            pass
+        parts = request.decode("latin-1").split()
+        if len(parts) >= 2 and parts[0] == "GET" and parts[1] == "/metrics":
+            status = "200 OK"
+            body = registry.render().encode("utf-8")
+        else:
+            status = "404 Not Found"
+            body = b"Not found\n"
+        writer.write(
+            f"HTTP/1.1 {status}\r\n"
+            "Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Connection: close\r\n\r\n".encode("latin-1") + body
+        )
+        await writer.drain()
+    except (ConnectionError, asyncio.IncompleteReadError) as e:
+        logging.debug(f"Metrics request failed: {e}")
+    finally:
+        writer.close()
+
+
+async def start_server(host: str, port: int) -> asyncio.Server:
+    """Serve the metrics over HTTP at /metrics."""
+    return await asyncio.start_server(_handle_request, host, port)
@@ -0,0 +1,146 @@
+"""Partitioning of the bot state per served unit.
+
+One bot process can serve several units, each with its own event, archive,
+command and log channels and database files. The state of each unit lives in
+a partition of its own: module level objects such as `EventDatabase` are
+`PartitionLocal` proxies that resolve to the instance of the current
+partition.
+
+The current partition is tracked in a context variable. The event listener
+and the command handling enter the partition of the channel the payload came
+from, and each periodic task runs inside its own partition, so the code
+working with the state does not need to pass the partition around.
+"""
+
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List
+
+from operationbot import config as cfg
+
+DEFAULT = "default"
+
+_current: ContextVar[str] = ContextVar("partition", default=DEFAULT)
+
+
+class PartitionConfig:
+    def __init__(
+        self,
+        name: str,
+        event_channel: int,
+        archive_channel: int,
+        command_channel: int,
+        log_channel: int,
+        emoji_guild: int = 0,
+    ):
+        self.name = name
+        self.event_channel = event_channel
+        self.archive_channel = archive_channel
+        self.command_channel = command_channel
+        self.log_channel = log_channel
+        self.emoji_guild = emoji_guild
+
+    @property
+    def channels(self) -> Dict[str, int]:
+        """The channel IDs by the name of the bot attribute."""
+        return {
+            "commandchannel": self.command_channel,
+            "logchannel": self.log_channel,
+            "eventchannel": self.event_channel,
+            "eventarchivechannel": self.archive_channel,
+        }
+
+
+def configured() -> List[PartitionConfig]:
+    """Return the default partition and the ones in `config.PARTITIONS`."""
+    partitions = [
+        PartitionConfig(
+            DEFAULT,
+            cfg.EVENT_CHANNEL,
+            cfg.EVENT_ARCHIVE_CHANNEL,
+            cfg.COMMAND_CHANNEL,
+            cfg.LOG_CHANNEL,
+            cfg.EMOJI_GUILD,
+        )
+    ]
+    for name, settings in cfg.PARTITIONS.items():
+        if name == DEFAULT:
+            raise ValueError(f"Partition name {DEFAULT} is reserved")
+        partitions.append(PartitionConfig(name, **settings))
+    return partitions
+
+
+def current() -> str:
+    return _current.get()
+
+
+def settings(name: str = "") -> PartitionConfig:
+    """Return the configuration of the given or the current partition."""
+    name = name or current()
+    for partition in configured():
+        if partition.name == name:
+            return partition
+    raise ValueError(f"Unknown partition {name}")
+
+
+@contextmanager
+def use(name: str) -> Iterator[None]:
+    """Run the block in the given partition."""
+    token = _current.set(name)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+def path(key: str) -> str:
+    """Return the path of a database file of the current partition.
+
+    The default partition uses the paths in `config.JSON_FILEPATH`, the other
+    partitions use a subdirectory named after the partition.
+
+    >>> path("events")
+    'database/events.json'
+    >>> with use("other"):
+    ...     path("events")
+    'database/other/events.json'
+    """
+    filename = cfg.JSON_FILEPATH[key]
+    name = current()
+    if name == DEFAULT:
+        return filename
+    directory, basename = os.path.split(filename)
+    return os.path.join(directory, name, basename)
+
+
+class PartitionLocal:
+    """Proxy to a separate instance of an object for each partition.
+
+    The instances are created on first use with `factory(partition name)`.
+    Getting and setting attributes of the proxy accesses the instance of the
+    current partition.
+    """
+
+    def __init__(self, factory: Callable[[str], Any]):
+        object.__setattr__(self, "_factory", factory)
+        object.__setattr__(self, "_instances", {})
+
+    def _instance(self, name: str = "") -> Any:
+        name = name or current()
+        instances: Dict[str, Any] = self._instances
+        if name not in instances:
+            instances[name] = self._factory(name)
+        return instances[name]
+
+    def _all(self) -> List[Any]:
+        return list(self._instances.values())
+
+    def __getattr__(self, attribute: str) -> Any:
+        return getattr(self._instance(), attribute)
+
+    def __setattr__(self, attribute: str, value: Any):
+        setattr(self._instance(), attribute, value)
+
+    def __repr__(self) -> str:
+        return f"<{current()} partition of {self._instance()!r}>"
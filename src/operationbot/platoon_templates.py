@@ -0,0 +1,98 @@
+"""Precompiled platoon layouts for creating events.
+
+A template is compiled from `config.DEFAULT_GROUPS` and `config.DEFAULT_ROLES`
+once per platoon size and guild emoji set: the role emojis are resolved and the
+roles are grouped in the display order. New events get their role groups by
+cloning the template instead of walking the config and the guild emojis.
+
+A template is compiled again when the guild emojis or the layout of the
+platoon size in the config change, and all templates are dropped when the
+layouts are changed by a config reload.
+"""
+
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Tuple
+
+from discord import Emoji
+
+from operationbot import config as cfg
+from operationbot.additional_role_group import AdditionalRoleGroup
+from operationbot.config_watch import config_watcher
+from operationbot.role import Role
+from operationbot.roleGroup import RoleGroup
+
+# The name of a group and the names and emojis of its roles
+GroupLayout = Tuple[str, Tuple[Tuple[str, Optional[Emoji]], ...]]
+
+
+class PlatoonTemplate:
+    """The default role groups of a platoon size with the emojis resolved."""
+
+    def __init__(self, platoon_size: str, guildEmojis: Tuple[Emoji, ...]):
+        self.platoon_size = platoon_size
+        self._guildEmojis = guildEmojis
+        self._roles: Dict[str, str] = dict(cfg.DEFAULT_ROLES[platoon_size])
+        self._groups: List[str] = list(cfg.DEFAULT_GROUPS[platoon_size])
+        self.emojis: Mapping[str, Emoji] = MappingProxyType(
+            {emoji.name: emoji for emoji in guildEmojis if emoji.name in self._roles}
+        )
+        # The roles of each group in the display order. The emoji is None if
+        # the guild does not have it.
+        self.groups: Tuple[GroupLayout, ...] = tuple(
+            (
+                group,
+                tuple(
+                    (name, self.emojis.get(name))
+                    for name, groupName in self._roles.items()
+                    if groupName == group
+                ),
+            )
+            for group in dict.fromkeys(self._groups)
+        )
+
+    def matches(self, platoon_size: str, guildEmojis: Tuple[Emoji, ...]) -> bool:
+        """Check if the template is up to date with the emojis and the config."""
+        return (
+            platoon_size == self.platoon_size
+            and (guildEmojis is self._guildEmojis or guildEmojis == self._guildEmojis)
+            and cfg.DEFAULT_ROLES.get(platoon_size) == self._roles
+            and cfg.DEFAULT_GROUPS.get(platoon_size) == self._groups
+        )
+
+    def instantiate(self) -> Dict[str, RoleGroup]:
+        """Create new role groups with empty roles for an event.
+
+        Raises KeyError if the guild is missing the emoji of a role.
+        """
+        roleGroups: Dict[str, RoleGroup] = {}
+        for groupName, roles in self.groups:
+            group = RoleGroup(groupName)
+            for name, emoji in roles:
+                if emoji is None:
+                    raise KeyError(name)
+                group.roles.append(Role(name, emoji, False))
+            roleGroups[groupName] = group
+        roleGroups["Additional"] = AdditionalRoleGroup()
+        return roleGroups
+
+
+# The templates by the platoon size and the ID of the emoji guild, the
+# partitions may use different emoji guilds
+_templates: Dict[Tuple[str, Optional[int]], PlatoonTemplate] = {}
+
+
+def get_template(platoon_size: str, guildEmojis: Tuple[Emoji, ...]) -> PlatoonTemplate:
+    """Return the template of the platoon size, compiling it if needed."""
+    key = (platoon_size, guildEmojis[0].guild_id if guildEmojis else None)
+    template = _templates.get(key)
+    if template is None or not template.matches(platoon_size, guildEmojis):
+        template = PlatoonTemplate(platoon_size, guildEmojis)
+        _templates[key] = template
+    return template
+
+
+def _clear_templates(changed):
+    _templates.clear()
+
+
+config_watcher.subscribe({"DEFAULT_GROUPS", "DEFAULT_ROLES"}, _clear_templates)
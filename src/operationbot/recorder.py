@@ -0,0 +1,145 @@
+"""Recorder of the gateway events handled by the bot.
+
+The recording is a JSON lines file (gzip compressed if the file name ends with
+`.gz`). The first line is a header containing a snapshot of the active events
+and the guild emojis at the start of the recording, every following line is a
+single gateway event with its offset from the start of the recording in
+seconds. The recordings can be replayed against the offline Discord fake with
+`python -m benchmarks.replay`.
+"""
+
+import gzip
+import json
+import logging
+import time
+from datetime import datetime
+from typing import IO, Any, Optional, Tuple
+
+from discord import Emoji, Message, RawReactionActionEvent
+from discord.ext.commands import Context
+
+from operationbot.errors import EventNotFound
+from operationbot.eventDatabase import EventDatabase
+
+RECORDING_VERSION = 1
+# Seconds between writing the buffered events to the file, the recording is
+# also flushed when it is stopped
+FLUSH_INTERVAL = 5.0
+
+
+def open_recording(filename: str, mode: str) -> IO[str]:
+    if filename.endswith(".gz"):
+        return gzip.open(filename, f"{mode}t", encoding="utf-8")  # type: ignore
+    return open(filename, mode, encoding="utf-8")
+
+
+class GatewayRecorder:
+    """Appends the gateway events handled by the bot to a recording.
+
+    The recorder does nothing until `start` has been called.
+    """
+
+    def __init__(self):
+        self._file: Optional[IO[str]] = None
+        self._start = 0.0
+        self._flushed = 0.0
+        self.filename = ""
+
+    @property
+    def active(self) -> bool:
+        return self._file is not None
+
+    def start(self, filename: str, emojis: Tuple[Emoji, ...]):
+        """Start a new recording, snapshotting the current active events."""
+        self.stop()
+        self.filename = filename
+        self._file = open_recording(filename, "w")
+        self._start = self._flushed = time.monotonic()
+        header = {
+            "version": RECORDING_VERSION,
+            "started": datetime.now().isoformat(),
+            "emojis": {emoji.name: emoji.id for emoji in emojis},
+            "nextID": EventDatabase.nextID,
+            "events": {
+                event.id: event.toJson() for event in EventDatabase.events.values()
+            },
+        }
+        self._write(header)
+        self._file.flush()
+        logging.info(f"Recording gateway events to {filename}")
+
+    def stop(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _write(self, data: dict[str, Any]):
+        assert self._file is not None
+        self._file.write(json.dumps(data, separators=(",", ":")) + "\n")
+        now = time.monotonic()
+        # Flushing every line would end each gzip block after a single event
+        if now - self._flushed >= FLUSH_INTERVAL:
+            self._file.flush()
+            self._flushed = now
+
+    def _record(self, kind: str, **data):
+        if self._file is None:
+            return
+        data["t"] = round(time.monotonic() - self._start, 4)
+        data["e"] = kind
+        self._write(data)
+
+    def record_reaction(self, payload: RawReactionActionEvent, channel: str):
+        if self._file is None:
+            return
+        try:
+            event_id: Optional[int] = EventDatabase.getEventByMessage(
+                payload.message_id
+            ).id
+        except EventNotFound:
+            event_id = None
+        member = payload.member
+        self._record(
+            "reaction",
+            c=channel,
+            m=payload.message_id,
+            ev=event_id,
+            u=payload.user_id,
+            n=member.display_name if member is not None else "",
+            emoji=payload.emoji.name,
+            eid=payload.emoji.id,
+        )
+
+    def record_message(self, message: Message, channel: str):
+        self._record(
+            "message",
+            c=channel,
+            m=message.id,
+            u=message.author.id,
+            n=message.author.display_name,
+            content=message.content,
+        )
+
+    def record_command(self, ctx: Context):
+        self._record(
+            "command",
+            m=ctx.message.id,
+            u=ctx.author.id,
+            command=ctx.command.qualified_name if ctx.command else "",
+        )
+
+
+def read_recording(filename: str) -> Tuple[dict, list[dict]]:
+    """Read a recording, returning the header and the recorded events."""
+    with open_recording(filename, "r") as recording:
+        header = json.loads(recording.readline())
+        if header.get("version") != RECORDING_VERSION:
+            raise ValueError(
+                f"Unsupported recording version {header.get('version')}, "
+                f"expected {RECORDING_VERSION}"
+            )
+        events = [json.loads(line) for line in recording if line.strip()]
+    return header, events
+
+
+recorder = GatewayRecorder()
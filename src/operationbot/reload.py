@@ -1,43 +1,105 @@
+"""Reloading of the bot extensions without losing their runtime state.
+
+Before an extension is reloaded, `export_state()` is called on each of its
+cogs that defines it, and the returned state is passed to `import_state()` of
+the cog with the same name once the extension has been loaded again. The
+extensions are reloaded without yielding to the event loop, so no gateway
+event is dispatched while a listener is missing, and an extension that fails
+to load is restored to its previous version.
+"""
+
+import logging
 import traceback
+from time import perf_counter
+from typing import Any, Dict, List, Tuple
 
-from discord.ext.commands import Bot, Cog, Context, ExtensionNotLoaded, command
+from discord.ext.commands import Bot, Cog, Context, command
 
+from operationbot.config_watch import config_watcher
 from operationbot.main import initial_extensions
 
+# The exported state of the cogs of an extension by the cog name
+CogStates = Dict[str, Dict[str, Any]]
+
 
 class Reload(Cog):
     def __init__(self, bot: Bot):
         self.bot = bot
 
-    @command()
-    async def reload(self, ctx: Context):
-        print("Reloading extensions")
-        unloaded = []
-        for extension in initial_extensions:
-            try:
-                self.bot.unload_extension(extension)
-                print("unloaded", extension)
-            except ExtensionNotLoaded:
-                await ctx.send(f"Skipping unload for not loaded extension {extension}")
-            else:
-                unloaded.append(extension)
-        loaded = []
-        for extension in initial_extensions:
+    def export_states(self, extension: str) -> CogStates:
+        """Collect the runtime state of the cogs of the extension."""
+        return {
+            name: cog.export_state()
+            for name, cog in self.bot.cogs.items()
+            if cog.__module__ == extension and hasattr(cog, "export_state")
+        }
+
+    def import_states(self, states: CogStates):
+        """Hand the collected state over to the current cogs."""
+        for name, state in states.items():
+            cog = self.bot.get_cog(name)
+            if cog is not None and hasattr(cog, "import_state"):
+                cog.import_state(state)
+
+    def reload_extensions(
+        self, extensions: List[str]
+    ) -> Tuple[List[str], List[Tuple[str, str]]]:
+        """Reload the extensions, handing over the state of their cogs.
+
+        Returns the reloaded extensions with the time it took to reload each
+        of them and the extensions that failed to load with the traceback.
+        """
+        reloaded: List[str] = []
+        failed: List[Tuple[str, str]] = []
+        for extension in extensions:
+            start = perf_counter()
+            states = self.export_states(extension)
             try:
-                self.bot.load_extension(extension)
-                print("loaded", extension)
+                if extension in self.bot.extensions:
+                    self.bot.reload_extension(extension)
+                else:
+                    self.bot.load_extension(extension)
             except Exception:  # pylint: disable=broad-except
-                await ctx.send(
-                    "An error occured while reloading: "
-                    f"```py\n{traceback.format_exc()}```"
-                )
+                failed.append((extension, traceback.format_exc()))
             else:
-                loaded.append(extension)
-        if len(loaded) > 0:
-            await ctx.send(f"Reloaded following extensions: {loaded}")
-            not_loaded = [item for item in unloaded if item not in loaded]
-            if len(not_loaded) > 0:
-                await ctx.send(f"Failed to reload following extensions: {not_loaded}")
+                elapsed = (perf_counter() - start) * 1000
+                reloaded.append(f"{extension} ({elapsed:.0f} ms)")
+            # A failed reload restores the previous version of the extension,
+            # its new cogs take over the state as well
+            self.import_states(states)
+        return reloaded, failed
+
+    @command()
+    async def reload(self, ctx: Context):
+        logging.info("Reloading extensions")
+        start = perf_counter()
+        try:
+            config_watcher.reload()
+        except ValueError as e:
+            config_error = f"{e}\nKeeping the previous configuration"
+        else:
+            config_error = ""
+        reloaded, failed = self.reload_extensions(initial_extensions)
+        elapsed = (perf_counter() - start) * 1000
+        logging.info(f"Reloaded {len(reloaded)} extensions in {elapsed:.0f} ms")
+
+        if config_error:
+            await ctx.send(config_error)
+        for extension, trace in failed:
+            await ctx.send(
+                f"An error occured while reloading {extension}, keeping the "
+                f"previous version: ```py\n{trace}```"
+            )
+        if len(reloaded) > 0:
+            await ctx.send(
+                f"Reloaded following extensions in {elapsed:.0f} ms: "
+                f"{', '.join(reloaded)}"
+            )
+        if len(failed) > 0:
+            await ctx.send(
+                "Failed to reload following extensions: "
+                f"{[extension for extension, _ in failed]}"
+            )
 
 
 def setup(bot):
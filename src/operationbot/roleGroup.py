@@ -1,4 +1,4 @@
-from typing import Any, Dict, List, Tuple, Union
+from typing import Any, Dict, List, Set, Tuple, Union
 
 from discord import Emoji
 
@@ -79,15 +79,18 @@ class RoleGroup:
         if not manual_load:
             self.isInline = data["isInline"]
 
-        roles: List[str] = []
+        roles: Set[Union[str, Emoji]] = set()
+        # Lookup tables instead of searching the emojis and the roles for each
+        # imported role. The first emoji with a name wins, as in a search.
+        emojisByName: Dict[str, Emoji] = {}
+        for emoji in emojis:
+            emojisByName.setdefault(emoji.name, emoji)
+        rolesByEmoji = {role.emoji: role for role in self.roles}
         for roleEmoji, roleData in data["roles"].items():
             try:
                 roleEmoji = cfg.ADDITIONAL_ROLE_EMOJIS[int(roleEmoji)]
             except ValueError:
-                for emoji in emojis:
-                    if emoji.name == roleEmoji:
-                        roleEmoji = emoji
-                        break
+                roleEmoji = emojisByName.get(roleEmoji, roleEmoji)
             if not manual_load:
                 # Only create new roles if we're not loading data manually from
                 # the command channel
@@ -97,13 +100,13 @@ class RoleGroup:
                 self.roles.append(role)
             else:
                 try:
-                    role = next(x for x in self.roles if x.emoji == roleEmoji)
-                except StopIteration as e:
+                    role = rolesByEmoji[roleEmoji]
+                except KeyError as e:
                     name = roleData.get("show_name") or roleData["name"]
                     raise UnexpectedRole(
                         f"Cannot import unexpected role '{name}'"
                     ) from e
-                roles.append(roleEmoji)
+                roles.add(roleEmoji)
 
             role.fromJson(roleData, manual_load=manual_load)
         if manual_load:
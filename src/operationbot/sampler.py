@@ -0,0 +1,180 @@
+"""Sampling profiler of the event loop thread and a dump of the asyncio tasks.
+
+The profiler runs in a background thread that takes the stack of the event
+loop thread at a fixed interval, so the profiled code is not instrumented and
+the overhead stays low enough to profile the live bot. The samples are
+summarized as the hottest functions or written in the collapsed stack format
+read by flamegraph tools (e.g. `flamegraph.pl` or speedscope).
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from types import FrameType
+from typing import Any, List, Optional, Tuple
+from typing import Counter as CounterType
+
+# Samples with the event loop thread waiting in the selector are idle time
+IDLE_FILES = ("selectors.py",)
+
+Stack = Tuple[str, ...]
+
+
+def _frame_name(frame: FrameType) -> str:
+    code = frame.f_code
+    filename = os.path.basename(code.co_filename)
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """Samples the stack of a thread periodically."""
+
+    def __init__(self):
+        # Number of samples per stack, the outermost frame first
+        self.samples: CounterType[Stack] = Counter()
+        self.interval = 0.01
+        self.started = 0.0
+        self.stopped = 0.0
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def total(self) -> int:
+        return sum(self.samples.values())
+
+    def start(
+        self,
+        interval: float,
+        duration: float,
+        thread_id: Optional[int] = None,
+    ) -> bool:
+        """Start sampling the thread (the current one by default).
+
+        The sampling stops by itself after `duration` seconds. Returns False
+        if the profiler is already running.
+        """
+        if self.running:
+            return False
+        self.samples = Counter()
+        self.interval = interval
+        self.started = time.monotonic()
+        self.stopped = 0.0
+        self._stop.clear()
+        target = thread_id if thread_id is not None else threading.get_ident()
+        self._thread = threading.Thread(
+            target=self._run,
+            args=(target, self.started + duration),
+            name="Sampling profiler",
+            daemon=True,
+        )
+        self._thread.start()
+        return True
+
+    def stop(self) -> bool:
+        """Stop sampling. Returns False if the profiler was not running."""
+        if self._thread is None:
+            return False
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        return True
+
+    def _run(self, thread_id: int, deadline: float):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(thread_id)
+            if frame is None:
+                break
+            stack: List[str] = []
+            while frame is not None:
+                stack.append(_frame_name(frame))
+                frame = frame.f_back
+            self.samples[tuple(reversed(stack))] += 1
+            if time.monotonic() > deadline:
+                break
+        self.stopped = time.monotonic()
+
+    @property
+    def duration(self) -> float:
+        """Seconds the profiler has been sampling."""
+        if not self.started:
+            return 0.0
+        return (self.stopped or time.monotonic()) - self.started
+
+    def _idle(self, stack: Stack) -> bool:
+        return bool(stack) and stack[-1].split(" (")[1].startswith(IDLE_FILES)
+
+    def top(self, limit: int = 20, by_self=False) -> str:
+        """Summarize the functions seen in the most samples.
+
+        The total share counts the samples with the function anywhere in the
+        stack, the self share only the ones with it as the innermost frame.
+        The functions are ordered by the total share unless `by_self` is set.
+        The idle samples are left out of the shares.
+        """
+        inclusive: CounterType[str] = Counter()
+        exclusive: CounterType[str] = Counter()
+        busy = 0
+        for stack, count in self.samples.items():
+            if not stack or self._idle(stack):
+                continue
+            busy += count
+            exclusive[stack[-1]] += count
+            for name in set(stack):
+                inclusive[name] += count
+        total = self.total
+        lines = [
+            f"{total} samples in {self.duration:.1f} s, "
+            f"{busy / total * 100 if total else 0:.1f}% busy",
+            f"{'total':>6} {'self':>6}  function",
+        ]
+        for name, _ in (exclusive if by_self else inclusive).most_common(limit):
+            lines.append(
+                f"{inclusive[name] / busy * 100:5.1f}% "
+                f"{exclusive[name] / busy * 100:5.1f}%  {name}"
+            )
+        return "\n".join(lines)
+
+    def collapsed(self) -> str:
+        """Return the samples in the collapsed stack format."""
+        return "\n".join(
+            f"{';'.join(stack)} {count}" for stack, count in self.samples.items()
+        )
+
+
+def _awaiting(task: "asyncio.Task") -> List[str]:
+    """Follow the chain of awaited objects from the coroutine of the task."""
+    chain: List[str] = []
+    awaitable: Any = task.get_coro()
+    while awaitable is not None:
+        frame = getattr(awaitable, "cr_frame", None) or getattr(
+            awaitable, "gi_frame", None
+        )
+        name = getattr(awaitable, "__qualname__", type(awaitable).__name__)
+        if frame is not None:
+            filename = os.path.basename(frame.f_code.co_filename)
+            name = f"{name} ({filename}:{frame.f_lineno})"
+        chain.append(name)
+        awaitable = getattr(awaitable, "cr_await", None) or getattr(
+            awaitable, "gi_yieldfrom", None
+        )
+    return chain
+
+
+def task_dump(loop: Optional[asyncio.AbstractEventLoop] = None) -> str:
+    """Describe the pending tasks of the loop and what they are awaiting."""
+    tasks = sorted(asyncio.all_tasks(loop), key=lambda task: task.get_name())
+    lines = [f"{len(tasks)} tasks"]
+    for task in tasks:
+        lines.append(f"{task.get_name()}:")
+        lines.extend(f"  {name}" for name in _awaiting(task))
+    return "\n".join(lines)
+
+
+profiler = SamplingProfiler()
@@ -0,0 +1,216 @@
+"""Inverted index for searching the active and the archived events.
+
+Each event is split into (field, token) terms, e.g. ("terrain", "altis") or
+("zeus", "1234"), and the index maps each term to the IDs of the events
+containing it. A query is answered by intersecting the ID sets of its terms,
+so it does not need to look at the events at all.
+
+The terms of the archived events are persisted next to the archive, so the
+archive does not need to be tokenized again on startup. The active events
+change with every signup and are reindexed before each search instead.
+"""
+
+import json
+import os
+import re
+import shlex
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from operationbot import config as cfg
+from operationbot import partitions
+from operationbot.event import Event
+from operationbot.event_index import EventSummary
+
+SEARCH_INDEX_VERSION = 1
+
+TEXT_FIELDS = ("terrain", "faction", "title", "description", "mods", "dlc")
+USER_FIELDS = ("zeus", "user")
+FIELDS = TEXT_FIELDS + USER_FIELDS
+
+_WORD = re.compile(r"\w+")
+_MENTION = re.compile(r"<@!?(\d+)>")
+
+Term = Tuple[str, str]
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase words.
+
+    >>> tokenize("Operation Golden-Hammer (USMC)")
+    ['operation', 'golden', 'hammer', 'usmc']
+    """
+    return _WORD.findall(str(text).lower())
+
+
+def user_tokens(user_id: Optional[int], name: str) -> List[str]:
+    """Return the tokens matching a user: the ID and the full name."""
+    tokens = []
+    if user_id is not None:
+        tokens.append(str(user_id))
+    if name:
+        tokens.append(name.lower())
+    return tokens
+
+
+def event_terms(event: Event) -> Set[Term]:
+    terms: Set[Term] = set()
+    for field in TEXT_FIELDS:
+        terms.update((field, token) for token in tokenize(getattr(event, field)))
+    for group in event.roleGroups.values():
+        for role in group.roles:
+            tokens = user_tokens(role.userID, role.userName or "")
+            terms.update(("user", token) for token in tokens)
+            if role.name == cfg.EMOJI_ZEUS:
+                terms.update(("zeus", token) for token in tokens)
+    for user in event.attendees:
+        terms.update(
+            ("user", token) for token in user_tokens(user.id, user.display_name or "")
+        )
+    return terms
+
+
+def parse_query(query: str) -> List[Tuple[Tuple[str, ...], List[str]]]:
+    """Parse a query into (fields, tokens) pairs that all have to match.
+
+    Words without a field match any of the text fields. Values with spaces
+    can be quoted.
+
+    >>> parse_query('zeus:"Some One" title:hammer')
+    [(('zeus',), ['some one']), (('title',), ['hammer'])]
+    """
+    try:
+        words = shlex.split(query)
+    except ValueError as e:
+        raise ValueError(f"Invalid query: {e}") from e
+    clauses: List[Tuple[Tuple[str, ...], List[str]]] = []
+    for word in words:
+        field, sep, value = word.partition(":")
+        if not sep:
+            field, value = "", word
+        field = field.lower()
+        if field and field not in FIELDS:
+            raise ValueError(f"Unknown field: {field}. Fields: {', '.join(FIELDS)}")
+        if field in USER_FIELDS:
+            mention = _MENTION.fullmatch(value)
+            tokens = [mention.group(1) if mention else value.lower()]
+        else:
+            tokens = tokenize(value)
+        if tokens:
+            clauses.append(((field,) if field else TEXT_FIELDS, tokens))
+    if not clauses:
+        raise ValueError("Empty query")
+    return clauses
+
+
+class SearchIndex:
+    def __init__(self):
+        self.postings: Dict[Term, Set[int]] = {}
+        self.terms: Dict[int, Set[Term]] = {}
+        # Date, summary line and archive status of the indexed events
+        self.docs: Dict[int, Dict[str, Any]] = {}
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def add(self, event: Event, archived=False):
+        """Index an event, replacing its earlier terms."""
+        summary = EventSummary(event)
+        self._add(
+            event.id,
+            event_terms(event),
+            {
+                "date": summary.date.isoformat(),
+                "line": summary.line,
+                "archived": archived,
+            },
+        )
+
+    def _add(self, event_id: int, terms: Set[Term], doc: Dict[str, Any]):
+        self.remove(event_id)
+        self.terms[event_id] = terms
+        self.docs[event_id] = doc
+        for term in terms:
+            self.postings.setdefault(term, set()).add(event_id)
+
+    def remove(self, event_id: int):
+        for term in self.terms.pop(event_id, ()):
+            ids = self.postings[term]
+            ids.discard(event_id)
+            if not ids:
+                del self.postings[term]
+        self.docs.pop(event_id, None)
+
+    def rebuild(self, archive: Iterable[Event]):
+        """Index the archived events from scratch."""
+        self.postings, self.terms, self.docs = {}, {}, {}
+        for event in archive:
+            self.add(event, archived=True)
+
+    def refresh(self, events: Iterable[Event]):
+        """Reindex the active events."""
+        active = {event.id for event in events}
+        for event_id, doc in list(self.docs.items()):
+            if not doc["archived"] and event_id not in active:
+                self.remove(event_id)
+        for event in events:
+            self.add(event)
+
+    def search(self, query: str) -> List[Dict[str, Any]]:
+        """Return the events matching the query, the newest first.
+
+        Raises ValueError if the query is invalid.
+        """
+        matches: Optional[Set[int]] = None
+        for fields, tokens in parse_query(query):
+            for token in tokens:
+                ids: Set[int] = set()
+                for field in fields:
+                    ids |= self.postings.get((field, token), set())
+                matches = ids if matches is None else matches & ids
+                if not matches:
+                    return []
+        return sorted(
+            (self.docs[event_id] for event_id in matches or ()),
+            key=lambda doc: doc["date"],
+            reverse=True,
+        )
+
+    def save(self, filename: Optional[str] = None):
+        """Store the terms of the archived events."""
+        if filename is None:
+            filename = partitions.path("search")
+        data = {
+            "version": SEARCH_INDEX_VERSION,
+            "events": {
+                event_id: {"doc": doc, "terms": sorted(self.terms[event_id])}
+                for event_id, doc in self.docs.items()
+                if doc["archived"]
+            },
+        }
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        with open(filename, "w") as jsonFile:
+            json.dump(data, jsonFile, separators=(",", ":"))
+
+    def load(self, archive: Dict[int, Event], filename: Optional[str] = None) -> bool:
+        """Load the stored terms of the archived events.
+
+        Returns False, leaving the index empty, if the stored index is missing
+        or does not match the archive.
+        """
+        if filename is None:
+            filename = partitions.path("search")
+        self.postings, self.terms, self.docs = {}, {}, {}
+        try:
+            with open(filename) as jsonFile:
+                data = json.load(jsonFile)
+        except (FileNotFoundError, json.decoder.JSONDecodeError):
+            return False
+        if data.get("version") != SEARCH_INDEX_VERSION:
+            return False
+        events = {int(event_id): value for event_id, value in data["events"].items()}
+        if set(events) != set(archive):
+            return False
+        for event_id, value in events.items():
+            terms = {(field, token) for field, token in value["terms"]}
+            self._add(event_id, terms, value["doc"])
+        return True
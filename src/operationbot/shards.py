@@ -0,0 +1,291 @@
+"""Coordination of the bot shards running in separate processes.
+
+When the bot runs as several gateway shards (`SHARD_COUNT` in the config), one
+process per shard, the shards share a SQLite database in WAL mode
+(`SHARD_STORE`). The store owns the event state: every shard writes the events
+it changes as separate rows and applies the rows written by the other shards
+before handling a reaction, a command or a task. Leases with an expiry time
+make sure only one shard changes a given event at a time, and the lease on the
+leader role elects the shard that runs the periodic tasks.
+
+The JSON database files are still written by every shard, but they are only a
+snapshot of the state: when the store contains events, they are loaded from
+the store instead.
+
+The coordinator does nothing until `start` has been called. An inactive
+coordinator grants every lease and is always the leader.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from operationbot.errors import LeaseNotAcquired
+
+LEADER = "leader"
+# Delay between the attempts to acquire a lease that is held by another shard
+LEASE_RETRY_DELAY = 0.1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS leases (
+    name TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS events (
+    partition TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    archived INTEGER NOT NULL,
+    data TEXT,
+    revision INTEGER NOT NULL,
+    PRIMARY KEY (partition, id)
+);
+CREATE INDEX IF NOT EXISTS events_revision ON events (partition, revision);
+"""
+
+# Change of a single event: the event ID, whether the event is archived and
+# the event data, or None if the event was removed
+EventChange = Tuple[int, bool, Optional[Dict[str, Any]]]
+
+
+class ShardCoordinator:
+    """Shares the event state and the leases between the shard processes."""
+
+    def __init__(self):
+        self._db: Optional[sqlite3.Connection] = None
+        self.shard_id = 0
+        self.owner = ""
+        self.lease_time = 30.0
+        self._leader = False
+        # Latest revision applied from the store, per partition
+        self._revisions: Dict[str, int] = {}
+        # Serialized data of the events as last written to or read from the
+        # store, by partition and event ID
+        self._rows: Dict[Tuple[str, int], Tuple[bool, Optional[str]]] = {}
+
+    @property
+    def active(self) -> bool:
+        return self._db is not None
+
+    @property
+    def leader(self) -> bool:
+        """Whether this shard runs the periodic tasks."""
+        return self._leader or not self.active
+
+    def start(self, filename: str, shard_id: int, lease_time: float):
+        self.stop()
+        directory = os.path.dirname(filename)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Autocommit mode, the transactions are started explicitly
+        self._db = sqlite3.connect(filename, timeout=10, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+        self.shard_id = shard_id
+        self.owner = f"shard {shard_id} (pid {os.getpid()})"
+        self.lease_time = lease_time
+        self._revisions = {}
+        self._rows = {}
+        self.elect()
+        logging.info(f"Coordinating as {self.owner} through {filename}")
+
+    def stop(self):
+        if self._db is not None:
+            self._db.execute("DELETE FROM leases WHERE owner = ?", (self.owner,))
+            self._db.close()
+            self._db = None
+            self._leader = False
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        assert self._db is not None
+        # Take the write lock right away so that the reads in the transaction
+        # see the latest state
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            yield self._db
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        self._db.execute("COMMIT")
+
+    # Leases
+
+    def acquire(self, name: str) -> bool:
+        """Acquire or renew the named lease.
+
+        Returns False if the lease is held by another shard.
+        """
+        if self._db is None:
+            return True
+        now = time.time()
+        with self._transaction() as db:
+            row = db.execute(
+                "SELECT owner, expires FROM leases WHERE name = ?", (name,)
+            ).fetchone()
+            if row is not None and row[0] != self.owner and row[1] > now:
+                return False
+            db.execute(
+                "INSERT OR REPLACE INTO leases VALUES (?, ?, ?)",
+                (name, self.owner, now + self.lease_time),
+            )
+        return True
+
+    def release(self, name: str):
+        if self._db is None:
+            return
+        with self._transaction() as db:
+            db.execute(
+                "DELETE FROM leases WHERE name = ? AND owner = ?", (name, self.owner)
+            )
+
+    @asynccontextmanager
+    async def lease(
+        self, name: str, timeout: Optional[float] = None
+    ) -> AsyncIterator[None]:
+        """Hold the named lease for the duration of the block.
+
+        Waits for the lease for up to `timeout` seconds (the lease time by
+        default) and raises LeaseNotAcquired if it is still held by another
+        shard.
+        """
+        if timeout is None:
+            timeout = self.lease_time
+        deadline = time.monotonic() + timeout
+        while not self.acquire(name):
+            if time.monotonic() > deadline:
+                raise LeaseNotAcquired(f"Lease {name} is held by another shard")
+            await asyncio.sleep(LEASE_RETRY_DELAY)
+        try:
+            yield
+        finally:
+            self.release(name)
+
+    def elect(self) -> bool:
+        """Acquire or renew the leader lease.
+
+        Needs to be called more often than the lease time for the shard to
+        stay the leader.
+        """
+        leader = self.acquire(LEADER)
+        if leader != self._leader:
+            logging.info(
+                f"{self.owner} is {'now' if leader else 'no longer'} the leader"
+            )
+        self._leader = leader
+        return leader
+
+    # Event state
+
+    def _next_revision(self, db: sqlite3.Connection) -> int:
+        db.execute(
+            "INSERT OR IGNORE INTO counters VALUES ('revision', 0)",
+        )
+        db.execute("UPDATE counters SET value = value + 1 WHERE name = 'revision'")
+        return db.execute(
+            "SELECT value FROM counters WHERE name = 'revision'"
+        ).fetchone()[0]
+
+    def has_events(self, partition: str) -> bool:
+        assert self._db is not None
+        row = self._db.execute(
+            "SELECT 1 FROM events WHERE partition = ? LIMIT 1", (partition,)
+        ).fetchone()
+        return row is not None
+
+    def next_id(self, partition: str) -> int:
+        if self._db is None:
+            return 0
+        row = self._db.execute(
+            "SELECT value FROM counters WHERE name = ?", (f"{partition}:nextID",)
+        ).fetchone()
+        return row[0] if row is not None else 0
+
+    def changes(self, partition: str) -> List[EventChange]:
+        """Return the changes saved by the other shards since the last call."""
+        if self._db is None:
+            return []
+        revision = self._revisions.get(partition, 0)
+        rows = self._db.execute(
+            "SELECT id, archived, data, revision FROM events "
+            "WHERE partition = ? AND revision > ? ORDER BY revision",
+            (partition, revision),
+        ).fetchall()
+        changes = []
+        for event_id, archived, data, row_revision in rows:
+            revision = max(revision, row_revision)
+            if self._rows.get((partition, event_id)) == (bool(archived), data):
+                # Written by this shard
+                continue
+            self._rows[(partition, event_id)] = (bool(archived), data)
+            changes.append(
+                (event_id, bool(archived), json.loads(data) if data else None)
+            )
+        self._revisions[partition] = revision
+        return changes
+
+    def save(
+        self,
+        partition: str,
+        events: Dict[int, Dict[str, Any]],
+        archived: bool,
+        next_id: int,
+    ):
+        """Store the events that changed since they were last saved or read.
+
+        `events` contains the data of all active or all archived events of the
+        partition. The events missing from it that were last seen with the
+        same archived state are marked as removed.
+        """
+        if self._db is None:
+            return
+        rows: Dict[int, Tuple[bool, Optional[str]]] = {
+            event_id: (archived, json.dumps(data, sort_keys=True))
+            for event_id, data in events.items()
+        }
+        for (row_partition, event_id), (row_archived, data) in self._rows.items():
+            if (
+                row_partition == partition
+                and row_archived == archived
+                and data is not None
+                and event_id not in rows
+            ):
+                rows[event_id] = (archived, None)
+        changed = {
+            event_id: row
+            for event_id, row in rows.items()
+            if self._rows.get((partition, event_id)) != row
+        }
+        with self._transaction() as db:
+            db.execute(
+                "INSERT OR IGNORE INTO counters VALUES (?, 0)",
+                (f"{partition}:nextID",),
+            )
+            db.execute(
+                "UPDATE counters SET value = max(value, ?) WHERE name = ?",
+                (next_id, f"{partition}:nextID"),
+            )
+            if not changed:
+                return
+            revision = self._next_revision(db)
+            db.executemany(
+                "INSERT OR REPLACE INTO events VALUES (?, ?, ?, ?, ?)",
+                [
+                    (partition, event_id, row_archived, data, revision)
+                    for event_id, (row_archived, data) in changed.items()
+                ],
+            )
+        for event_id, row in changed.items():
+            self._rows[(partition, event_id)] = row
+
+
+coordinator = ShardCoordinator()
@@ -0,0 +1,316 @@
+"""Time series of the signups and signoffs of each event.
+
+Each reaction handled by the event listener appends a (time, action, role)
+entry to a fixed-size ring buffer of the event. Recording does not touch the
+disk and walks the roles of the event only for its first entry; the buffers
+are saved periodically by a task. The number of filled roles is kept as a
+running base count: when an entry drops out of a full buffer, its change is
+folded into the base so that the filled count of the remaining entries stays
+correct.
+
+The reports group the events by type (Reforger and the platoon size) and
+show how full the events were before the start, how long before the start
+they were full and how many signups were later withdrawn.
+"""
+
+import base64
+import json
+import logging
+import os
+import statistics
+import time
+from array import array
+from typing import Dict, Iterator, List, Optional, Tuple, cast
+
+from operationbot import config as cfg
+from operationbot import partitions
+from operationbot.event import Event
+
+TRACKER_VERSION = 1
+
+SIGNUP = 1
+SIGNOFF = -1
+CHANGE = 0
+ACTIONS = {"SIGNUP": SIGNUP, "SIGNOFF": SIGNOFF, "CHANGE": CHANGE}
+
+# Hours before the event start shown in the fill curves
+CURVE_HOURS = (168, 72, 24, 0)
+
+
+def event_type(event: Event) -> str:
+    return f"Reforger {event.platoon_size}" if event.reforger else event.platoon_size
+
+
+def _encode(column: array) -> str:
+    return base64.b64encode(column.tobytes()).decode()
+
+
+def _decode(typecode: str, data: str) -> array:
+    column = array(typecode)
+    column.frombytes(base64.b64decode(data))
+    return column
+
+
+class SignupSeries:
+    """Ring buffer of the signup actions of a single event."""
+
+    def __init__(
+        self,
+        event_type: str,
+        date: float,
+        slots: int,
+        base: int,
+        groups: Dict[str, str],
+        capacity: int,
+    ):
+        self.event_type = event_type
+        self.date = date
+        self.slots = slots
+        # Number of filled roles before the oldest entry
+        self.base = base
+        self.groups = groups
+        self.capacity = capacity
+        self.times = array("d", bytes(8 * capacity))
+        self.actions = array("b", bytes(capacity))
+        self.roles = array("H", bytes(2 * capacity))
+        self.start = 0
+        self.count = 0
+
+    def append(self, timestamp: float, action: int, role: int):
+        if self.count < self.capacity:
+            index = (self.start + self.count) % self.capacity
+            self.count += 1
+        else:
+            index = self.start
+            self.base += self.actions[index]
+            self.start = (self.start + 1) % self.capacity
+        self.times[index] = timestamp
+        self.actions[index] = action
+        self.roles[index] = role
+
+    def entries(self) -> Iterator[Tuple[float, int, int]]:
+        """Iterate the entries from the oldest to the newest."""
+        for offset in range(self.count):
+            index = (self.start + offset) % self.capacity
+            yield self.times[index], self.actions[index], self.roles[index]
+
+    def filled(self) -> Iterator[Tuple[float, int]]:
+        """Iterate the number of filled roles after each entry."""
+        filled = self.base
+        for timestamp, action, _ in self.entries():
+            filled += action
+            yield timestamp, filled
+
+    def filled_at(self, timestamp: float) -> int:
+        result = self.base
+        for entry_time, filled in self.filled():
+            if entry_time > timestamp:
+                break
+            result = filled
+        return result
+
+    def time_to_full(self) -> Optional[float]:
+        """Hours before the start when the event first became full."""
+        for timestamp, filled in self.filled():
+            if filled >= self.slots:
+                return (self.date - timestamp) / 3600
+        return None
+
+    def count_actions(self, action: int) -> int:
+        return sum(1 for _, entry_action, _ in self.entries() if entry_action == action)
+
+    def toJson(self) -> dict:
+        entries = list(self.entries())
+        return {
+            "type": self.event_type,
+            "date": self.date,
+            "slots": self.slots,
+            "base": self.base,
+            "groups": self.groups,
+            "times": _encode(array("d", (entry[0] for entry in entries))),
+            "actions": _encode(array("b", (entry[1] for entry in entries))),
+            "roles": _encode(array("H", (entry[2] for entry in entries))),
+        }
+
+    @classmethod
+    def fromJson(cls, data: dict, capacity: int) -> "SignupSeries":
+        series = cls(
+            data["type"],
+            data["date"],
+            data["slots"],
+            data["base"],
+            data["groups"],
+            capacity,
+        )
+        columns = zip(
+            _decode("d", data["times"]),
+            _decode("b", data["actions"]),
+            _decode("H", data["roles"]),
+        )
+        for timestamp, action, role in columns:
+            series.append(timestamp, action, role)
+        return series
+
+
+class SignupTracker:
+    def __init__(self, capacity: Optional[int] = None):
+        self.capacity = capacity or cfg.SIGNUP_TRACKER_LENGTH
+        self.series: Dict[int, SignupSeries] = {}
+        self.role_names: List[str] = []
+        self._role_codes: Dict[str, int] = {}
+        self.dirty = False
+        self._loaded = False
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self.load()
+
+    def record(self, event: Event, action: str, role_name: str):
+        """Record a signup, signoff or role change of an event."""
+        self._ensure_loaded()
+        series = self.series.get(event.id)
+        if series is None:
+            series = self._start_series(event, ACTIONS[action])
+        code = self._role_codes.get(role_name)
+        if code is None:
+            code = self._role_codes[role_name] = len(self.role_names)
+            self.role_names.append(role_name)
+        series.append(time.time(), ACTIONS[action], code)
+        self.dirty = True
+
+    def _start_series(self, event: Event, action: int) -> SignupSeries:
+        groups = {}
+        for group in event.roleGroups.values():
+            for role in group.roles:
+                groups[role.name] = group.name
+        filled = sum(
+            1
+            for group in event.roleGroups.values()
+            for role in group.roles
+            if role.userID is not None
+        )
+        series = SignupSeries(
+            event_type(event),
+            event.date.timestamp(),
+            len(groups),
+            # The action being recorded has been applied to the event already
+            filled - action,
+            groups,
+            self.capacity,
+        )
+        self.series[event.id] = series
+        # Drop the oldest events
+        while len(self.series) > cfg.SIGNUP_TRACKER_EVENTS:
+            del self.series[next(iter(self.series))]
+        return series
+
+    def report(self) -> List[str]:
+        """Summarize the fill rates per event type, one line per type."""
+        self._ensure_loaded()
+        by_type: Dict[str, List[SignupSeries]] = {}
+        for series in self.series.values():
+            by_type.setdefault(series.event_type, []).append(series)
+        lines = []
+        for name, events in sorted(by_type.items()):
+            curve = ", ".join(
+                f"{hours}h: {self._average_fill(events, hours):.0%}"
+                for hours in CURVE_HOURS
+            )
+            full = [
+                hours
+                for hours in (series.time_to_full() for series in events)
+                if hours is not None
+            ]
+            if full:
+                full_text = (
+                    f"full {len(full)}/{len(events)}, median "
+                    f"{statistics.median(full):.0f}h before start"
+                )
+            else:
+                full_text = f"full 0/{len(events)}"
+            signups = sum(series.count_actions(SIGNUP) for series in events)
+            signoffs = sum(series.count_actions(SIGNOFF) for series in events)
+            churn = signoffs / signups if signups else 0.0
+            lines.append(
+                f"{name} ({len(events)} events): {curve}; {full_text}; "
+                f"churn {churn:.0%} ({signoffs} signoffs / {signups} signups)"
+            )
+        return lines
+
+    def event_report(self, event_id: int) -> List[str]:
+        """Describe the fill curve and the changes of a single event."""
+        self._ensure_loaded()
+        series = self.series.get(event_id)
+        if series is None:
+            return []
+        lines = [
+            f"{hours}h before start: {series.filled_at(series.date - hours * 3600)}"
+            f"/{series.slots} filled"
+            for hours in CURVE_HOURS
+        ]
+        full = series.time_to_full()
+        if full is not None:
+            lines.append(f"Full {full:.1f}h before start")
+        group_changes: Dict[str, int] = {}
+        for _, _, role in series.entries():
+            group = series.groups.get(self.role_names[role], "Unknown")
+            group_changes[group] = group_changes.get(group, 0) + 1
+        lines.append(
+            "Signup actions per group: "
+            + ", ".join(f"{group}: {count}" for group, count in group_changes.items())
+        )
+        lines.append(
+            f"Signups: {series.count_actions(SIGNUP)}, "
+            f"signoffs: {series.count_actions(SIGNOFF)}, "
+            f"role changes: {series.count_actions(CHANGE)}"
+        )
+        return lines
+
+    @staticmethod
+    def _average_fill(events: List[SignupSeries], hours: int) -> float:
+        rates = [
+            series.filled_at(series.date - hours * 3600) / series.slots
+            for series in events
+            if series.slots
+        ]
+        return statistics.mean(rates) if rates else 0.0
+
+    def save(self, filename: Optional[str] = None):
+        if filename is None:
+            filename = partitions.path("signups")
+        data = {
+            "version": TRACKER_VERSION,
+            "roles": self.role_names,
+            "events": {
+                event_id: series.toJson() for event_id, series in self.series.items()
+            },
+        }
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        with open(filename, "w") as jsonFile:
+            json.dump(data, jsonFile, separators=(",", ":"))
+        self.dirty = False
+
+    def load(self, filename: Optional[str] = None):
+        if filename is None:
+            filename = partitions.path("signups")
+        self._loaded = True
+        self.series, self.role_names, self._role_codes = {}, [], {}
+        self.dirty = False
+        try:
+            with open(filename) as jsonFile:
+                data = json.load(jsonFile)
+        except (FileNotFoundError, json.decoder.JSONDecodeError):
+            return
+        if data.get("version") != TRACKER_VERSION:
+            logging.warning("Unknown signup tracker version, starting from scratch")
+            return
+        self.role_names = data["roles"]
+        self._role_codes = {name: code for code, name in enumerate(self.role_names)}
+        for event_id, series_data in data["events"].items():
+            self.series[int(event_id)] = SignupSeries.fromJson(
+                series_data, self.capacity
+            )
+
+
+# The tracker of the current partition
+tracker = cast(SignupTracker, partitions.PartitionLocal(lambda _: SignupTracker()))
@@ -0,0 +1,53 @@
+"""Timing of the bot startup phases.
+
+The profile is a module level singleton so that the phases can be recorded
+before the bot instance (or even the discord library) has been imported.
+"""
+
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+
+class StartupProfile:
+    """Records how long each phase of the startup takes."""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.finished = False
+        self.phases: list[tuple[str, float]] = []
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Time the wrapped block as a named startup phase."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            if not self.finished:
+                self.phases.append((name, time.perf_counter() - start))
+
+    @property
+    def total(self) -> float:
+        """Wall clock time since the profile was created, in seconds."""
+        return time.perf_counter() - self._start
+
+    def finish(self) -> str:
+        """Stop recording phases and return the breakdown."""
+        report = self.report()
+        self.finished = True
+        return report
+
+    def report(self) -> str:
+        total = self.total
+        width = max((len(name) for name, _ in self.phases), default=0)
+        lines = ["Startup profile:"]
+        for name, duration in self.phases:
+            share = duration / total * 100 if total else 0.0
+            lines.append(f"  {name:<{width}} {duration * 1000:9.1f} ms ({share:4.1f}%)")
+        lines.append(f"  {'total':<{width}} {total * 1000:9.1f} ms")
+        return "\n".join(lines)
+
+
+profile = StartupProfile()
@@ -0,0 +1,114 @@
+"""Structured logging of the bot.
+
+The log records are put on a queue by a non-blocking handler and written by a
+listener thread, so logging never makes the event loop wait for the console or
+the log file. The output is either human readable text or JSON lines that
+carry the event, message and user IDs passed as `extra` fields, e.g.
+`log.info("Signup", extra={"event_id": event.id, "user_id": user.id})`.
+
+The level can be set for each subsystem by its logger name (`LOG_LEVELS` in
+the config). The verbose output is logged at the DEBUG level with `%`-style
+arguments, so it is not even formatted unless the level is enabled.
+"""
+
+import atexit
+import copy
+import json
+import logging
+import queue
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+from operationbot import config as cfg
+from operationbot.config_watch import config_watcher
+
+# The structured fields of the records included in the JSON output
+FIELDS = ("event_id", "message_id", "user_id", "partition")
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats the records as JSON objects, one per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        created = datetime.fromtimestamp(record.created, timezone.utc)
+        data = {
+            "time": created.isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for field in FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                data[field] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data["exception"] = record.exc_text
+        if record.stack_info:
+            data["stack"] = self.formatStack(record.stack_info)
+        return json.dumps(data, default=str)
+
+
+class _QueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The message and the traceback have to be rendered before the record
+        # is queued, the formatters get them as separate attributes
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+_listener: Optional[QueueListener] = None
+
+
+def apply_levels():
+    """Set the level of the bot and of each subsystem from the config."""
+    logging.getLogger().setLevel(cfg.LOG_LEVEL)
+    for name, level in cfg.LOG_LEVELS.items():
+        logging.getLogger(name).setLevel(level)
+
+
+def shutdown():
+    """Write out the queued records and stop the listener thread."""
+    global _listener  # pylint: disable=global-statement
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def configure():
+    """Route the log records through the queue to the configured output."""
+    global _listener  # pylint: disable=global-statement
+    shutdown()
+    if cfg.LOG_FILE:
+        handler: logging.Handler = logging.FileHandler(cfg.LOG_FILE)
+    else:
+        handler = logging.StreamHandler(sys.stdout)
+    if cfg.LOG_FORMAT == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+    root.addHandler(_QueueHandler(log_queue))
+    apply_levels()
+    _listener = QueueListener(log_queue, handler)
+    _listener.start()
+
+
+def _levels_changed(changed):
+    apply_levels()
+
+
+config_watcher.subscribe({"LOG_LEVEL", "LOG_LEVELS"}, _levels_changed)
+atexit.register(shutdown)
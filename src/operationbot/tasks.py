@@ -1,11 +1,16 @@
 import asyncio
 import logging
+import sqlite3
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
     from operationbot.bot import OperationBot
 import operationbot.config as cfg
 import operationbot.messageFunctions as msgFnc
+from operationbot import metrics
+from operationbot.loop_monitor import LoopMonitor
+from operationbot.shards import coordinator
+from operationbot.signup_tracker import tracker
 
 # OperationBot: TypeAlias = operationbot.bot.OperationBot
 
@@ -18,7 +23,8 @@ async def archive_past_events(bot: "OperationBot"):
     logging.info("Started archive_past_events task")
 
     while True:
-        await msgFnc.archive_past_events(bot, delta=cfg.ARCHIVE_AFTER_TIME)
+        if coordinator.leader:
+            await msgFnc.archive_past_events(bot, delta=cfg.ARCHIVE_AFTER_TIME)
         await asyncio.sleep(cfg.ARCHIVE_CHECK_DELAY)
 
 
@@ -32,14 +38,88 @@ async def cancel_empty_events(bot: "OperationBot"):
     logging.info("Started cancel_empty_events task")
 
     while True:
-        try:
-            await msgFnc.cancel_empty_events(bot, threshold=cfg.CANCEL_THRESHOLD)
-        except Exception as e:
-            logging.error(e)
+        if coordinator.leader:
+            try:
+                await msgFnc.cancel_empty_events(bot, threshold=cfg.CANCEL_THRESHOLD)
+            except Exception as e:
+                logging.error(e)
         await asyncio.sleep(cfg.CANCEL_CHECK_DELAY)
 
 
-ALL_TASKS = {
+async def save_signup_tracker(bot: "OperationBot"):
+    # Runs on every shard: the tracker only contains the signups handled by
+    # this shard
+    logging.info("Started save_signup_tracker task")
+
+    while True:
+        await asyncio.sleep(cfg.SIGNUP_TRACKER_SAVE_DELAY)
+        if tracker.dirty:
+            try:
+                tracker.save()
+            except OSError as e:
+                logging.error(f"Failed to save the signup tracker: {e}")
+
+
+async def metrics_server(bot: "OperationBot"):
+    if not cfg.METRICS_PORT:
+        logging.info("Metrics server disabled, skipping metrics_server task")
+        return
+
+    while not coordinator.leader:
+        await asyncio.sleep(cfg.SHARD_LEADER_CHECK_DELAY)
+
+    server = await metrics.start_server(cfg.METRICS_HOST, cfg.METRICS_PORT)
+    logging.info(
+        f"Serving metrics at http://{cfg.METRICS_HOST}:{cfg.METRICS_PORT}/metrics"
+    )
+    async with server:
+        await server.serve_forever()
+
+
+async def monitor_loop(bot: "OperationBot"):
+    logging.info("Started monitor_loop task")
+    await LoopMonitor(describe=bot.jobs.describe).run()
+
+
+async def write_log(bot: "OperationBot"):
+    logging.info("Started write_log task")
+    await bot.log_sink.run()
+
+
+async def elect_leader(bot: "OperationBot"):
+    if not coordinator.active:
+        logging.info("Running a single shard, skipping elect_leader task")
+        return
+
+    logging.info("Started elect_leader task")
+
+    while True:
+        try:
+            coordinator.elect()
+        except sqlite3.Error as e:
+            logging.error(f"Failed to renew the leader lease: {e}")
+        await asyncio.sleep(cfg.SHARD_LEADER_CHECK_DELAY)
+
+
+# Tasks that run separately in each partition. The archival and the
+# cancellation only run on the leader shard.
+PARTITION_TASKS = {
     "Archive past events": archive_past_events,
     "Cancel empty events": cancel_empty_events,
+    "Save signup tracker": save_signup_tracker,
+}
+# Tasks that serve the whole bot
+GLOBAL_TASKS = {
+    "Elect leader": elect_leader,
+    "Write log": write_log,
+    "Metrics server": metrics_server,
+    "Monitor loop": monitor_loop,
+}
+# The settings the tasks only read when they start. A task is restarted when a
+# config reload changes one of its settings.
+TASK_SETTINGS = {
+    "Archive past events": {"ARCHIVE_AUTOMATICALLY"},
+    "Cancel empty events": {"CANCEL_AUTOMATICALLY"},
+    "Metrics server": {"METRICS_HOST", "METRICS_PORT"},
+    "Monitor loop": {"LOOP_BLOCK_THRESHOLD", "LOOP_LAG_INTERVAL"},
 }
@@ -0,0 +1,86 @@
+"""Warm-start cache of the Discord state of the event messages.
+
+The cache stores the last known state of the event channel: which message
+belongs to which event, the embed hash and the reactions of each message and
+the IDs of the guild emojis used for resolving role emojis. If the cache
+matches the imported database on startup, the event messages are assumed to
+be up to date and the bot can start accepting signups immediately while the
+messages are verified in the background.
+"""
+
+import json
+import logging
+import os
+from typing import Any, Dict, Optional, Tuple
+
+from discord import Emoji
+
+from operationbot import partitions
+from operationbot.event import Event
+
+CACHE_VERSION = 1
+
+
+def build_cache(events: Dict[int, Event], emojis: Tuple[Emoji, ...]) -> dict:
+    """Build the cache contents from the events and the guild emojis."""
+    messages: Dict[str, Any] = {}
+    for event in events.values():
+        messages[str(event.messageID)] = {
+            "event": event.id,
+            "embed_hash": event.embed_hash,
+            "reactions": [str(reaction) for reaction in event.getReactions()],
+        }
+    return {
+        "version": CACHE_VERSION,
+        "emojis": {emoji.name: emoji.id for emoji in emojis},
+        "messages": messages,
+    }
+
+
+def save_cache(
+    events: Dict[int, Event],
+    emojis: Tuple[Emoji, ...],
+    filename: Optional[str] = None,
+):
+    if filename is None:
+        filename = partitions.path("cache")
+    data = build_cache(events, emojis)
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    with open(filename, "w") as jsonFile:
+        json.dump(data, jsonFile)
+
+
+def load_cache(filename: Optional[str] = None) -> Optional[dict]:
+    """Load the cache from disk.
+
+    Returns None if the cache does not exist or cannot be used.
+    """
+    if filename is None:
+        filename = partitions.path("cache")
+    try:
+        with open(filename) as jsonFile:
+            data = json.load(jsonFile)
+    except (FileNotFoundError, json.decoder.JSONDecodeError):
+        return None
+    if data.get("version") != CACHE_VERSION:
+        return None
+    return data
+
+
+def is_valid(
+    cache: Optional[dict], events: Dict[int, Event], emojis: Tuple[Emoji, ...]
+) -> bool:
+    """Check that the cache matches the imported events and guild emojis.
+
+    Events with an invalidated embed hash (for example after a failed edit)
+    or without a message never match the cache.
+    """
+    if cache is None:
+        return False
+    if any(not event.embed_hash or not event.messageID for event in events.values()):
+        logging.info("Warm cache: events without a message or an embed")
+        return False
+    if cache != build_cache(events, emojis):
+        logging.info("Warm cache: cache does not match the database")
+        return False
+    return True
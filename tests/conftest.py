@@ -0,0 +1,39 @@
+import pytest
+
+from operationbot import config as cfg
+from operationbot.eventDatabase import EventDatabase
+from operationbot.history import history
+from operationbot.signup_tracker import tracker
+
+
+@pytest.fixture
+def setup_db(monkeypatch, tmp_path):
+    """Use a temporary database and a small test platoon layout."""
+    monkeypatch.setattr(
+        cfg,
+        "JSON_FILEPATH",
+        {
+            "events": str(tmp_path / "events.json"),
+            "archive": str(tmp_path / "archive.json"),
+            "cache": str(tmp_path / "cache.json"),
+            "history": str(tmp_path / "history.json"),
+            "search": str(tmp_path / "search.json"),
+            "signups": str(tmp_path / "signups.json"),
+        },
+    )
+    monkeypatch.setattr(cfg, "DEFAULT_GROUPS", {"test": ["Company", "Alpha"]})
+    monkeypatch.setattr(
+        cfg,
+        "DEFAULT_ROLES",
+        {"test": {"ZEUS": "Company", "ASL": "Alpha", "A1": "Alpha"}},
+    )
+    # Imported events are created with the default platoon size before their
+    # data gets loaded
+    monkeypatch.setattr("operationbot.event.PLATOON_SIZE", "test")
+    EventDatabase.events = {}
+    EventDatabase.eventsArchive = {}
+    EventDatabase.nextID = 0
+    EventDatabase.rebuildIndexes()
+    # Reload the history from the temporary database on first use
+    monkeypatch.setattr(history, "_loaded", False)
+    monkeypatch.setattr(tracker, "_loaded", False)
@@ -0,0 +1,362 @@
+"""An in-process stand-in for the parts of Discord the bot uses.
+
+The fake implements the channel, message and reaction surface used by the
+bot (`TextChannel.fetch_message`/`send`/`history`, `Message.edit`/
+`add_reaction`/`clear_reactions` etc.) on top of a shared `FakeApi` that
+simulates request latency and rate limit buckets and counts the API calls.
+It is used by the tests and by the offline benchmarks in `benchmarks/`.
+"""
+
+import asyncio
+import itertools
+import time
+from collections import Counter, deque
+from typing import Any, Callable, Iterable, Optional, Union
+
+from discord import Embed, Emoji, NotFound, PartialEmoji, RawReactionActionEvent
+from discord.ext.commands import Context
+
+from operationbot.bot import OperationBot
+
+# Snowflake-like IDs that keep increasing in creation order, like the real
+# message IDs do
+_ids = itertools.count(10**17)
+
+
+def next_id() -> int:
+    return next(_ids)
+
+
+class RateLimitBucket:
+    """Allows at most `limit` requests per `per` seconds.
+
+    Requests over the limit wait until the bucket has room again, similarly
+    to how discord.py handles rate limits transparently.
+    """
+
+    def __init__(self, limit: int, per: float):
+        self.limit = limit
+        self.per = per
+        self.waited = 0.0
+        self._calls: deque[float] = deque()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            now = time.perf_counter()
+            while self._calls and now - self._calls[0] >= self.per:
+                self._calls.popleft()
+            if len(self._calls) >= self.limit:
+                delay = self.per - (now - self._calls[0])
+                self.waited += delay
+                await asyncio.sleep(delay)
+                self._calls.popleft()
+            self._calls.append(time.perf_counter())
+
+
+class FakeApi:
+    """Shared state of the fake Discord API.
+
+    Args:
+        latency: Seconds each API call takes.
+        rate_limits: Rate limit buckets as `{route: (limit, per_seconds)}`.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        rate_limits: Optional[dict[str, tuple[int, float]]] = None,
+    ):
+        self.latency = latency
+        self.calls: Counter[str] = Counter()
+        self.buckets = {
+            route: RateLimitBucket(limit, per)
+            for route, (limit, per) in (rate_limits or {}).items()
+        }
+        # Called with the route name after every completed API call
+        self.on_call: Optional[Callable[[str], None]] = None
+
+    async def request(self, route: str):
+        self.calls[route] += 1
+        bucket = self.buckets.get(route)
+        if bucket is not None:
+            await bucket.acquire()
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.on_call is not None:
+            self.on_call(route)
+
+    @property
+    def total_calls(self) -> int:
+        return sum(self.calls.values())
+
+    def reset(self):
+        self.calls.clear()
+
+
+class _Response:
+    """The minimal response object required by discord.HTTPException."""
+
+    def __init__(self, status: int, reason: str):
+        self.status = status
+        self.reason = reason
+
+
+class FakeUser:
+    def __init__(self, name: str, user_id: Optional[int] = None, bot=False):
+        self.id = user_id if user_id is not None else next_id()
+        self.name = name
+        self.display_name = name
+        self.discriminator = "0001"
+        self.bot = bot
+        self.mention = f"<@{self.id}>"
+        self.sent: list[str] = []
+
+    def __eq__(self, other: Any) -> bool:
+        return getattr(other, "id", None) == self.id
+
+    def __hash__(self) -> int:
+        return hash(self.id)
+
+    def __str__(self) -> str:
+        return f"{self.name}#{self.discriminator}"
+
+    async def send(self, content: str):
+        self.sent.append(content)
+
+
+class FakeGuild:
+    """A guild with custom emojis.
+
+    The emojis can be given either as names, or as a mapping of names to IDs
+    for reusing the emoji IDs of a real guild.
+    """
+
+    def __init__(
+        self,
+        emojis: Union[Iterable[str], dict[str, int]] = (),
+        guild_id: Optional[int] = None,
+        shard_id: int = 0,
+    ):
+        self.id = guild_id if guild_id is not None else next_id()
+        self.name = "Fake guild"
+        self.shard_id = shard_id
+        if isinstance(emojis, dict):
+            emoji_ids = emojis
+        else:
+            emoji_ids = {name: next_id() for name in emojis}
+        self.emojis: tuple[Emoji, ...] = tuple(
+            make_emoji(self, name, emoji_id) for name, emoji_id in emoji_ids.items()
+        )
+        self.members: list[FakeUser] = []
+
+    def get_member(self, user_id: int) -> Optional[FakeUser]:
+        return next((m for m in self.members if m.id == user_id), None)
+
+    def get_member_named(self, name: str) -> Optional[FakeUser]:
+        return next((m for m in self.members if m.name == name), None)
+
+
+def make_emoji(guild: FakeGuild, name: str, emoji_id: int) -> Emoji:
+    data = {
+        "id": emoji_id,
+        "name": name,
+        "require_colons": True,
+        "managed": False,
+        "animated": False,
+        "available": True,
+        "roles": [],
+    }
+    return Emoji(guild=guild, state=None, data=data)  # type: ignore
+
+
+class FakeReaction:
+    def __init__(self, emoji: Union[Emoji, PartialEmoji, str]):
+        self.emoji = emoji
+        self.count = 1
+        self.me = True
+
+
+class FakeMessage:
+    def __init__(
+        self,
+        api: FakeApi,
+        channel: "FakeChannel",
+        author: FakeUser,
+        content: Optional[str] = None,
+        embed: Optional[Embed] = None,
+        message_id: Optional[int] = None,
+    ):
+        self._api = api
+        self._state = None
+        self.id = message_id if message_id is not None else next_id()
+        self.channel = channel
+        self.guild = channel.guild
+        self.author = author
+        self.content = content or ""
+        self.embeds: list[Embed] = [embed] if embed is not None else []
+        self.reactions: list[FakeReaction] = []
+        self.mentions: list[FakeUser] = []
+        self.deleted = False
+
+    @property
+    def jump_url(self) -> str:
+        return (
+            f"https://discord.com/channels/{self.guild.id}/{self.channel.id}/{self.id}"
+        )
+
+    @property
+    def clean_content(self) -> str:
+        return self.content
+
+    async def edit(self, *, content: Optional[str] = None, embed=None):
+        await self._api.request("edit_message")
+        if content is not None:
+            self.content = content
+        if embed is not None:
+            self.embeds = [embed]
+
+    async def delete(self):
+        await self._api.request("delete_message")
+        self.deleted = True
+        self.channel.messages.pop(self.id, None)
+
+    async def add_reaction(self, emoji: Union[Emoji, str]):
+        await self._api.request("add_reaction")
+        if not any(r.emoji == emoji for r in self.reactions):
+            self.reactions.append(FakeReaction(emoji))
+
+    async def remove_reaction(self, emoji, member):
+        await self._api.request("remove_reaction")
+        if member == self.author:
+            self._remove(emoji)
+
+    async def clear_reaction(self, emoji):
+        await self._api.request("clear_reaction")
+        if isinstance(emoji, FakeReaction):
+            emoji = emoji.emoji
+        self._remove(emoji)
+
+    async def clear_reactions(self):
+        await self._api.request("clear_reactions")
+        self.reactions = []
+
+    def _remove(self, emoji):
+        self.reactions = [r for r in self.reactions if r.emoji != emoji]
+
+
+class FakeChannel:
+    def __init__(self, api: FakeApi, guild: FakeGuild, name: str, me: FakeUser):
+        self._api = api
+        self.id = next_id()
+        self.name = name
+        self.guild = guild
+        self.me = me
+        self.mention = f"<#{self.id}>"
+        self.messages: dict[int, FakeMessage] = {}
+
+    def __str__(self) -> str:
+        return self.name
+
+    async def fetch_message(self, message_id: int) -> FakeMessage:
+        await self._api.request("fetch_message")
+        try:
+            return self.messages[message_id]
+        except KeyError as e:
+            raise NotFound(_Response(404, "Not Found"), "Unknown Message") from e
+
+    async def send(self, content: Optional[str] = None, *, embed=None, file=None):
+        await self._api.request("send_message")
+        message = FakeMessage(self._api, self, self.me, content=content, embed=embed)
+        self.messages[message.id] = message
+        return message
+
+    async def history(self, limit: Optional[int] = 100):
+        await self._api.request("history")
+        messages = sorted(self.messages.values(), key=lambda m: m.id, reverse=True)
+        for message in messages[:limit]:
+            yield message
+
+    def receive(self, author: FakeUser, content: str) -> FakeMessage:
+        """Create a message from another user without an API call."""
+        message = FakeMessage(self._api, self, author, content=content)
+        self.messages[message.id] = message
+        return message
+
+    def restore(
+        self, message_id: int, embed: Optional[Embed], reactions: Iterable
+    ) -> FakeMessage:
+        """Recreate an existing message of the bot without API calls."""
+        message = FakeMessage(
+            self._api, self, self.me, embed=embed, message_id=message_id
+        )
+        message.reactions = [FakeReaction(emoji) for emoji in reactions]
+        self.messages[message.id] = message
+        return message
+
+
+def make_reaction_payload(
+    message: FakeMessage,
+    user: FakeUser,
+    emoji: Union[Emoji, str],
+    event_type="REACTION_ADD",
+) -> RawReactionActionEvent:
+    """Create the raw gateway payload of a user reacting to a message."""
+    if isinstance(emoji, Emoji):
+        partial = PartialEmoji(name=emoji.name, id=emoji.id)
+    else:
+        partial = PartialEmoji(name=emoji)
+    data = {
+        "message_id": message.id,
+        "channel_id": message.channel.id,
+        "user_id": user.id,
+        "guild_id": message.guild.id,
+    }
+    payload = RawReactionActionEvent(data, partial, event_type)
+    payload.member = user  # type: ignore
+    return payload
+
+
+class FakeContext(Context):
+    """A command context that sends its replies to the fake channel."""
+
+    async def send(self, content=None, **kwargs):
+        return await self.channel.send(content, **kwargs)
+
+
+class FakeBot(OperationBot):
+    """An OperationBot wired to the fake Discord API instead of the gateway.
+
+    Must be created inside a running event loop.
+    """
+
+    def __init__(self, api: FakeApi, guild: FakeGuild, **kwargs):
+        super().__init__(command_prefix="!", loop=asyncio.get_running_loop(), **kwargs)
+        self.api = api
+        self.guild = guild
+        me = FakeUser("Operation Bot", bot=True)
+        self._connection.user = me  # type: ignore
+        self.owner = FakeUser("Owner")
+        self.signoff_notify_user = FakeUser("Notify")
+        self.commandchannel = FakeChannel(api, guild, "command", me)  # type: ignore
+        self.logchannel = FakeChannel(api, guild, "log", me)  # type: ignore
+        self.eventchannel = FakeChannel(api, guild, "events", me)  # type: ignore
+        self.eventarchivechannel = FakeChannel(  # type: ignore
+            api, guild, "archive", me
+        )
+        self.processing = False
+
+    async def fetch_data(self) -> None:
+        # The channels and users are set up in the constructor
+        pass
+
+    async def import_database(self) -> None:
+        from operationbot.eventDatabase import EventDatabase
+
+        EventDatabase.loadDatabase(self.guild.emojis)
+
+    async def change_presence(self, **kwargs):
+        pass
+
+    async def get_context(self, message, *, cls=FakeContext):
+        return await super().get_context(message, cls=cls)
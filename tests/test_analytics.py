@@ -0,0 +1,57 @@
+"""Tests of the archive analytics."""
+
+from datetime import datetime, timedelta
+
+from operationbot.analytics import Analytics, SignupTable
+from operationbot.eventDatabase import EventDatabase as db
+from tests.fake_discord import FakeGuild, FakeUser
+
+
+def _archive(days: int, signups: dict, cancelled=False):
+    # 2030-01-07 is a Monday
+    event = db.createEvent(
+        datetime(2030, 1, 7, 18) + timedelta(days=days), platoon_size="test"
+    )
+    for role, user in signups.items():
+        event.signup(event.findRoleWithName(role), user)
+    event.cancelled = cancelled
+    db.archiveEvent(event)
+    return event
+
+
+def test_reports(setup_db):
+    guild = FakeGuild(["ZEUS", "ASL", "A1"])
+    db._emojis = guild.emojis
+    alice, bob = FakeUser("Alice"), FakeUser("Bob")
+    _archive(0, {"ZEUS": alice, "ASL": bob})
+    _archive(1, {"ZEUS": alice})
+    _archive(2, {}, cancelled=True)
+    _archive(7, {"A1": alice, "ASL": bob})
+
+    table = SignupTable(db.eventsArchive.values())
+    assert len(table) == 5
+    assert table.attendance() == [(alice.id, 3), (bob.id, 2)]
+    # The cancelled event does not break the streak, the skipped one does
+    assert table.streaks() == [(alice.id, 3), (bob.id, 1)]
+    assert table.role_frequency() == [("ASL", 2), ("ZEUS", 2), ("A1", 1)]
+    assert table.role_frequency(bob.id) == [("ASL", 2)]
+    assert table.fill_rates() == [
+        ("Mon", 2, 4 / 6),
+        ("Tue", 1, 1 / 3),
+        ("Wed", 1, 0.0),
+    ]
+    assert table.fill_rates("size") == [("test", 4, 5 / 12)]
+
+
+def test_cache_invalidation(setup_db):
+    guild = FakeGuild(["ZEUS", "ASL", "A1"])
+    db._emojis = guild.emojis
+    alice = FakeUser("Alice")
+    analytics = Analytics()
+    _archive(0, {"ZEUS": alice})
+    first = analytics.report("attendance")
+    assert analytics.report("attendance") is first
+    assert analytics.user_name(alice.id) == "Alice"
+
+    _archive(1, {"ASL": alice})
+    assert analytics.report("attendance") == [(alice.id, 2)]
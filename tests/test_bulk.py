@@ -0,0 +1,61 @@
+"""Tests of the bulk operation runner against the offline fake."""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from operationbot.command_helpers import run_bulk, split_message
+from operationbot.event_batch import EventBatch
+from operationbot.eventDatabase import EventDatabase as db
+from operationbot.history import EventHistory, history
+from tests.fake_discord import FakeApi, FakeBot, FakeGuild
+
+
+def test_split_message():
+    text = "\n".join(["x" * 10] * 5)
+    assert split_message(text, limit=25) == ["x" * 10 + "\n" + "x" * 10] * 2 + [
+        "x" * 10
+    ]
+
+
+@pytest.mark.asyncio
+async def test_run_bulk(setup_db, monkeypatch, tmp_path):
+    guild = FakeGuild(["ZEUS", "ASL", "A1"])
+    bot = FakeBot(FakeApi(), guild)
+    db._emojis = guild.emojis
+    batch = EventBatch(bot)
+    start = datetime.now() + timedelta(days=2)
+    for days in range(5):
+        batch.add(start + timedelta(days=days))
+    await batch.commit()
+    ctx = await bot.get_context(bot.commandchannel.receive(bot.owner, "!bulk"))
+    events = list(db.events.values())
+    bot.api.reset()
+    saves = []
+    monkeypatch.setattr(EventHistory, "save", lambda self: saves.append(self))
+
+    def apply(event):
+        if event is events[0]:
+            return None
+        if event is events[1]:
+            event.title = "Half changed"
+            raise ValueError("Broken event")
+        event.terrain = "Altis"
+        return "Changed terrain" if event is events[2] else ""
+
+    result = await run_bulk(ctx, bot, "Terrain", apply, concurrency=2)
+
+    assert len(result.updated) == 3
+    assert result.unchanged == [events[0]]
+    assert [event for event, _ in result.failed] == [events[1]]
+    # The failed event is neither changed nor saved partially changed
+    assert db.events[events[1].id].title != "Half changed"
+    assert "Half changed" not in (tmp_path / "events.json").read_text()
+    assert result.warnings == [f"{events[2]}: Changed terrain"]
+    # The history is saved once for all the changed events
+    assert len(saves) == 1
+    assert len(history.log(events[2].id)) == 2
+    assert bot.api.calls["edit_message"] == 3 + 1
+    replies = [m.content for m in bot.commandchannel.messages.values()]
+    assert replies[-1].startswith("Terrain: 3 updated, 1 unchanged, 1 failed")
+    assert replies[-2] == "Terrain: 3/3 events processed"
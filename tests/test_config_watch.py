@@ -0,0 +1,52 @@
+import pytest
+
+from operationbot import config as cfg
+from operationbot.config_watch import ConfigWatcher, snapshot, validate
+
+
+@pytest.fixture
+def watcher():
+    return ConfigWatcher()
+
+
+def test_validate():
+    old = snapshot()
+    assert validate(old, dict(old)) == []
+
+    new = dict(old, METRICS_PORT="8000")
+    del new["GAME"]
+    assert validate(old, new) == [
+        "GAME is missing",
+        "METRICS_PORT should be int, not str",
+    ]
+
+    new = dict(old, PLATOON_SIZES=old["PLATOON_SIZES"] + ["3PLT"])
+    new["EMBED_COLOR"] = dict(old["EMBED_COLOR"], DEFAULT=-1)
+    assert validate(old, new) == [
+        "Platoon size 3PLT is missing from DEFAULT_GROUPS",
+        "Platoon size 3PLT is missing from DEFAULT_ROLES",
+        "EMBED_COLOR['DEFAULT'] is not a valid color",
+    ]
+
+
+def test_reload(watcher, monkeypatch):
+    notified: list[set[str]] = []
+    watcher.subscribe({"GAME", "EMBED_COLOR"}, notified.append)
+    watcher.subscribe({"EMBED_COLOR"}, lambda changed: pytest.fail())
+    assert watcher.reload() == set()
+
+    game = cfg.GAME
+    monkeypatch.setattr(cfg, "GAME", "with fire")
+    assert watcher.reload() == {"GAME"}
+    assert cfg.GAME == game
+    assert notified == [{"GAME"}]
+
+
+def test_invalid_reload(watcher, monkeypatch):
+    monkeypatch.setattr(cfg, "REMOVED_SETTING", 1, raising=False)
+    monkeypatch.setattr(cfg, "GAME", "with fire")
+    with pytest.raises(ValueError, match="REMOVED_SETTING is missing"):
+        watcher.reload()
+    # The previous settings are kept
+    assert getattr(cfg, "REMOVED_SETTING") == 1
+    assert cfg.GAME == "with fire"
@@ -1,13 +1,17 @@
 from datetime import datetime, timedelta, timezone
 from typing import Any
 
+import pytest
 from discord import Emoji
 
 from operationbot import config as cfg
+from operationbot import messageFunctions as msgFnc
 from operationbot.event import Event
+from operationbot.event_batch import EventBatch
 from operationbot.eventDatabase import EventDatabase as db
 from operationbot.role import Role
 from operationbot.roleGroup import RoleGroup
+from tests.fake_discord import FakeApi, FakeBot, FakeGuild
 
 
 def _timestamp(date: datetime) -> int:
@@ -19,6 +23,7 @@ def _init_db() -> None:
     db.eventsArchive = {}
     db.nextID = 0
     db._emojis = ()
+    db.rebuildIndexes(search=False)
     cfg.DEFAULT_ROLES = {
         "empty": {},
     }
@@ -126,3 +131,30 @@ def test_cancel_empty():
     assert len(db.events) == 4
     events = db.cancel_empty_events(timedelta(hours=2))
     assert len(events) == 0
+
+
+@pytest.mark.asyncio
+async def test_archive_past_batch(setup_db, monkeypatch):
+    guild = FakeGuild(["ZEUS", "ASL", "A1"])
+    bot = FakeBot(FakeApi(), guild)
+    db._emojis = guild.emojis
+    batch = EventBatch(bot)
+    now = datetime.now()
+    for hours in (-5, -4, -3, 3):
+        batch.add(now + timedelta(hours=hours))
+    await batch.commit()
+    saved = []
+    monkeypatch.setattr(db, "writeJson", lambda events, filename: saved.append(1))
+
+    archived = await msgFnc.archive_past_events(bot)
+
+    assert sorted(event.id for event in archived) == [0, 1, 2]
+    assert len(saved) == 2
+    assert len(db.events) == 1
+    assert len(bot.eventchannel.messages) == 1
+    # Posted latest first, like in the event channel
+    messages = sorted(bot.eventarchivechannel.messages.values(), key=lambda m: m.id)
+    assert [m.embeds[0].footer.text.split()[-1] for m in messages] == ["2", "1", "0"]
+    assert [event.messageID for event in archived] == [
+        message.id for message in reversed(messages)
+    ]
@@ -0,0 +1,43 @@
+"""Tests of fitting the event embeds into the Discord embed limits."""
+
+from operationbot import embed_layout
+from operationbot.embed_layout import (
+    CONTINUATION,
+    FIELD_COUNT_LIMIT,
+    FIELD_VALUE_LIMIT,
+    TOTAL_LIMIT,
+    fit,
+    group_fields,
+    problems,
+    split_value,
+)
+
+
+def test_split_value():
+    assert split_value("a\nb\n") == ["a\nb\n"]
+    assert split_value("aa\nbb\ncc", limit=5) == ["aa\nbb", "cc"]
+    assert split_value("x" * 8, limit=5) == ["xxxx" + embed_layout.ELLIPSIS]
+
+
+def test_group_fields():
+    value = "\n".join(f"Rifleman {i}: Player {i}" for i in range(100))
+    fields = group_fields("Additional", value, False)
+
+    assert len(fields) > 1
+    assert fields[0][0] == "Additional"
+    assert all(name == CONTINUATION for name, _, _ in fields[1:])
+    assert all(len(chunk) <= FIELD_VALUE_LIMIT for _, chunk, _ in fields)
+    assert "\n".join(chunk for _, chunk, _ in fields) == value
+    assert not problems("Title", "", fields, "Event ID: 1")
+
+
+def test_fit():
+    fields = [("Group", "x" * 1000, True)] * (FIELD_COUNT_LIMIT + 5)
+    title, description, fitted = fit("Title", "y" * 5000, fields, "Event ID: 1")
+
+    assert problems(title, description, fields, "Event ID: 1")
+    assert not problems(title, description, fitted, "Event ID: 1")
+    assert title == "Title"
+    assert len(description) == embed_layout.DESCRIPTION_LIMIT
+    assert fitted == fields[: len(fitted)]
+    assert embed_layout.size(title, description, fitted, "Event ID: 1") <= TOTAL_LIMIT
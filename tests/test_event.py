@@ -4,6 +4,7 @@ from typing import cast
 from discord import Embed
 
 from operationbot import config as cfg
+from operationbot import embed_layout
 from operationbot.event import Event
 
 
@@ -111,3 +112,17 @@ def test_cancel():
     event.cancelled = True
 
     assert event.title == "Cancelled Operation"
+
+
+def test_mods_overflow():
+    date = datetime(2020, 1, 1, 12, 0, 0)
+    event = Event(date, guildEmojis=(), platoon_size="empty")
+    event.mods = "\n".join(f"@mod_{i}" for i in range(100))
+
+    embed = cast(Embed, event.createEmbed(cache=False))
+    assert event.mods in embed.description
+
+    event.mods = "\n".join(f"@mod_with_a_long_name_{i}" for i in range(300))
+    embed = cast(Embed, event.createEmbed(cache=False))
+    assert "Mods: too many to list" in embed.description
+    assert len(embed) <= embed_layout.TOTAL_LIMIT
@@ -0,0 +1,76 @@
+"""Tests of the batch event creation against the offline fake."""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from operationbot import messageFunctions as msgFnc
+from operationbot.event_batch import EventBatch
+from operationbot.eventDatabase import EventDatabase as db
+from tests.fake_discord import FakeApi, FakeBot, FakeGuild
+
+
+async def _setup_bot() -> FakeBot:
+    guild = FakeGuild(["ZEUS", "ASL", "A1"])
+    bot = FakeBot(FakeApi(), guild)
+    db._emojis = guild.emojis
+    return bot
+
+
+def _channel_event_ids(bot: FakeBot) -> list[int]:
+    messages = sorted(bot.eventchannel.messages.values(), key=lambda m: m.id)
+    return [msgFnc.messageEventId(message) for message in messages]
+
+
+def _date_order() -> list[int]:
+    events = sorted(db.events.values(), key=lambda e: e.date, reverse=True)
+    return [event.id for event in events]
+
+
+@pytest.mark.asyncio
+async def test_batch_sends_each_message_once(setup_db):
+    bot = await _setup_bot()
+    start = datetime.now() + timedelta(days=2)
+    batch = EventBatch(bot)
+    batch.add(start)
+    batch.add(start + timedelta(days=4))
+    await batch.commit()
+
+    bot.api.reset()
+    batch = EventBatch(bot)
+    for days in (1, 3, 5):
+        batch.add(start + timedelta(days=days)).terrain = "Altis"
+    await batch.commit()
+
+    assert bot.api.calls["send_message"] == 3
+    assert bot.api.calls["edit_message"] == 2
+    assert _channel_event_ids(bot) == _date_order()
+    assert all(event.terrain == "Altis" for event in batch.events)
+    assert batch.saved_api_calls > 0
+
+
+@pytest.mark.asyncio
+async def test_batch_rolls_back_on_failure(setup_db):
+    bot = await _setup_bot()
+    start = datetime.now() + timedelta(days=2)
+    batch = EventBatch(bot)
+    batch.add(start + timedelta(days=1))
+    await batch.commit()
+    existing = dict(bot.eventchannel.messages)
+    next_id = db.nextID
+
+    def fail_second_send(route: str):
+        if route == "send_message" and bot.api.calls[route] == 2:
+            raise RuntimeError("Send failed")
+
+    bot.api.on_call = fail_second_send
+    batch = EventBatch(bot)
+    batch.add(start)
+    batch.add(start + timedelta(days=2))
+    with pytest.raises(RuntimeError):
+        await batch.commit()
+
+    assert list(db.events) == [0]
+    assert db.nextID == next_id
+    assert bot.eventchannel.messages == existing
+    assert _channel_event_ids(bot) == [0]
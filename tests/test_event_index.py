@@ -0,0 +1,80 @@
+"""Tests of the event summary index and the listing commands."""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from operationbot import config as cfg
+from operationbot.command_helpers import NEXT_PAGE
+from operationbot.commandListener import CommandListener
+from operationbot.event_batch import EventBatch
+from operationbot.event_index import parse_filters
+from operationbot.eventDatabase import EventDatabase as db
+from tests.fake_discord import FakeApi, FakeBot, FakeGuild, make_reaction_payload
+
+
+async def _setup(count: int):
+    guild = FakeGuild(["ZEUS", "ASL", "A1"])
+    bot = FakeBot(FakeApi(), guild)
+    db._emojis = guild.emojis
+    commands = CommandListener(bot)
+    bot.add_cog(commands)
+    batch = EventBatch(bot)
+    start = datetime(2030, 1, 1, 18)
+    for days in range(count):
+        event = batch.add(start + timedelta(days=days), platoon_size="test")
+        event.terrain = "Altis" if days % 2 else "Tanoa"
+        event.sideop = days % 3 == 0
+    await batch.commit()
+    ctx = await bot.get_context(bot.commandchannel.receive(bot.owner, "!list"))
+    return bot, commands, ctx
+
+
+@pytest.mark.asyncio
+async def test_index_query(setup_db):
+    await _setup(6)
+    filters = parse_filters(["terrain=alt", "to=2030-01-04"])
+    assert [s.id for s in db.index.query(filters)] == [1, 3]
+    assert [s.id for s in db.index.query({"sideop": "yes"})] == [0, 3]
+    with pytest.raises(ValueError):
+        parse_filters(["sideop=maybe"])
+
+    # Changes made through the commands are reflected in the index
+    event = db.events[1]
+    event.terrain = "Stratis"
+    db.index.update(event)
+    assert [s.id for s in db.index.query(filters)] == [3]
+
+    db.archiveEvent(db.events[0])
+    assert 0 not in db.index.summaries
+    assert [s.id for s in db.archiveIndex.query()] == [0]
+
+
+@pytest.mark.asyncio
+async def test_list_pages(setup_db, monkeypatch):
+    monkeypatch.setattr(cfg, "LIST_PAGE_SIZE", 4)
+    monkeypatch.setattr(cfg, "PAGE_TIMEOUT", 0.2)
+    bot, commands, ctx = await _setup(10)
+
+    task = asyncio.create_task(commands.listEvents(ctx))
+    while not any(m.reactions for m in bot.commandchannel.messages.values()):
+        await asyncio.sleep(0.01)
+    message = list(bot.commandchannel.messages.values())[-1]
+    assert "Page 1/3" in message.content
+    assert "0: " in message.content and "4: " not in message.content
+
+    bot.dispatch(
+        "raw_reaction_add", make_reaction_payload(message, bot.owner, NEXT_PAGE)
+    )
+    await asyncio.sleep(0.05)
+    assert "Page 2/3" in message.content
+    assert "4: " in message.content
+
+    await task
+    assert message.reactions == []
+
+    await commands.listEvents(ctx, "terrain=nothing")
+    assert list(bot.commandchannel.messages.values())[-1].content == (
+        "No events in the database matching the filters"
+    )
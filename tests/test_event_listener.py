@@ -0,0 +1,61 @@
+"""End-to-end tests of the reaction handling against the offline fake."""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from operationbot import messageFunctions as msgFnc
+from operationbot.eventDatabase import EventDatabase as db
+from operationbot.eventListener import EventListener
+from tests.fake_discord import (
+    FakeApi,
+    FakeBot,
+    FakeGuild,
+    FakeUser,
+    make_reaction_payload,
+)
+
+
+async def _setup_bot() -> tuple[FakeBot, EventListener]:
+    guild = FakeGuild(["ZEUS", "ASL", "A1"])
+    bot = FakeBot(FakeApi(), guild)
+    db._emojis = guild.emojis
+    listener = EventListener(bot)
+    return bot, listener
+
+
+@pytest.mark.asyncio
+async def test_signup_and_signoff(setup_db):
+    bot, listener = await _setup_bot()
+    event = db.createEvent(datetime.now() + timedelta(days=3), platoon_size="test")
+    await msgFnc.createEventMessage(event, bot.eventchannel)
+    await msgFnc.updateReactions(event, bot=bot)
+    message = bot.eventchannel.messages[event.messageID]
+    user = FakeUser("Tester")
+    asl = event.findRoleWithName("ASL")
+
+    await listener.on_raw_reaction_add(make_reaction_payload(message, user, asl.emoji))
+    assert asl.userID == user.id
+    assert "Tester" in message.embeds[0].fields[1].value
+    await bot.log_sink.flush()
+    log = list(bot.logchannel.messages.values())
+    assert log[-1].content.startswith("SIGNUP")
+
+    await listener.on_raw_reaction_add(make_reaction_payload(message, user, asl.emoji))
+    assert asl.userID is None
+    assert "Tester" not in message.embeds[0].fields[1].value
+    await bot.log_sink.flush()
+    log = list(bot.logchannel.messages.values())
+    assert log[-1].content.startswith("SIGNOFF")
+
+
+@pytest.mark.asyncio
+async def test_reaction_to_unknown_message(setup_db):
+    bot, listener = await _setup_bot()
+    message = await bot.eventchannel.send("Not an event")
+    user = FakeUser("Tester")
+
+    await listener.on_raw_reaction_add(make_reaction_payload(message, user, "A"))
+    await bot.log_sink.flush()
+    log = list(bot.logchannel.messages.values())
+    assert log[-1].content.startswith("NOTE: reaction to a non-existent event")
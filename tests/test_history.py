@@ -0,0 +1,74 @@
+"""Tests of the event history."""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from operationbot.commandListener import CommandListener
+from operationbot.event_batch import EventBatch
+from operationbot.eventDatabase import EventDatabase as db
+from operationbot.history import EventHistory, apply, diff, history, structure
+from tests.fake_discord import FakeApi, FakeBot, FakeGuild, FakeUser
+
+
+def test_diff_roundtrip():
+    old = {"a": 1, "b": {"x": 1, "y": 2}, "c": [1]}
+    new = {"b": {"y": 3, "x": 1, "z": 0}, "c": [1, 2], "d": "new"}
+    assert apply(old, diff(old, new)) == new
+    assert list(apply(old, diff(old, new))["b"]) == ["y", "x", "z"]
+    assert apply(new, diff(new, old)) == old
+    assert diff(old, old) == {}
+
+
+def test_undo_keeps_signups(setup_db):
+    guild = FakeGuild(["ZEUS", "ASL", "A1"])
+    db._emojis = guild.emojis
+    event = db.createEvent(datetime.now() + timedelta(days=3), platoon_size="test")
+    history = EventHistory(length=2)
+    history.track([event])
+
+    event.title = "Operation One"
+    assert history.commit(event, "settitle")
+    user = FakeUser("Tester")
+    event.signup(event.findRoleWithName("ASL"), user)
+    assert not history.commit(event, "signup")
+    event.removeRoleGroup("Company")
+    history.commit(event, "removegroup")
+    event.title = "Operation Two"
+    history.commit(event, "settitle")
+
+    # The oldest version has dropped out of the ring
+    assert [version for version, _, _ in history.log(event.id)] == [4, 3, 2]
+    assert history.get(event.id, 2)["title"] == "Operation One"
+
+    restored, lost = history.restore(db.events[event.id], 2)
+    assert lost == []
+    assert restored.title == "Operation One"
+    assert restored.hasRoleGroup("Company")
+    assert restored.findRoleWithName("ASL").userID == user.id
+    assert db.events[event.id] is restored
+
+    history.commit(restored, "undo")
+    history.save()
+    reloaded = EventHistory(length=2)
+    reloaded.load()
+    assert reloaded.heads == history.heads
+    assert structure(restored) == reloaded.get(event.id, 5)
+
+
+@pytest.mark.asyncio
+async def test_command_reason(setup_db):
+    guild = FakeGuild(["ZEUS", "ASL", "A1"])
+    bot = FakeBot(FakeApi(), guild)
+    db._emojis = guild.emojis
+    bot.add_cog(CommandListener(bot))
+    batch = EventBatch(bot)
+    event = batch.add(datetime.now() + timedelta(days=3), platoon_size="test")
+    await batch.commit()
+
+    message = bot.commandchannel.receive(bot.owner, "!settitle 0 Operation One")
+    await bot.invoke(await bot.get_context(message))
+
+    assert event.title == "Operation One"
+    assert history.log(event.id)[0][2] == "!settitle 0 Operation One"
+    assert not bot.jobs.jobs
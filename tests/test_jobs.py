@@ -0,0 +1,136 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from operationbot import messageFunctions as msgFnc
+from operationbot.commandListener import CommandListener
+from operationbot.event import Event
+from operationbot.event_batch import EventBatch
+from operationbot.eventDatabase import EventDatabase as db
+from operationbot.history import history
+from operationbot.jobs import JobRegistry
+from tests.fake_discord import FakeApi, FakeBot, FakeGuild
+
+
+def _event(event_id: int) -> Event:
+    return Event(
+        datetime(2020, 1, 1, 18, 30),
+        guildEmojis=(),
+        eventID=event_id,
+        platoon_size="empty",
+    )
+
+
+@pytest.mark.asyncio
+async def test_event_locks():
+    jobs = JobRegistry()
+    first, second = _event(0), _event(1)
+    order = []
+
+    async def command(name: str, events: list[Event]):
+        async with jobs.lock(events):
+            # The task holding the locks can lock its events again
+            async with jobs.lock(events[:1]):
+                order.append(f"{name} start")
+                await asyncio.sleep(0.01)
+                order.append(f"{name} end")
+
+    await asyncio.gather(
+        command("bulk", [second, first]),
+        command("single", [first]),
+        command("other", [_event(2)]),
+    )
+    assert order.index("single start") > order.index("bulk end")
+    assert order.index("other start") < order.index("bulk end")
+
+
+@pytest.mark.asyncio
+async def test_jobs():
+    jobs = JobRegistry()
+    started = asyncio.Event()
+
+    async def long_operation():
+        with jobs.track("multicreate", "User"):
+            with jobs.prompt(1, 2):
+                started.set()
+                await asyncio.sleep(60)
+
+    task = asyncio.create_task(long_operation())
+    await started.wait()
+    assert jobs.prompting(1, 2)
+    assert not jobs.prompting(1, 3)
+    (job,) = jobs.jobs.values()
+    assert job.status == "waiting for a reply"
+    assert str(job).startswith("#1 multicreate by User")
+
+    assert jobs.cancel(job.id) is job
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert not jobs.jobs
+    assert not jobs.prompting(1, 2)
+    assert jobs.cancel(job.id) is None
+
+
+@pytest.mark.asyncio
+async def test_failing_command_hook(setup_db, monkeypatch):
+    guild = FakeGuild(["ZEUS", "ASL", "A1"])
+    bot = FakeBot(FakeApi(), guild)
+    db._emojis = guild.emojis
+    bot.add_cog(CommandListener(bot))
+    batch = EventBatch(bot)
+    event = batch.add(datetime.now() + timedelta(days=3), platoon_size="test")
+    await batch.commit()
+
+    def fail(events):
+        raise RuntimeError("History unavailable")
+
+    monkeypatch.setattr(history, "track", fail)
+    message = bot.commandchannel.receive(bot.owner, "!settitle 0 Operation One")
+    with pytest.raises(RuntimeError):
+        await bot.invoke(await bot.get_context(message))
+
+    # The event is not left locked by the failed command
+    assert not bot.jobs.jobs
+    await asyncio.wait_for(bot.jobs.acquire([event]), timeout=1)
+
+
+@pytest.mark.asyncio
+async def test_sorting_locks_all_events(setup_db):
+    guild = FakeGuild(["ZEUS", "ASL", "A1"])
+    bot = FakeBot(FakeApi(), guild)
+    db._emojis = guild.emojis
+    bot.add_cog(CommandListener(bot))
+    batch = EventBatch(bot)
+    start = datetime.now() + timedelta(days=3)
+    first = batch.add(start, platoon_size="test")
+    other = batch.add(start + timedelta(days=1), platoon_size="test")
+    await batch.commit()
+
+    async with bot.jobs.lock([other]):
+        message = bot.commandchannel.receive(bot.owner, "!settime 0 20:00")
+        command = asyncio.create_task(bot.invoke(await bot.get_context(message)))
+        await asyncio.sleep(0.05)
+        # Sorting waits for the other event to be unlocked
+        assert not command.done()
+    await asyncio.wait_for(command, timeout=1)
+    assert first.date.hour == 20
+
+
+@pytest.mark.asyncio
+async def test_archival_waits_for_locks(setup_db):
+    guild = FakeGuild(["ZEUS", "ASL", "A1"])
+    bot = FakeBot(FakeApi(), guild)
+    db._emojis = guild.emojis
+    batch = EventBatch(bot)
+    past = batch.add(datetime.now() - timedelta(days=1), platoon_size="test")
+    await batch.commit()
+
+    async with bot.jobs.lock([past]):
+        archival = asyncio.create_task(msgFnc.archive_past_events(bot))
+        await asyncio.sleep(0.05)
+        # The event is not archived while a command is working on it
+        assert not archival.done()
+        assert past.id in db.events
+    assert await asyncio.wait_for(archival, timeout=1) == [past]
+    assert past.id in db.eventsArchive
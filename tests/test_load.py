@@ -0,0 +1,85 @@
+"""Tests of the dump and load commands against the offline fake."""
+
+from datetime import datetime, timedelta
+
+import pytest
+import yaml
+
+from operationbot.commandListener import CommandListener
+from operationbot.errors import UnexpectedRole
+from operationbot.event_batch import EventBatch
+from operationbot.eventDatabase import EventDatabase as db
+from tests.fake_discord import FakeApi, FakeBot, FakeGuild
+
+
+async def _setup(count: int):
+    guild = FakeGuild(["ZEUS", "ASL", "A1"])
+    bot = FakeBot(FakeApi(), guild)
+    db._emojis = guild.emojis
+    commands = CommandListener(bot)
+    bot.add_cog(commands)
+    batch = EventBatch(bot)
+    for days in range(count):
+        batch.add(datetime.now() + timedelta(days=days + 2), platoon_size="test")
+    await batch.commit()
+    ctx = await bot.get_context(bot.commandchannel.receive(bot.owner, "!load"))
+    bot.api.reset()
+    return bot, commands, ctx
+
+
+def _replies(bot: FakeBot) -> list[str]:
+    return [message.content for message in bot.commandchannel.messages.values()]
+
+
+def _dump(event) -> str:
+    return yaml.dump(event.toJson(brief_output=True), sort_keys=False)
+
+
+@pytest.mark.asyncio
+async def test_load_without_changes(setup_db):
+    bot, commands, ctx = await _setup(1)
+    event = db.events[0]
+
+    await commands.load(ctx, event, data=f"```yaml\n{_dump(event)}```")
+
+    assert _replies(bot)[-1] == "No changes"
+    assert bot.api.calls["edit_message"] == 0
+    assert bot.api.calls["fetch_message"] == 0
+
+
+@pytest.mark.asyncio
+async def test_load_changes(setup_db):
+    bot, commands, ctx = await _setup(1)
+    event = db.events[0]
+    data = event.toJson(brief_output=True)
+    data["title"] = "Operation Load"
+    del data["roleGroups"]["Alpha"]["roles"]["A1"]
+
+    await commands.load(ctx, event, data=yaml.dump(data, sort_keys=False))
+
+    preview = "\n".join(_replies(bot))
+    assert "title: None -> 'Operation Load'" in preview
+    assert "roleGroups/Alpha/roles/A1: removed" in preview
+    assert event.title == "Operation Load"
+    assert "A1" not in [role.name for role in event.getRoleGroup("Alpha").roles]
+    message = bot.eventchannel.messages[event.messageID]
+    assert message.embeds[0].title.startswith("Operation Load")
+    assert bot.api.calls["edit_message"] == 1
+
+
+@pytest.mark.asyncio
+async def test_loadmany_checks_all_events_first(setup_db):
+    bot, commands, ctx = await _setup(2)
+    first = db.events[0].toJson(brief_output=True)
+    first["title"] = "Changed"
+    second = db.events[1].toJson(brief_output=True)
+    second["roleGroups"]["Alpha"]["roles"]["Unknown"] = {"name": "Unknown"}
+
+    with pytest.raises(UnexpectedRole):
+        await commands.loadmany(ctx, data=yaml.dump({0: first, 1: second}))
+    assert db.events[0].title != "Changed"
+
+    del second["roleGroups"]["Alpha"]["roles"]["Unknown"]
+    await commands.loadmany(ctx, data=yaml.dump({0: first, 1: second}))
+    assert db.events[0].title == "Changed"
+    assert _replies(bot)[-1].startswith("Load: 1 updated, 0 unchanged, 0 failed")
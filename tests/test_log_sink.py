@@ -0,0 +1,70 @@
+"""Tests of the batched log writer against the offline fake."""
+
+import asyncio
+
+import pytest
+
+from operationbot.log_sink import MAX_RETRIES, LogSink, pack
+from tests.fake_discord import FakeApi, FakeChannel, FakeGuild, FakeUser
+
+
+def test_pack():
+    assert pack(["x" * 10] * 3, limit=25) == ["x" * 10 + "\n" + "x" * 10, "x" * 10]
+    assert pack(["x" * 30], limit=25) == ["x" * 25, "x" * 5]
+
+
+@pytest.mark.asyncio
+async def test_batching():
+    api = FakeApi()
+    guild = FakeGuild([])
+    me = FakeUser("Operation Bot", bot=True)
+    log = FakeChannel(api, guild, "log", me)
+    other = FakeChannel(api, guild, "other log", me)
+    sink = LogSink(interval=60, limit=100)
+
+    for i in range(20):
+        sink.write(log, f"SIGNUP {i}")
+    sink.write(other, "Late signoff ping", priority=True)
+    assert sink.pending == 21
+    assert not log.messages
+
+    await sink.flush()
+    assert sink.pending == 0
+    sent = [message.content for message in log.messages.values()]
+    assert all(len(content) <= 100 for content in sent)
+    assert "\n".join(sent).split("\n") == [f"SIGNUP {i}" for i in range(20)]
+    assert len(sent) < 20
+    assert [m.content for m in other.messages.values()] == ["Late signoff ping"]
+
+
+@pytest.mark.asyncio
+async def test_failed_send(monkeypatch):
+    api = FakeApi()
+    me = FakeUser("Operation Bot", bot=True)
+    log = FakeChannel(api, FakeGuild([]), "log", me)
+    sink = LogSink(interval=60, limit=100)
+    send = log.send
+
+    async def failing_send(content=None, **kwargs):
+        raise asyncio.TimeoutError
+
+    monkeypatch.setattr(log, "send", failing_send)
+    sink.write(log, "SIGNUP 0")
+    sink.write(log, "SIGNUP 1")
+    await sink.flush()
+    # The failed batch is retried on the next flush
+    assert sink.pending == 1
+    monkeypatch.setattr(log, "send", send)
+    sink.write(log, "SIGNUP 2")
+    await sink.flush()
+    assert sink.pending == 0
+    sent = [message.content for message in log.messages.values()]
+    assert "\n".join(sent).split("\n") == ["SIGNUP 0", "SIGNUP 1", "SIGNUP 2"]
+
+    # The messages are dropped after failing repeatedly
+    monkeypatch.setattr(log, "send", failing_send)
+    sink.write(log, "SIGNUP 3")
+    for _ in range(MAX_RETRIES + 1):
+        await sink.flush()
+    assert sink.pending == 0
+    assert len(log.messages) == len(sent)
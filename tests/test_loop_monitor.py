@@ -0,0 +1,41 @@
+import asyncio
+import logging
+import time
+
+import pytest
+
+from operationbot.loop_monitor import LOOP_LAG_SECONDS, LoopMonitor
+
+
+@pytest.mark.asyncio
+async def test_blocking_task_reported(caplog):
+    monitor = LoopMonitor(
+        interval=0.01, threshold=0.05, describe=lambda task: f"job {task.get_name()}"
+    )
+    count = LOOP_LAG_SECONDS.count
+    task = asyncio.create_task(monitor.run())
+    await asyncio.sleep(0.05)
+
+    async def block():
+        time.sleep(0.2)
+
+    with caplog.at_level(logging.WARNING):
+        await asyncio.create_task(block(), name="Blocker")
+        await asyncio.sleep(0.05)
+    task.cancel()
+
+    assert monitor.blocked == 1
+    assert monitor.max_lag >= 0.15
+    assert LOOP_LAG_SECONDS.count > count
+    assert "blocked for over" in caplog.text
+    assert "by job Blocker" in caplog.text
+    assert "in block" in caplog.text
+
+
+@pytest.mark.asyncio
+async def test_idle_loop_not_reported():
+    monitor = LoopMonitor(interval=0.01, threshold=0.05)
+    task = asyncio.create_task(monitor.run())
+    await asyncio.sleep(0.2)
+    task.cancel()
+    assert monitor.blocked == 0
@@ -0,0 +1,89 @@
+"""Tests of the metrics registry and the metrics HTTP endpoint."""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from operationbot import messageFunctions as msgFnc
+from operationbot import metrics
+from operationbot.eventDatabase import EventDatabase as db
+from operationbot.eventListener import REACTIONS, EventListener
+from tests.fake_discord import (
+    FakeApi,
+    FakeBot,
+    FakeGuild,
+    FakeUser,
+    make_reaction_payload,
+)
+
+
+def test_render_prometheus_text():
+    registry = metrics.Registry()
+    counter = registry.counter("test_total", "A counter", ["kind"])
+    counter.labels("a").inc()
+    counter.labels("a").inc(2)
+    histogram = registry.histogram("test_seconds", "A histogram", buckets=(0.1, 1))
+    histogram.observe(0.05)
+    histogram.observe(0.5)
+    registry.gauge("test_gauge", "A gauge").set_function(lambda: 7)
+
+    text = registry.render()
+
+    assert "# TYPE test_total counter" in text
+    assert 'test_total{kind="a"} 3' in text
+    assert 'test_seconds_bucket{le="0.1"} 1' in text
+    assert 'test_seconds_bucket{le="+Inf"} 2' in text
+    assert "test_seconds_count 2" in text
+    assert "test_gauge 7" in text
+    assert registry.counter("test_total", "A counter", ["kind"]) is counter
+
+
+def test_rate_meter_merge():
+    old, new = metrics.RateMeter(), metrics.RateMeter()
+    old.mark()
+    new.mark()
+    new.merge(old)
+    new.merge(new)
+    assert new.rate() == 2
+
+
+@pytest.mark.asyncio
+async def test_timed_coroutine():
+    histogram = metrics.Registry().histogram("test_seconds", "A histogram")
+
+    @metrics.timed(histogram)
+    async def work():
+        await asyncio.sleep(0)
+        return 1
+
+    assert await work() == 1
+    assert histogram.count == 1
+
+
+@pytest.mark.asyncio
+async def test_reactions_counted_and_served(setup_db):
+    guild = FakeGuild(["ZEUS", "ASL", "A1"])
+    bot = FakeBot(FakeApi(), guild)
+    db._emojis = guild.emojis
+    listener = EventListener(bot)
+    event = db.createEvent(datetime.now() + timedelta(days=3), platoon_size="test")
+    await msgFnc.createEventMessage(event, bot.eventchannel)
+    message = bot.eventchannel.messages[event.messageID]
+    signups = REACTIONS.labels("signup").value
+
+    asl = event.findRoleWithName("ASL")
+    payload = make_reaction_payload(message, FakeUser("Tester"), asl.emoji)
+    await listener.on_raw_reaction_add(payload)
+    assert REACTIONS.labels("signup").value == signups + 1
+
+    server = await metrics.start_server("127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    async with server:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b"GET /metrics HTTP/1.1\r\nHost: localhost\r\n\r\n")
+        response = (await reader.read()).decode()
+        writer.close()
+    assert response.startswith("HTTP/1.1 200 OK")
+    assert 'operationbot_reactions_total{action="signup"}' in response
+    assert "operationbot_create_embed_seconds_count" in response
@@ -0,0 +1,125 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from operationbot import config as cfg
+from operationbot import partitions, tasks
+from operationbot.bot import OperationBot
+from operationbot.eventDatabase import EventDatabase
+from operationbot.secret import ADMIN
+from tests.fake_discord import FakeApi, FakeChannel, FakeGuild, FakeUser
+
+
+def test_path(setup_db, tmp_path):
+    assert partitions.path("events") == str(tmp_path / "events.json")
+    with partitions.use("other"):
+        assert partitions.path("events") == str(tmp_path / "other" / "events.json")
+    assert partitions.current() == partitions.DEFAULT
+
+
+def test_partition_local():
+    local = partitions.PartitionLocal(lambda name: {"name": name})
+    assert local.get("name") == partitions.DEFAULT
+    with partitions.use("other"):
+        assert local.get("name") == "other"
+    assert len(local._all()) == 2  # pylint: disable=protected-access
+
+
+def test_separate_databases(setup_db, tmp_path):
+    emojis = FakeGuild(["ZEUS", "ASL", "A1"]).emojis
+    EventDatabase._emojis = emojis  # pylint: disable=protected-access
+    event_date = datetime.now() + timedelta(days=1)
+    with partitions.use("other"):
+        EventDatabase.events = {}
+        EventDatabase.nextID = 0
+        EventDatabase._emojis = emojis  # pylint: disable=protected-access
+        other = EventDatabase.createEvent(event_date, platoon_size="test")
+        EventDatabase.toJson()
+    event = EventDatabase.createEvent(event_date, platoon_size="test")
+    EventDatabase.toJson()
+
+    # Both partitions start numbering their events from zero
+    assert event.id == other.id == 0
+    assert EventDatabase.events == {0: event}
+    with partitions.use("other"):
+        assert EventDatabase.events == {0: other}
+    assert (tmp_path / "other" / "events.json").exists()
+    assert (tmp_path / "events.json").exists()
+
+
+def test_configured(monkeypatch):
+    monkeypatch.setattr(
+        cfg,
+        "PARTITIONS",
+        {
+            "other": {
+                "event_channel": 1,
+                "archive_channel": 2,
+                "command_channel": 3,
+                "log_channel": 4,
+            }
+        },
+    )
+    names = [partition.name for partition in partitions.configured()]
+    assert names == [partitions.DEFAULT, "other"]
+    assert partitions.settings("other").channels["eventchannel"] == 1
+
+    monkeypatch.setattr(cfg, "PARTITIONS", {partitions.DEFAULT: {}})
+    with pytest.raises(ValueError):
+        partitions.configured()
+
+
+async def _idle(bot):
+    await asyncio.sleep(3600)
+
+
+@pytest.mark.asyncio
+async def test_partitions_on_other_shard(monkeypatch):
+    api = FakeApi()
+    me = FakeUser("Operation Bot", bot=True)
+    channels = {}
+    settings: dict[str, dict[str, int]] = {}
+    for name, shard_id in [(partitions.DEFAULT, 0), ("other", 1)]:
+        guild = FakeGuild(shard_id=shard_id)
+        settings[name] = {}
+        for key in ["event", "archive", "command", "log"]:
+            channel = FakeChannel(api, guild, key, me)
+            channels[channel.id] = channel
+            settings[name][f"{key}_channel"] = channel.id
+    default = settings[partitions.DEFAULT]
+    monkeypatch.setattr(cfg, "EVENT_CHANNEL", default["event_channel"])
+    monkeypatch.setattr(cfg, "EVENT_ARCHIVE_CHANNEL", default["archive_channel"])
+    monkeypatch.setattr(cfg, "COMMAND_CHANNEL", default["command_channel"])
+    monkeypatch.setattr(cfg, "LOG_CHANNEL", default["log_channel"])
+    monkeypatch.setattr(cfg, "PARTITIONS", {"other": settings["other"]})
+    monkeypatch.setattr(tasks, "GLOBAL_TASKS", {})
+    monkeypatch.setattr(tasks, "PARTITION_TASKS", {"Task": _idle})
+
+    bot = OperationBot(
+        command_prefix="!", loop=asyncio.get_running_loop(), shard_id=1, shard_count=2
+    )
+    # The channels of the other shard are resolved here only to check that
+    # they are skipped
+    monkeypatch.setattr(bot, "get_channel", channels.get)
+    monkeypatch.setattr("operationbot.bot.TextChannel", FakeChannel)
+    # The owner does not share a guild with this shard
+    monkeypatch.setattr(bot, "get_user", lambda user_id: None)
+
+    async def fetch_user(user_id):
+        return FakeUser("User", user_id)
+
+    monkeypatch.setattr(bot, "fetch_user", fetch_user)
+
+    await bot.fetch_data()
+    assert bot.partition_names == ["other"]
+    with partitions.use("other"):
+        assert bot.commandchannel.id == settings["other"]["command_channel"]
+    assert bot.owner.id == ADMIN
+
+    bot.start_tasks()
+    try:
+        assert list(bot.tasks) == ["Task (other)"]
+    finally:
+        for task in bot.tasks.values():
+            task.cancel()
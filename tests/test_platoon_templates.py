@@ -0,0 +1,48 @@
+from datetime import datetime
+
+from discord import Emoji
+
+from operationbot import config as cfg
+from operationbot.event import Event
+from operationbot.platoon_templates import get_template
+from tests.fake_discord import FakeGuild
+
+
+def test_instantiate(setup_db):
+    emojis = FakeGuild(["ZEUS", "ASL", "A1"]).emojis
+    event = Event(datetime(2020, 1, 1, 18, 30), emojis, platoon_size="test")
+    other = Event(datetime(2020, 1, 2, 18, 30), emojis, platoon_size="test")
+
+    assert list(event.roleGroups) == ["Company", "Alpha", "Additional"]
+    assert [role.name for role in event.roleGroups["Alpha"].roles] == ["ASL", "A1"]
+    emoji = event.roleGroups["Alpha"]["ASL"].emoji
+    assert isinstance(emoji, Emoji)
+    assert emoji.name == "ASL"
+    # The events do not share the roles
+    event.roleGroups["Alpha"]["ASL"].userID = 1
+    assert other.roleGroups["Alpha"]["ASL"].userID is None
+
+
+def test_cache(setup_db, monkeypatch):
+    emojis = FakeGuild(["ZEUS", "ASL", "A1"]).emojis
+    template = get_template("test", emojis)
+    assert get_template("test", emojis) is template
+
+    # Changing the emojis or the config compiles the template again
+    other_emojis = FakeGuild(["ZEUS", "ASL", "A1", "A2"]).emojis
+    assert get_template("test", other_emojis) is not template
+    monkeypatch.setitem(cfg.DEFAULT_ROLES["test"], "A2", "Alpha")
+    template = get_template("test", other_emojis)
+    assert [name for name, _ in template.groups[1][1]] == ["ASL", "A1", "A2"]
+
+
+def test_cache_per_guild(setup_db):
+    emojis = FakeGuild(["ZEUS", "ASL", "A1"]).emojis
+    other_emojis = FakeGuild(["ZEUS", "ASL", "A1"]).emojis
+    template = get_template("test", emojis)
+    other = get_template("test", other_emojis)
+
+    # The partitions using different emoji guilds keep their own templates
+    assert other is not template
+    assert get_template("test", emojis) is template
+    assert get_template("test", other_emojis) is other
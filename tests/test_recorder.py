@@ -0,0 +1,85 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from benchmarks.replay import replay, state_digest
+from operationbot import messageFunctions as msgFnc
+from operationbot.eventDatabase import EventDatabase as db
+from operationbot.eventListener import EventListener
+from operationbot.recorder import GatewayRecorder, read_recording
+from tests.fake_discord import (
+    FakeApi,
+    FakeBot,
+    FakeChannel,
+    FakeGuild,
+    FakeUser,
+    make_reaction_payload,
+)
+
+
+@pytest.mark.asyncio
+async def test_record_and_replay(setup_db, tmp_path, monkeypatch):
+    guild = FakeGuild(["ZEUS", "ASL", "A1"])
+    bot = FakeBot(FakeApi(), guild)
+    db._emojis = guild.emojis
+    listener = EventListener(bot)
+    # The database stores the event time with a minute precision
+    now = datetime.now().replace(second=0, microsecond=0)
+    events = [
+        db.createEvent(now + timedelta(days=i + 1), platoon_size="test")
+        for i in range(2)
+    ]
+    for event in events:
+        await msgFnc.createEventMessage(event, bot.eventchannel)
+        await msgFnc.updateReactions(event, bot=bot)
+
+    recorder = GatewayRecorder()
+    monkeypatch.setattr("operationbot.eventListener.recorder", recorder)
+    filename = str(tmp_path / "recording.jsonl.gz")
+    recorder.start(filename, guild.emojis)
+
+    users = [FakeUser(f"User {i}") for i in range(3)]
+    signups = [(events[0], users[0], "ASL"), (events[1], users[1], "A1")]
+    signups += [(events[0], users[2], "A1"), (events[0], users[0], "ASL")]
+    for event, user, role in signups:
+        message = bot.eventchannel.messages[event.messageID]
+        emoji = event.findRoleWithName(role).emoji
+        await listener.on_raw_reaction_add(make_reaction_payload(message, user, emoji))
+    recorder.stop()
+    digest = state_digest()
+
+    header, entries = read_recording(filename)
+    assert len(header["events"]) == 2
+    assert [entry["e"] for entry in entries] == ["reaction"] * 4
+    assert entries[0]["ev"] == events[0].id
+
+    result = await replay(header, entries, speed=0)
+    assert result["skipped"] == 0
+    assert result["state_digest"] == digest
+    assert db.events[events[0].id].findRoleWithName("ASL").userID is None
+    assert db.events[events[0].id].findRoleWithName("A1").userID == users[2].id
+
+
+@pytest.mark.asyncio
+async def test_record_bot_channels_only(setup_db, tmp_path, monkeypatch):
+    guild = FakeGuild(["ZEUS", "ASL", "A1"])
+    bot = FakeBot(FakeApi(), guild)
+    db._emojis = guild.emojis
+    listener = EventListener(bot)
+    recorder = GatewayRecorder()
+    monkeypatch.setattr("operationbot.eventListener.recorder", recorder)
+    filename = str(tmp_path / "recording.jsonl")
+    recorder.start(filename, guild.emojis)
+
+    user = FakeUser("User")
+    other = FakeChannel(bot.api, guild, "general", bot.user)
+    await listener.on_message(bot.commandchannel.receive(user, "!show 0"))
+    await listener.on_message(other.receive(user, "Unrelated chatter"))
+    # The events are buffered until the next flush
+    assert read_recording(filename)[1] == []
+    recorder.stop()
+
+    _, entries = read_recording(filename)
+    assert [(entry["c"], entry["content"]) for entry in entries] == [
+        ("command", "!show 0")
+    ]
@@ -0,0 +1,29 @@
+import pytest
+
+from operationbot.reload import Reload
+from tests.fake_discord import FakeApi, FakeBot, FakeGuild
+
+
+@pytest.mark.asyncio
+async def test_reload_keeps_cog_state():
+    bot = FakeBot(FakeApi(), FakeGuild([]))
+    bot.load_extension("operationbot.cogs.repl")
+    repl = bot.get_cog("REPL")
+    repl.sessions.add(1)
+    repl._last_result = 42
+
+    reloaded, failed = Reload(bot).reload_extensions(["operationbot.cogs.repl"])
+    assert failed == []
+    assert len(reloaded) == 1
+    new_repl = bot.get_cog("REPL")
+    assert new_repl is not repl
+    assert new_repl.sessions is repl.sessions
+    assert new_repl._last_result == 42
+
+
+@pytest.mark.asyncio
+async def test_failed_reload():
+    bot = FakeBot(FakeApi(), FakeGuild([]))
+    reloaded, failed = Reload(bot).reload_extensions(["operationbot.missing"])
+    assert reloaded == []
+    assert [extension for extension, _ in failed] == ["operationbot.missing"]
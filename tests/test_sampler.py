@@ -0,0 +1,62 @@
+import asyncio
+import time
+
+import pytest
+
+from operationbot.sampler import SamplingProfiler, task_dump
+
+
+def _busy(seconds: float):
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        sum(range(100))
+
+
+def test_sampling():
+    profiler = SamplingProfiler()
+    assert profiler.start(0.001, duration=10)
+    assert not profiler.start(0.001, duration=10)
+    _busy(0.2)
+    assert profiler.stop()
+    assert not profiler.running
+    assert profiler.total > 0
+    assert "_busy (test_sampler.py" in profiler.top(by_self=True)
+    stack, count = profiler.collapsed().splitlines()[-1].rsplit(" ", 1)
+    assert int(count) > 0
+    assert "test_sampling" in stack
+
+
+def test_top():
+    profiler = SamplingProfiler()
+    profiler.samples.update(
+        {
+            ("main (a.py:1)", "createEmbed (event.py:2)"): 3,
+            ("main (a.py:1)", "toJson (eventDatabase.py:3)"): 1,
+            ("main (a.py:1)", "select (selectors.py:4)"): 4,
+        }
+    )
+    lines = profiler.top(limit=2).splitlines()
+    assert lines[0].startswith("8 samples")
+    assert lines[0].endswith("50.0% busy")
+    assert lines[2:] == [
+        "100.0%   0.0%  main (a.py:1)",
+        " 75.0%  75.0%  createEmbed (event.py:2)",
+    ]
+    assert profiler.top(limit=1, by_self=True).splitlines()[2:] == [
+        " 75.0%  75.0%  createEmbed (event.py:2)",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_task_dump():
+    async def wait_forever():
+        await asyncio.Event().wait()
+
+    task = asyncio.create_task(wait_forever(), name="Waiter")
+    await asyncio.sleep(0)
+    dump = task_dump()
+    task.cancel()
+    lines = dump.splitlines()
+    waiter = lines.index("Waiter:")
+    assert "wait_forever" in lines[waiter + 1]
+    assert "Event.wait" in lines[waiter + 2]
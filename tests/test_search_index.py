@@ -0,0 +1,52 @@
+"""Tests of the event search index."""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from operationbot.eventDatabase import EventDatabase as db
+from operationbot.search_index import SearchIndex
+from tests.fake_discord import FakeGuild, FakeUser
+
+
+def _create(days: int, terrain: str, faction: str):
+    event = db.createEvent(
+        datetime(2030, 1, 1, 18) + timedelta(days=days), platoon_size="test"
+    )
+    event.terrain = terrain
+    event.faction = faction
+    return event
+
+
+def test_search_and_persist(setup_db):
+    guild = FakeGuild(["ZEUS", "ASL", "A1"])
+    db._emojis = guild.emojis
+    zeus = FakeUser("Zeus User")
+    first = _create(0, "Altis", "USMC")
+    first.signup(first.findRoleWithName("ZEUS"), zeus)
+    second = _create(1, "Altis", "Russia")
+    third = _create(2, "Tanoa", "USMC")
+    third.signup(third.findRoleWithName("ASL"), zeus)
+    db.archiveEvent(first)
+    db.archiveEvent(second)
+
+    db.search.refresh(db.events.values())
+    assert [doc["line"][:2] for doc in db.search.search("altis usmc")] == ["0:"]
+    assert [doc["archived"] for doc in db.search.search("usmc")] == [False, True]
+    assert len(db.search.search(f"zeus:<@{zeus.id}>")) == 1
+    assert len(db.search.search('user:"zeus user"')) == 2
+    assert db.search.search("terrain:stratis") == []
+    with pytest.raises(ValueError):
+        db.search.search("unknown:field")
+
+    # The archived events are restored from the stored index
+    db.toJson(archive=True)
+    loaded = SearchIndex()
+    assert loaded.load(db.eventsArchive)
+    assert loaded.postings == {
+        term: ids - {third.id}
+        for term, ids in db.search.postings.items()
+        if ids - {third.id}
+    }
+    db.eventsArchive.pop(second.id)
+    assert not loaded.load(db.eventsArchive)
@@ -0,0 +1,78 @@
+import pytest
+
+from operationbot.errors import LeaseNotAcquired
+from operationbot.shards import ShardCoordinator
+
+
+@pytest.fixture
+def shards(tmp_path):
+    filename = str(tmp_path / "shards.sqlite")
+    first, second = ShardCoordinator(), ShardCoordinator()
+    first.start(filename, 0, lease_time=30)
+    second.start(filename, 1, lease_time=30)
+    yield first, second
+    first.stop()
+    second.stop()
+
+
+def test_inactive():
+    coordinator = ShardCoordinator()
+    assert coordinator.leader
+    assert coordinator.acquire("default:0")
+    assert coordinator.changes("default") == []
+    assert coordinator.next_id("default") == 0
+
+
+def test_leases(shards):
+    first, second = shards
+    assert first.acquire("default:0")
+    # Renewing an own lease succeeds
+    assert first.acquire("default:0")
+    assert not second.acquire("default:0")
+    assert second.acquire("default:1")
+    first.release("default:0")
+    assert second.acquire("default:0")
+
+
+def test_expired_lease(shards):
+    first, second = shards
+    first.lease_time = -1
+    assert first.acquire("default:0")
+    assert second.acquire("default:0")
+
+
+@pytest.mark.asyncio
+async def test_lease_timeout(shards):
+    first, second = shards
+    async with first.lease("default:0"):
+        with pytest.raises(LeaseNotAcquired):
+            async with second.lease("default:0", timeout=0):
+                pass
+    async with second.lease("default:0", timeout=0):
+        pass
+
+
+def test_leader(shards):
+    first, second = shards
+    assert first.leader
+    assert not second.leader
+    first.stop()
+    assert second.elect()
+
+
+def test_changes(shards):
+    first, second = shards
+    first.save("default", {0: {"title": "A"}, 1: {"title": "B"}}, False, 2)
+    assert first.changes("default") == []
+    assert sorted(second.changes("default")) == [
+        (0, False, {"title": "A"}),
+        (1, False, {"title": "B"}),
+    ]
+    assert second.next_id("default") == 2
+    assert second.changes("default") == []
+
+    # Archive event 0
+    second.save("default", {1: {"title": "B"}}, False, 2)
+    second.save("default", {0: {"title": "A"}}, True, 2)
+    assert first.changes("default") == [(0, True, {"title": "A"})]
+    assert not first.has_events("other")
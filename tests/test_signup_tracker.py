@@ -0,0 +1,50 @@
+"""Tests of the signup tracker."""
+
+from datetime import datetime, timedelta
+
+from operationbot import signup_tracker
+from operationbot.eventDatabase import EventDatabase as db
+from operationbot.signup_tracker import SignupTracker
+from tests.fake_discord import FakeGuild, FakeUser
+
+
+def test_ring_buffer_and_reports(setup_db, monkeypatch):
+    guild = FakeGuild(["ZEUS", "ASL", "A1"])
+    db._emojis = guild.emojis
+    start = datetime(2030, 1, 1, 18)
+    event = db.createEvent(start, platoon_size="test")
+    users = [FakeUser(f"User {i}") for i in range(3)]
+    now = [(start - timedelta(days=5)).timestamp()]
+    monkeypatch.setattr(signup_tracker.time, "time", lambda: now[0])
+    tracker = SignupTracker(capacity=4)
+
+    def act(action, role, user):
+        if action == "SIGNOFF":
+            event.undoSignup(user)
+        else:
+            event.signup(event.findRoleWithName(role), user)
+        tracker.record(event, action, role)
+        now[0] += 3600
+
+    act("SIGNUP", "ZEUS", users[0])
+    act("SIGNUP", "ASL", users[1])
+    act("SIGNOFF", "ASL", users[1])
+    act("SIGNUP", "ASL", users[1])
+    # Pushes the first entry out of the buffer
+    act("SIGNUP", "A1", users[2])
+
+    series = tracker.series[event.id]
+    assert series.count == 4 and series.base == 1
+    assert [filled for _, filled in series.filled()] == [2, 1, 2, 3]
+    assert series.time_to_full() == 5 * 24 - 4
+    assert series.filled_at((start - timedelta(days=7)).timestamp()) == 1
+    assert tracker.report() == [
+        "test (1 events): 168h: 33%, 72h: 100%, 24h: 100%, 0h: 100%; "
+        "full 1/1, median 116h before start; churn 33% (1 signoffs / 3 signups)"
+    ]
+    assert "Signup actions per group: Alpha: 4" in tracker.event_report(event.id)
+
+    tracker.save()
+    loaded = SignupTracker(capacity=4)
+    loaded.load()
+    assert loaded.event_report(event.id) == tracker.event_report(event.id)
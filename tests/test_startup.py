@@ -0,0 +1,26 @@
+from operationbot.cli import parse_arguments
+from operationbot.startup import StartupProfile
+
+
+def test_profile_startup_flag():
+    assert not parse_arguments([]).profile_startup
+    assert parse_arguments(["--profile-startup"]).profile_startup
+
+
+def test_phases():
+    profile = StartupProfile(enabled=True)
+    with profile.phase("imports"):
+        pass
+    with profile.phase("login"):
+        pass
+
+    assert [name for name, _ in profile.phases] == ["imports", "login"]
+    report = profile.finish()
+    assert "imports" in report
+    assert "login" in report
+    assert "total" in report
+
+    # Phases are not recorded after the profile has been finished
+    with profile.phase("reconnect"):
+        pass
+    assert len(profile.phases) == 2
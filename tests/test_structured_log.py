@@ -0,0 +1,63 @@
+import json
+import logging
+import queue
+import sys
+
+from operationbot import config as cfg
+from operationbot import structured_log
+from operationbot.structured_log import JsonFormatter
+
+
+def _record(msg="Signup %s", args=("ASL",), **extra) -> logging.LogRecord:
+    record = logging.LogRecord(
+        "operationbot.test", logging.INFO, "", 0, msg, args, None
+    )
+    record.__dict__.update(extra)
+    return record
+
+
+def test_json_fields():
+    line = JsonFormatter().format(_record(event_id=3, user_id=5))
+    data = json.loads(line)
+    assert data["message"] == "Signup ASL"
+    assert data["logger"] == "operationbot.test"
+    assert data["level"] == "INFO"
+    assert data["event_id"] == 3
+    assert data["user_id"] == 5
+    assert "message_id" not in data
+
+
+def test_queued_exception():
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    handler = structured_log._QueueHandler(log_queue)
+    try:
+        raise ValueError("broken")
+    except ValueError:
+        record = _record()
+        record.exc_info = sys.exc_info()
+    handler.emit(record)
+    queued = log_queue.get_nowait()
+    assert queued.exc_info is None
+    data = json.loads(JsonFormatter().format(queued))
+    assert data["message"] == "Signup ASL"
+    assert "ValueError: broken" in data["exception"]
+
+
+def test_configure(monkeypatch, tmp_path):
+    filename = tmp_path / "bot.log"
+    monkeypatch.setattr(cfg, "LOG_FILE", str(filename))
+    monkeypatch.setattr(cfg, "LOG_FORMAT", "json")
+    monkeypatch.setattr(cfg, "LOG_LEVELS", {"operationbot.test": "WARNING"})
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    try:
+        structured_log.configure()
+        logging.getLogger("operationbot.test").info("Hidden")
+        logging.getLogger("operationbot.test").warning("Shown", extra={"event_id": 1})
+        structured_log.shutdown()
+    finally:
+        root.handlers[:] = handlers
+        root.setLevel(level)
+        logging.getLogger("operationbot.test").setLevel(logging.NOTSET)
+    lines = [json.loads(line) for line in filename.read_text().splitlines()]
+    assert [(line["message"], line["event_id"]) for line in lines] == [("Shown", 1)]
@@ -0,0 +1,52 @@
+from datetime import datetime
+
+from operationbot import warm_cache
+from operationbot.event import Event
+
+
+def _events() -> dict[int, Event]:
+    events = {}
+    for event_id in range(3):
+        event = Event(
+            datetime(2020, 1, 1 + event_id, 18, 30),
+            guildEmojis=(),
+            eventID=event_id,
+            platoon_size="empty",
+        )
+        event.addAdditionalRole("Role")
+        event.messageID = 1000 + event_id
+        event.createEmbed()
+        events[event_id] = event
+    return events
+
+
+def test_roundtrip(tmp_path):
+    events = _events()
+    filename = str(tmp_path / "cache.json")
+
+    assert warm_cache.load_cache(filename) is None
+    warm_cache.save_cache(events, (), filename)
+    cache = warm_cache.load_cache(filename)
+    assert warm_cache.is_valid(cache, events, ())
+
+
+def test_invalidation(tmp_path):
+    events = _events()
+    filename = str(tmp_path / "cache.json")
+    warm_cache.save_cache(events, (), filename)
+    cache = warm_cache.load_cache(filename)
+
+    # Reaction set changed
+    events[0].addAdditionalRole("Another role")
+    assert not warm_cache.is_valid(cache, events, ())
+    events[0].removeAdditionalRole("Another role")
+    assert warm_cache.is_valid(cache, events, ())
+
+    # Message mapping changed
+    events[1].messageID, events[2].messageID = events[2].messageID, 1001
+    assert not warm_cache.is_valid(cache, events, ())
+    events[1].messageID, events[2].messageID = 1001, 1002
+
+    # Failed embed edit invalidates the hash
+    events[2].embed_hash = ""
+    assert not warm_cache.is_valid(cache, events, ())